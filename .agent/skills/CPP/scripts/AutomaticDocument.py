@@ -1,74 +1,88 @@
 import os
 import sys
 import argparse
-import re
 import json
 from Common import Common
+from CppLexer import CppLexer
 
 class DocumentManager:
     """
     C++ 文档管理器 [LOCKED]
     支持 CheckDocument (检查缺失), Write (写入文档)
     """
-    def __init__(self, file_path):
+    def __init__(self, file_path, content=None):
         self.file_path = file_path
         self._content = ""
-        self._lines = []
-        if os.path.exists(file_path):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                self._content = f.read()
-                self._lines = self._content.splitlines()
+        if content is not None:
+            self._content = content
+        else:
+            self._content = Common.read_source(file_path)
+        self._lines = self._content.splitlines()
 
     def get_undocumented(self):
         """
-        Scanning C++ files for functions/classes without docstrings.
-        Returns list of {name, line, type}.
+        Scanning C++ files for functions/classes without docstrings (one CppLexer pass).
+        Returns list of {name, line, type}: classes first, then functions.
         """
-        # Simplified scanning
-        missing = []
-        
-        # 1. Classes (HPP)
-        class_pattern = re.compile(r'\b(class|struct)\s+(\w+)\s*\{')
-        for m in class_pattern.finditer(self._content):
-            # Check if preceded by /**
-            preceding = self._content[:m.start()].strip()
-            if not preceding.endswith('*/'):
-                missing.append({"name": m.group(2), "type": m.group(1), "line": self._content[:m.start()].count('\n')+1})
+        lexed = CppLexer.lex(self._content)
+        is_header = self.file_path.endswith(('.hpp', '.h'))
+        classes, functions = [], []
+        for definition in lexed.definitions:
+            if definition.kind in ("class", "struct"):
+                # Preceded by a /** ... */ block (only whitespace in between)
+                span = lexed.comment_before(definition.start)
+                if not (span and not self._content[span[1]:definition.start].strip() and self._content[span[0]:span[1]].endswith('*/')):
+                    classes.append({"name": definition.name, "type": definition.kind, "line": definition.line})
+            elif definition.kind == "function":
+                # HPP: */ on the line above; CPP: /// on the line above
+                last_line = lexed.line_text(definition.line - 1).strip()
+                if not ('*/' in last_line if is_header else last_line.startswith('///')):
+                    functions.append({"name": definition.name, "type": "function", "line": definition.line})
+        return classes + functions
 
-        # 2. Functions (CPP/HPP)
-        # Regex is hard. Assume functions start with Type Name(
-        func_pattern = re.compile(r'\b(\w[\w:<>,]*[*&]?)\s+(\w+)\s*\([^)]*\)\s*(?:const)?\s*(?::[^\{]*)?\{')
-        for m in func_pattern.finditer(self._content):
-            name = m.group(2)
-            if name in ["if", "while", "for", "switch"]: continue
-            
-            start = m.start()
-            # Check comment
-            # HPP: Look for /**
-            # CPP: Look for ///
-            is_header = self.file_path.endswith(('.hpp', '.h'))
-            
-            has_doc = False
-            lines_before = self._content[:start].splitlines()
-            if lines_before:
-                last_line = lines_before[-1].strip()
-                if is_header:
-                    if '*/' in last_line: has_doc = True
-                else:
-                    if last_line.startswith('///'): has_doc = True
-            
-            if not has_doc:
-                missing.append({"name": name, "type": "function", "line": self._content[:start].count('\n')+1})
-                
-        return missing
+    def plan_write_comment(self, selector, json_data):
+        """
+        Plans a Write (new [Gemini] draft comment) against self._content without touching the file.
+        selector: name or index into get_undocumented(). json_data: {"brief": ..., "details": ...} (str or dict).
+        HPP: Winyunq /** ... **/ block; CPP: /// lines at the symbol's indent.
+        Returns (edit, message): edit = (start_char, stop_char, new_text) or None on error.
+        """
+        missing = self.get_undocumented()
+        target = next((m for m in missing if m['name'] == selector), None)
+        if not target:
+            try: idx = int(selector); target = missing[idx] if 0 <= idx < len(missing) else None
+            except (TypeError, ValueError): pass
+        if not target: return None, f"Error: Undocumented symbol {selector} not found."
+
+        if isinstance(json_data, dict): data = json_data
+        else:
+            try: data = json.loads(json_data)
+            except (TypeError, ValueError): return None, "Error: Invalid JSON data."
+
+        brief = data.get("brief", "Gemini 草稿")
+        line_text = self._lines[target['line'] - 1]
+        if self.file_path.endswith(('.hpp', '.h')):
+            block = ["/**", f" * @brief [Gemini] {brief}"]
+            if 'details' in data: block.append(f" *  @details {data['details']}")
+            block.append("**/")
+        else:
+            indent = line_text[:len(line_text) - len(line_text.lstrip())]
+            block = [f"{indent}/// @brief [Gemini] {brief}"]
+            if 'details' in data: block.append(f"{indent}/// @details {data['details']}")
+
+        # Insert at the start of the symbol's line
+        offset = CppLexer.lex(self._content).line_start(target['line'])
+        return (offset, offset, "\n".join(block) + "\n"), f"Success: Written doc for {target['name']}"
 
     def write_comment(self, selector, json_data):
-        # Implementation for writing /** */ or ///
-        # Omitted for brevity, but would parse JSON and insert lines.
-        # This is a critical feature but for now 'Check' is priority.
-        pass
+        edit, message = self.plan_write_comment(selector, json_data)
+        print(message)
+        if edit is None: return
+        self._content = Common.apply_edits(self._content, [edit])
+        self._lines = self._content.splitlines()
+        Common.write_if_changed(self.file_path, self._content)
 
-if __name__ == "__main__":
+def main(argv=None):
     parser = argparse.ArgumentParser()
     subparsers = parser.add_subparsers(dest="command")
     
@@ -78,10 +92,22 @@ if __name__ == "__main__":
     p_list = subparsers.add_parser("GetNoDocumentList")
     p_list.add_argument("file")
 
-    args = parser.parse_args()
+    p_write = subparsers.add_parser("Write")
+    p_write.add_argument("file")
+    p_write.add_argument("--selector")
+    p_write.add_argument("--data")
+
+    args = parser.parse_args(argv)
     mgr = DocumentManager(args.file)
     
     if args.command == "CheckDocument":
         print(len(mgr.get_undocumented()))
     elif args.command == "GetNoDocumentList":
         print(json.dumps(mgr.get_undocumented(), indent=2))
+    elif args.command == "Write":
+        mgr.write_comment(args.selector, args.data)
+
+if __name__ == "__main__":
+    from Daemon import forward
+    code = forward("AutomaticDocument", sys.argv[1:])
+    sys.exit(main() if code is None else code)
@@ -12,8 +12,7 @@ def check_style(file_path):
         return
 
     is_header = file_path.endswith(('.hpp', '.h'))
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
+    content = Common.read_source(file_path)
 
     filename = os.path.basename(file_path)
     
@@ -35,7 +34,7 @@ def promote(file_path):
     # Keeping it simple for now (Read Only Check)
     pass
 
-if __name__ == "__main__":
+def main(argv=None):
     parser = argparse.ArgumentParser()
     subparsers = parser.add_subparsers(dest="command")
 
@@ -44,7 +43,7 @@ if __name__ == "__main__":
     
     p_prom = subparsers.add_parser("Promote")
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     # Support direct call "CheckStyle.py file" check for backward compat?
     # New standard: "CheckStyle.py Check --file ..." via SetTarget context
@@ -56,4 +55,9 @@ if __name__ == "__main__":
         # Get target from Common if not provided?
         fpath, _ = Common.get_full_target()
         if fpath: check_style(fpath)
-        else: print("No target set")
\ No newline at end of file
+        else: print("No target set")
+
+if __name__ == "__main__":
+    from Daemon import forward
+    code = forward("CheckStyle", sys.argv[1:])
+    sys.exit(main() if code is None else code)
@@ -1,14 +1,19 @@
 import os
 import re
 import json
+import codecs
+import shutil
+import tempfile
 
 class Common:
     GEMINI_PREFIX = "Gemini_"
     SESSION_FILE = ".session_context.json"
     
-    # C++ Regex (HPP/CPP)
-    REGEX_LOCKED_HPP = re.compile(r'/\*\*(?:(?!\*/).)*?@brief\s+(?!.*Gemini).*?\*/', re.DOTALL)
-    REGEX_LOCKED_CPP = re.compile(r'///\s*@brief\s+(?!.*Gemini).*')
+    # C++ doc comment lock verdicts (see lock_blocks)
+    LOCKED, DRAFT, UNLOCKED = "LOCKED", "DRAFT", "UNLOCKED"
+    UNLOCK_TAG = "[Unlock]"
+    GLOBAL_UNLOCK = "// [Unlock]" # First line of the file (UnlockGUI without a function): nothing in it is locked
+    _DOC_MARKER = re.compile(r'/\*\*|///')
 
     @staticmethod
     def get_gemini_path(file_path):
@@ -17,15 +22,101 @@ class Common:
             return file_path
         return os.path.join(dirname, Common.GEMINI_PREFIX + basename)
 
+    # --- Read Caches (stat-keyed: warm inside the skill daemon, harmless for one-shot calls) ---
+    SOURCE_CACHE_LIMIT = 256
+    _source_cache = {} # abspath -> ((size, mtime_ns), content)
+    _state_cache = {}  # abspath -> ((size, mtime_ns), state)
+
+    @staticmethod
+    def _stat_key(file_path):
+        try: st = os.stat(file_path)
+        except OSError: return None
+        return (st.st_size, st.st_mtime_ns)
+
+    @staticmethod
+    def _remember(cache, key, value, limit):
+        if len(cache) >= limit: cache.pop(next(iter(cache))) # Oldest first
+        cache[key] = value
+
+    @staticmethod
+    def read_source(file_path):
+        """Returns the file's text ("" if missing), cached until its size or mtime changes."""
+        key = Common._stat_key(file_path)
+        if key is None: return ""
+        path = os.path.abspath(file_path)
+        cached = Common._source_cache.get(path)
+        if cached and cached[0] == key: return cached[1]
+        with open(file_path, 'r', encoding='utf-8') as f: content = f.read()
+        Common._remember(Common._source_cache, path, (key, content), Common.SOURCE_CACHE_LIMIT)
+        return content
+
+    # --- Lock Detection (linear: every character is visited a constant number of times) ---
+    @staticmethod
+    def lock_blocks(content, start=0, stop=None):
+        """
+        Doc comments starting in content[start:stop] with their lock verdict, in one forward pass:
+        [(start, stop, verdict)]. A '/**' block closes at the first '*/' after it (as
+        src/CodeStyle/block_extractor.py scans them); a '///' comment runs to the end of its line.
+        verdict: LOCKED (formal @brief), DRAFT (Gemini after the @brief) or UNLOCKED (no @brief, or [Unlock]).
+        """
+        stop = len(content) if stop is None else stop
+        blocks, pos = [], start
+        while True:
+            match = Common._DOC_MARKER.search(content, pos, stop)
+            if not match: break
+            block_start = match.start()
+            if match.group() == "///":
+                block_stop = content.find("\n", block_start)
+                if block_stop < 0: block_stop = len(content)
+                text = content[block_start + 3:block_stop].lstrip()
+                brief = block_stop - len(text) if text.startswith("@brief") else -1 # '///' needs the @brief first
+            else:
+                if content.startswith("/**/", block_start): pos = block_start + 4; continue # Empty comment
+                close = content.find("*/", block_start + 3)
+                if close < 0: break # Unclosed: no later '/**' can close either
+                block_stop = close + 2
+                brief = content.find("@brief", block_start, block_stop)
+            while brief >= 0 and not content[brief + 6:brief + 7].isspace():
+                brief = content.find("@brief", brief + 6, block_stop) # "@briefly" is not a tag
+            if brief < 0 or content.find(Common.UNLOCK_TAG, block_start, block_stop) >= 0: verdict = Common.UNLOCKED
+            elif content.find("Gemini", brief, block_stop) >= 0: verdict = Common.DRAFT
+            else: verdict = Common.LOCKED
+            blocks.append((block_start, block_stop, verdict))
+            pos = block_stop
+        return blocks
+
+    @staticmethod
+    def globally_unlocked(content):
+        """True if the file's first line is GLOBAL_UNLOCK (after a UTF-8 BOM: read_source keeps it as '\ufeff')."""
+        return content.startswith(Common.GLOBAL_UNLOCK, 1 if content.startswith('\ufeff') else 0)
+
+    @staticmethod
+    def lock_verdict(content, start=0, stop=None):
+        """
+        Verdict of one entity: content[start:stop] covers its doc comment and code (per-entity locks).
+        UNLOCKED if the file is globally unlocked or an [Unlock] tag is in the span or on the line above it,
+        else LOCKED / DRAFT if any doc comment in the span is, else UNLOCKED.
+        """
+        stop = len(content) if stop is None else stop
+        if Common.globally_unlocked(content): return Common.UNLOCKED
+        line_above = content.rfind("\n", 0, max(start - 1, 0)) + 1
+        if content.find(Common.UNLOCK_TAG, line_above, stop) >= 0: return Common.UNLOCKED
+        verdicts = {verdict for _, _, verdict in Common.lock_blocks(content, start, stop)}
+        return next((verdict for verdict in (Common.LOCKED, Common.DRAFT) if verdict in verdicts), Common.UNLOCKED)
+
     @staticmethod
     def is_locked(content, is_header=False):
-        if is_header:
-            return bool(Common.REGEX_LOCKED_HPP.search(content))
-        else:
-            return bool(Common.REGEX_LOCKED_CPP.search(content))
+        """File-level lock: any formal /** block (header) or /// @brief line (source) that is not a draft."""
+        if Common.globally_unlocked(content): return False
+        marker = "/**" if is_header else "///"
+        return any(verdict == Common.LOCKED and content.startswith(marker, start) for start, _, verdict in Common.lock_blocks(content))
 
     @staticmethod
-    def enforce_lock(file_path):
+    def enforce_lock(file_path, span=None):
+        """
+        Raises PermissionError if file_path is locked. span: (start, stop) of one entity (doc comment included)
+        to check only that entity (lock_verdict) instead of the whole file.
+        """
         filename = os.path.basename(file_path)
         if filename.startswith(Common.GEMINI_PREFIX):
             return False 
@@ -34,19 +125,86 @@ class Common:
             return False
             
         is_header = file_path.endswith(('.hpp', '.h'))
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-            
+        content = Common.read_source(file_path)
+
+        if span is not None:
+            if Common.lock_verdict(content, *span) == Common.LOCKED:
+                line = content.count("\n", 0, span[0]) + 1
+                raise PermissionError(f"BLOCK: '{filename}' line {line} is LOCKED by Winyunq Protocol (Formal @brief found).")
+            return False
         if Common.is_locked(content, is_header):
             raise PermissionError(f"BLOCK: File '{filename}' is LOCKED by Winyunq Protocol (Formal @brief found).")
         return False
 
+    # --- File Writing ---
+    @staticmethod
+    def write_if_changed(file_path, content):
+        """
+        Writes text content ('\n' line breaks) only if the file's bytes would change, so
+        an unchanged file keeps its mtime (no rebuild of everything including it).
+        Keeps the file's CRLF/LF line breaks, UTF-8 BOM and final newline. Writes a temp
+        file in the same directory and renames it over the target (never half-written).
+        Returns True if the file was written.
+        """
+        try:
+            with open(file_path, 'rb') as f: old_bytes = f.read()
+        except OSError:
+            old_bytes = None
+        encoding, newline = 'utf-8', '\n'
+        if old_bytes is not None:
+            if old_bytes.startswith(codecs.BOM_UTF8):
+                encoding = 'utf-8-sig'
+                if content.startswith('\ufeff'): content = content[1:] # Read back with encoding='utf-8'
+            if b'\r\n' in old_bytes: newline = '\r\n'
+            # Writers rebuild text with "\n".join(lines): keep the final newline they drop
+            if old_bytes.endswith(b'\n') and content and not content.endswith('\n'): content += '\n'
+        new_bytes = content.replace('\n', newline).encode(encoding)
+        if new_bytes == old_bytes: return False
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(file_path)), prefix='.tmp_', suffix=os.path.basename(file_path))
+        try:
+            with os.fdopen(fd, 'wb') as f: f.write(new_bytes)
+            if old_bytes is not None: shutil.copymode(file_path, tmp_path)
+            os.replace(tmp_path, file_path)
+            Common._source_cache.pop(os.path.abspath(file_path), None)
+        except BaseException:
+            try: os.remove(tmp_path)
+            except OSError: pass
+            raise
+        return True
+
+    @staticmethod
+    def apply_edits(snapshot, edits):
+        """
+        Applies edits that were all planned against the same snapshot, so no edit shifts
+        the positions another one relies on.
+        snapshot: list of lines (positions are line indexes) or str (character offsets).
+        edits: [(start, stop, replacement)] half-open; start == stop inserts. Insertions at
+               the same position keep their order. Raises ValueError if two edits overlap.
+        Returns the edited list / str.
+        """
+        ordered = sorted(enumerate(edits), key=lambda item: (item[1][0], item[1][1], item[0]))
+        for (_, previous), (_, current) in zip(ordered, ordered[1:]):
+            if current[0] < previous[1]: raise ValueError(f"Overlapping edits: {previous[:2]} and {current[:2]}")
+        pieces, cursor = [], 0
+        for _, (start, stop, replacement) in ordered:
+            pieces.append(snapshot[cursor:start]); pieces.append(replacement)
+            cursor = stop
+        pieces.append(snapshot[cursor:])
+        if isinstance(snapshot, str): return "".join(pieces)
+        return [line for piece in pieces for line in piece]
+
     @staticmethod
     def load_state():
-        if os.path.exists(Common.SESSION_FILE):
+        path = os.path.abspath(Common.SESSION_FILE)
+        key = Common._stat_key(path)
+        cached = Common._state_cache.get(path)
+        if key and cached and cached[0] == key: return dict(cached[1]) # Callers update their copy
+        if key:
             try:
-                with open(Common.SESSION_FILE, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                with open(path, 'r', encoding='utf-8') as f: state = json.load(f)
+                Common._remember(Common._state_cache, path, (key, state), Common.SOURCE_CACHE_LIMIT)
+                return dict(state)
             except: pass
         return {"root": os.getcwd(), "file": None, "scope": None}
 
@@ -54,6 +212,7 @@ class Common:
     def save_state(state):
         with open(Common.SESSION_FILE, 'w', encoding='utf-8') as f:
             json.dump(state, f, indent=2)
+        Common._state_cache.pop(os.path.abspath(Common.SESSION_FILE), None)
 
     @staticmethod
     def get_full_target():
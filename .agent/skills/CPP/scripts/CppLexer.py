@@ -0,0 +1,658 @@
+import os
+import re
+import zlib
+import pickle
+import tempfile
+from bisect import bisect_right
+from collections import namedtuple
+from Common import Common
+
+# One regex alternation, applied from left to right: every comment and literal is consumed whole, so braces /
+# parentheses inside them never reach the token stream. Leading whitespace is folded into each match.
+# Outside a directive '#' can only start one, so no line anchor is needed.
+TOKEN_RE = re.compile(r'''\s*(?:
+    (?P<comment>//(?:\\\r?\n|[^\n])*|/\*.*?(?:\*/|\Z))   # Unterminated /* runs to the end of the file
+  | (?P<preproc>\#(?:\\\r?\n|[^\n])*)                     # Whole directive, with \ continuations
+  | (?P<raw>(?:u8|[uUL])?R"(?P<delim>[^()\\\s]{0,16})\(.*?\)(?P=delim)")
+  | (?P<string>(?:u8|[uUL])?"[^"\\\n]*(?:\\.[^"\\\n]*)*"?)
+  | (?P<char>(?:u8|[uUL])?'[^'\\\n]*(?:\\.[^'\\\n]*)*'?)
+  | (?P<ident>[A-Za-z_$][\w$]*)
+  | (?P<number>\.?\d(?:[eEpP][+-]|[\w.'])*)               # 1'000'000 / 0x1.8p+3 / 1e-9f
+  | (?P<punct>::|->|\.\.\.|.)
+  | \Z)''', re.VERBOSE | re.DOTALL)
+# Function bodies and initialisers are only brace-counted: everything between two braces is one match.
+# A quote right after a digit / letter is a digit separator (1'000), unless it follows a u / U / L / u8 prefix.
+BODY_RE = re.compile(r'''
+    (?:[^{}"'/R\#]+ | R(?!")
+     | //(?:\\\r?\n|[^\n])* | /\*.*?(?:\*/|\Z) | /
+     | \#(?:\\\r?\n|[^\n])*
+     | R"(?P<delim>[^()\\\s]{0,16})\(.*?\)(?P=delim)"
+     | "[^"\\\n]*(?:\\.[^"\\\n]*)*"?
+     | (?:(?<![\w$])|(?<=(?<![\w$])[uUL])|(?<=(?<![\w$])u8))'[^'\\\n]*(?:\\.[^'\\\n]*)*'?
+     | ')+
+  | (?P<open>\{) | (?P<close>\})
+''', re.VERBOSE | re.DOTALL)
+BRACKETS = {"(": ")", "[": "]", "{": "}"}
+BRACKET_OPENERS = {")": "(", "]": "["}
+
+# kind: ident / number / string / raw / char / punct / preproc; start/end: character offsets (half-open)
+Token = namedtuple("Token", "kind text start end")
+# A definition with a {} body. name: as written, template arguments dropped from its qualifiers (DataProcessor::Process);
+# qualname: with the enclosing namespaces / classes (app::DataProcessor::Process); params: normalised parameter types
+# "(int, const std::string&)" for functions, "" otherwise. start: first character of the header (template <...>
+# included); open / stop: the '{' and one past the matching '}'; line / end_line: 1-based lines of start and the '}';
+# access: public / protected / private inside a class, "" elsewhere;
+# doc_span: (start, stop) of the /* */ block or run of /// lines directly above, or None.
+Definition = namedtuple("Definition", "name qualname kind return_type params start name_start open stop line end_line access doc_span")
+# A declaration ending in ';' at namespace / class scope: function prototypes and class / enum forward declarations.
+# Fields as in Definition; stop is one past the ';'.
+Declaration = namedtuple("Declaration", "name qualname kind params start stop line end_line access doc_span")
+
+CLASS_KEYS = ("class", "struct", "union", "enum", "namespace")
+SCOPE_KINDS = ("class", "struct", "union", "namespace", "linkage") # Bodies that contain further definitions
+SPECIFIERS = {"static", "inline", "virtual", "explicit", "constexpr", "consteval", "constinit", "extern", "friend",
+              "__forceinline", "__inline", "typedef"}
+ATTRIBUTE_CALLS = {"__attribute__", "__declspec", "alignas"}
+NOT_NAMES = {"if", "while", "for", "switch", "catch", "return", "sizeof", "alignof", "decltype", "noexcept", "throw",
+             "static_assert", "typeid", "new", "delete"} | ATTRIBUTE_CALLS
+TAIL_QUALIFIERS = {"const", "volatile", "&", "&&", "override", "final", "mutable", "try", "noexcept", "throw"} | ATTRIBUTE_CALLS
+ACCESS_LABELS = {"public", "private", "protected", "signals", "slots", "Q_SIGNALS", "Q_SLOTS"}
+ACCESS_LEVELS = ("public", "protected", "private")
+DEFAULT_ACCESS = {"class": "private", "struct": "public", "union": "public"}
+INIT_BRACE = "init" # _classify: the '{' opens a brace-initialiser of a constructor's init list
+TYPE_WORDS = {"void", "bool", "char", "wchar_t", "char8_t", "char16_t", "char32_t", "short", "int", "long", "float", "double",
+              "signed", "unsigned", "auto"}
+ELABORATORS = {"const", "volatile", "struct", "class", "enum", "union", "typename"} # Never a type on their own
+ANGLE_RE = re.compile(r"<[^<>]*>")
+
+
+def tokenize(text):
+    """Tokens of a code fragment (no structure): Read / Define selectors such as "Process(int, const Item&)"."""
+    return [Token(m.lastgroup, m.group(m.lastgroup), *m.span(m.lastgroup)) for m in TOKEN_RE.finditer(text)
+            if m.lastgroup not in (None, "comment")]
+
+def join_tokens(tokens):
+    """Token texts joined, with a space only between two words (operator new, unsigned int, const std::string&)."""
+    pieces = []
+    for token in tokens:
+        if pieces and token.kind in ("ident", "number") and (pieces[-1][-1:].isalnum() or pieces[-1][-1:] in ("_", "$")): pieces.append(" ")
+        pieces.append(token.text)
+    return "".join(pieces)
+
+def normalize_name(name):
+    """Drops template arguments from the qualifiers: DataProcessor<ValueType>::Process -> DataProcessor::Process."""
+    qualifier, separator, last = name.rpartition("::")
+    if not separator: return name
+    stripped = None
+    while stripped != qualifier: stripped, qualifier = qualifier, ANGLE_RE.sub("", qualifier)
+    return qualifier + "::" + last
+
+def signature(tokens):
+    """
+    Normalised parameter list of the tokens between ( and ): types only, so declarations and definitions compare equal.
+    Parameter names and default arguments are dropped; (void) is (). Returns "(int, const std::string&)".
+    Array extents are kept (char name[16] -> char[16]); int (*callback)(int) -> int(*)(int).
+    """
+    params, current, depth = [], [], 0
+    for token in tokens:
+        text = token.text
+        if text in ("(", "[", "{", "<"): depth += 1
+        elif text in (")", "]", "}", ">"): depth = max(0, depth - 1)
+        if text == "," and depth == 0: params.append(current); current = []
+        elif text == "=" and depth == 0: current.append(None) # Default argument follows
+        else: current.append(token)
+    if current: params.append(current)
+    types = []
+    for param in params:
+        if None in param: param = param[:param.index(None)]
+        param = [token for i, token in enumerate(param) if not _declarator_name(param, i)]
+        suffix = []
+        while len(param) > 1 and param[-1].text == "]": # int values[] / char name[16]
+            opener = max(i for i, token in enumerate(param) if token.text == "[")
+            suffix, param = param[opener:] + suffix, param[:opener]
+        if len(param) > 1 and param[-1].kind == "ident" and param[-1].text not in TYPE_WORDS and param[-2].text != "::" \
+                and any(token.kind == "ident" and token.text not in ELABORATORS for token in param[:-1]):
+            param = param[:-1] # Parameter name
+        if param: types.append(join_tokens(param + suffix))
+    if types == ["void"]: types = []
+    return "(" + ", ".join(types) + ")"
+
+def _declarator_name(param, i):
+    """True for the name in a parenthesised declarator: int (*callback)(int) / void (Widget::*handler)() / int (&values)[3]."""
+    return (param[i].kind == "ident" and 0 < i < len(param) - 2 and param[i - 1].text in ("*", "&", "&&")
+            and param[i + 1].text == ")" and param[i + 2].text in ("(", "["))
+
+def split_selector(selector):
+    """"ns::Class::method(int, Item&)" -> ("ns::Class::method", "(int, Item&)"); params None without a parameter list."""
+    tokens = tokenize(selector)
+    if len(tokens) > 1 and tokens[-1].text == ")":
+        depth, opener = 0, None
+        for index in range(len(tokens) - 1, -1, -1):
+            depth += {")": 1, "(": -1}.get(tokens[index].text, 0)
+            if depth == 0: opener = index; break
+        if opener and tokens[opener - 1].text != "operator": # operator() is a name, not a parameter list
+            return normalize_name(join_tokens(tokens[:opener])), signature(tokens[opener + 1:-1])
+    return normalize_name(join_tokens(tokens)), None
+
+
+class LexedFile:
+    """
+    词法分析结果 [LOCKED]
+    Token stream (comments / literals / preprocessor lines already separated), comment spans, a line-start
+    table and the bracket-match table of one C++ source, plus its {} definitions, all from one linear pass.
+    Tokens cover namespace and class scope; function bodies and initialisers are brace-counted by BODY_RE
+    (literals and comments still skipped) and appear as their matched '{' '}' tokens only.
+    Line numbers are a bisect into the line table.
+    """
+    def __init__(self, content):
+        self.content = content
+        self.tokens, self.comments = [], [] # comments: (start, end), in order (outside function bodies)
+        self.match = {} # token index -> index of its partner bracket, both directions
+        self.braces = {} # char offset of every '{' (function bodies included) -> offset of its '}'
+        self.line_starts = [0] + [m.end() for m in re.finditer("\n", content)]
+        self.declarations = []
+        self.definitions = self._scan() # File order, outer before inner
+        self._scopes = None
+
+    # --- Lines ---
+    def line_of(self, offset):
+        """1-based line holding character offset."""
+        return bisect_right(self.line_starts, offset)
+
+    def line_start(self, line):
+        """Character offset of the start of 1-based line."""
+        return self.line_starts[line - 1]
+
+    def line_text(self, line):
+        """Text of 1-based line without its line break ("" outside the file)."""
+        if not 1 <= line <= len(self.line_starts): return ""
+        stop = self.line_starts[line] - 1 if line < len(self.line_starts) else len(self.content)
+        return self.content[self.line_starts[line - 1]:stop].rstrip("\r")
+
+    def comment_before(self, offset):
+        """(start, end) of the comment that ends closest before offset, or None."""
+        index = bisect_right(self.comments, (offset, offset)) - 1
+        while index >= 0 and self.comments[index][1] > offset: index -= 1
+        return self.comments[index] if index >= 0 else None
+
+    def doc_above(self, start):
+        """(start, stop) of the /* */ block or the run of /// lines directly above the line holding start, or None."""
+        content = self.content
+        cursor = self.line_start(self.line_of(start))
+        first, last = None, None
+        while True:
+            span = self.comment_before(cursor)
+            if not span or content[span[1]:cursor].strip(): break
+            own_line = self.line_start(self.line_of(span[0]))
+            if content[own_line:span[0]].strip(): break # Trailing comment after code
+            text = content[span[0]:span[1]]
+            if text.startswith("/*"):
+                if last is None: first, last = span
+                break
+            if not text.startswith("///"): break
+            first, last = span[0], last if last is not None else span[1]
+            cursor = own_line
+        return (first, last) if first is not None else None
+
+    # --- Definitions ---
+    @property
+    def scopes(self):
+        """ScopeIndex of the definitions."""
+        if self._scopes is None: self._scopes = ScopeIndex(self.definitions, self.braces, self.content, self.declarations)
+        return self._scopes
+
+    def find(self, name, kinds=None):
+        return self.scopes.find(name, kinds)
+
+    def _scan(self):
+        content, tokens, match = self.content, self.tokens, self.match
+        definitions = []
+        groups = [] # Open ( / [ token indexes
+        scopes = [] # [token index of '{', index into definitions or None, name, current access] of open namespace / class bodies
+        head = 0 # First token of the current declaration
+        handler_of = None # Definition of a function-try-block whose catch handlers may follow
+        position = 0
+        while position is not None:
+            resume, position = position, None
+            for m in TOKEN_RE.finditer(content, resume):
+                kind = m.lastgroup
+                if kind is None: break # End of file
+                start, end = m.span(kind)
+                if kind == "comment":
+                    self.comments.append((start, end)); continue
+                index = len(tokens)
+                text = content[start:end]
+                tokens.append(Token(kind, text, start, end))
+                if kind == "preproc":
+                    if not groups: head = index + 1
+                    continue
+                if kind != "punct": continue
+
+                if text == "(" or text == "[": groups.append(index)
+                elif text == ")" or text == "]":
+                    if groups and tokens[groups[-1]].text == BRACKET_OPENERS[text]: # Unmatched closers are ignored
+                        partner = groups.pop()
+                        match[partner], match[index] = index, partner
+                elif text == "{":
+                    if handler_of is not None and not groups and tokens[head].text == "catch" and match.get(head + 1) == index - 1:
+                        # catch (...) { } of a function-try-block: extends the function before it
+                        close = self._skip_body(end)
+                        stop = close + 1 if close is not None else len(content)
+                        definitions[handler_of] = definitions[handler_of]._replace(stop=stop, end_line=self.line_of(stop - 1))
+                        if close is None: break
+                        tokens.append(Token("punct", "}", close, close + 1))
+                        match[index], match[index + 1] = index + 1, index
+                        self.braces[start] = close
+                        head = index + 2
+                        position = close + 1
+                        break
+                    handler_of = None
+                    header = None if groups else self._classify(head, index)
+                    prefix = [scope[2] for scope in scopes if scope[2]]
+                    access = scopes[-1][3] if scopes else ""
+                    if header not in (None, INIT_BRACE) and header[0] in SCOPE_KINDS:
+                        definition = self._define(definitions, header, prefix, access, index, None)
+                        scopes.append([index, definition, header[1], DEFAULT_ACCESS.get(header[0], "")])
+                        head = index + 1
+                        continue
+                    # Function body / initialiser / lambda: find the matching '}' without tokenising the inside
+                    close = self._skip_body(end)
+                    if header not in (None, INIT_BRACE):
+                        definition = self._define(definitions, header, prefix, access, index, close)
+                        if any(tokens[i].text == "try" for i in range(header[4], index)): handler_of = definition # void f() try { } catch (...) { }
+                    if close is None: break
+                    tokens.append(Token("punct", "}", close, close + 1))
+                    match[index], match[index + 1] = index + 1, index
+                    self.braces[start] = close
+                    if header not in (None, INIT_BRACE): head = index + 2 # Else the braces belong to the declaration
+                    position = close + 1
+                    break
+                elif groups: continue # ; : } inside ( ) do not end the declaration
+                elif text == ";":
+                    handler_of = None
+                    if index > head: self._declare(head, index, [scope[2] for scope in scopes if scope[2]], scopes[-1][3] if scopes else "")
+                    head = index + 1
+                elif text == ":" and index > head and tokens[index - 1].text in ACCESS_LABELS:
+                    if scopes: # public: / public slots:
+                        label = next((tokens[i].text for i in (index - 1, index - 2) if i >= head and tokens[i].text in ACCESS_LEVELS), None)
+                        if label: scopes[-1][3] = label
+                    head = index + 1
+                elif text == "}":
+                    head = index + 1
+                    if not scopes: continue
+                    partner, definition, _, _ = scopes.pop()
+                    match[partner], match[index] = index, partner
+                    self.braces[tokens[partner].start] = start
+                    if definition is not None: definitions[definition] = definitions[definition]._replace(stop=end, end_line=self.line_of(start))
+        return definitions
+
+    @staticmethod
+    def _qualify(prefix, name):
+        if name.startswith("::"): return name[2:] # Already fully qualified
+        return "::".join(prefix + [name]) if name else "::".join(prefix)
+
+    def _define(self, definitions, header, prefix, access, brace, close):
+        """
+        Appends the Definition of a classified header; prefix: names of the enclosing scopes;
+        close: char offset of its '}' (None: not known yet / unterminated).
+        """
+        kind, name, return_type, start_index, name_index, params = header
+        if kind == "linkage": return None
+        start = self.tokens[start_index].start
+        name_start = self.tokens[name_index].start if name_index is not None else start
+        stop = close + 1 if close is not None else len(self.content)
+        definitions.append(Definition(name, self._qualify(prefix, name), kind, return_type, params, start, name_start, self.tokens[brace].start,
+                                      stop, self.line_of(start), self.line_of(stop - 1), access, self.doc_above(start)))
+        return len(definitions) - 1
+
+    def _declare(self, head, semicolon, prefix, access):
+        """Records the declaration [head, semicolon) if it is a function prototype or a class / enum forward declaration."""
+        tokens = self.tokens
+        begin = self._skip_prefix(head, semicolon)
+        if begin >= semicolon or any(tokens[i].text == "friend" for i in range(head, begin)): return
+        function = self._function_header(begin, semicolon, declaration=True)
+        if function not in (None, INIT_BRACE):
+            name_first, name_last, opener, closer = function
+            if self._starts_with_literal(opener, closer): return # Widget widget(1, "a"): a variable
+            kind, name, params = "function", normalize_name(join_tokens(tokens[name_first:name_last + 1])), signature(tokens[opener + 1:closer])
+            head = self._after_macro_lines(head, begin, name_first, semicolon)[0]
+        elif tokens[begin].text in CLASS_KEYS[:3] and semicolon - begin == 2 or tokens[begin].text == "enum": # class Widget; / enum class Mode : int;
+            kind, (name, _), params = tokens[begin].text, self._class_name(begin + 1, semicolon), ""
+            if not name: return
+        else: return
+        start, stop = tokens[head].start, tokens[semicolon].end
+        self.declarations.append(Declaration(name, self._qualify(prefix, name), kind, params, start, stop, self.line_of(start),
+                                             self.line_of(stop - 1), access, self.doc_above(start)))
+
+    def _skip_body(self, position):
+        """Char offset of the '}' closing the '{' just before position, or None if the file ends first. Inner pairs go to braces."""
+        opened = [] # Inner '{' offsets
+        for m in BODY_RE.finditer(self.content, position):
+            group = m.lastgroup
+            if group == "open": opened.append(m.start())
+            elif group == "close":
+                if not opened: return m.start()
+                self.braces[opened.pop()] = m.start()
+        return None
+
+    def _skip_angles(self, index, stop):
+        """Index after the '>' closing the '<' at index (paren groups skipped), or stop."""
+        depth = 0
+        while index < stop:
+            text = self.tokens[index].text
+            if text == "<": depth += 1
+            elif text == ">":
+                depth -= 1
+                if depth == 0: return index + 1
+            elif text in (";", "{"): return index
+            elif text in BRACKETS: index = self.match.get(index, index)
+            index += 1
+        return stop
+
+    def _skip_prefix(self, index, stop):
+        """Skips template <...>, attributes and specifiers in front of a declaration."""
+        tokens, match = self.tokens, self.match
+        while index < stop:
+            text = tokens[index].text
+            if text == "template" and index + 1 < stop and tokens[index + 1].text == "<":
+                index = self._skip_angles(index + 1, stop)
+            elif text == "[" and index + 1 < stop and tokens[index + 1].text == "[":
+                index = match.get(index, index) + 1
+            elif text in ATTRIBUTE_CALLS and index + 1 < stop and tokens[index + 1].text == "(":
+                index = match.get(index + 1, index + 1) + 1
+            elif text in SPECIFIERS:
+                index += 1
+                if text == "extern" and index < stop and tokens[index].kind == "string": index += 1 # extern "C"
+            else: return index
+        return index
+
+    def _classify(self, head, brace):
+        """
+        What the '{' at token index brace opens, given the declaration tokens [head, brace).
+        Returns (kind, name, return_type, start_index, name_index, params), INIT_BRACE, or None for a plain brace.
+        """
+        tokens = self.tokens
+        if head >= brace:
+            return None
+        begin = self._skip_prefix(head, brace)
+        if begin == brace:
+            if head < brace and tokens[brace - 1].kind == "string": return ("linkage", "", "", head, None, "") # extern "C" {
+            return None
+
+        function = self._function_header(begin, brace)
+        if function == INIT_BRACE: return INIT_BRACE
+        if function is not None:
+            name_first, name_last, opener, closer = function
+            head, begin = self._after_macro_lines(head, begin, name_first, brace)
+            name = normalize_name(join_tokens(tokens[name_first:name_last + 1]))
+            return_type = self._text(begin, name_first) if name_first > begin else ""
+            return ("function", name, return_type, head, name_first, signature(tokens[opener + 1:closer]))
+
+        # class / struct / union / enum / namespace, unless it is an initialiser: struct Point origin = {...}
+        if any(tokens[index].text == "=" for index in range(begin, brace)): return None
+        for index in range(begin, brace):
+            if tokens[index].text in CLASS_KEYS:
+                name, name_index = self._class_name(index + 1, brace)
+                return (tokens[index].text, name, "", self._after_macro_lines(head, begin, index, brace)[0], name_index, "")
+        return None
+
+    def _after_macro_lines(self, head, begin, stop, end):
+        """
+        (head, begin) moved past every complete top-level NAME(...) before token stop that ends its line: a macro without ';'
+        (IMPLEMENT_DYNAMIC(Widget, CWnd)) belongs to no declaration. begin is re-skipped (_skip_prefix) up to end.
+        """
+        tokens, match, content = self.tokens, self.match, self.content
+        start, index = head, head
+        while index < stop:
+            text = tokens[index].text
+            if text == "(":
+                close = match.get(index)
+                if close is None or close >= stop: break
+                if index > start and tokens[index - 1].kind == "ident" and tokens[index - 1].text not in NOT_NAMES \
+                        and "\n" in content[tokens[close].end:tokens[close + 1].start]:
+                    start = close + 1
+                index = close + 1
+            elif text in ("[", "{"): index = match.get(index, index) + 1
+            else: index += 1
+        if start == head: return head, begin
+        return start, self._skip_prefix(start, end)
+
+    def _class_name(self, index, stop):
+        """Last (qualified) name before the base clause: class API_EXPORT Widget final : public Base."""
+        tokens = self.tokens
+        best, chain_first, chain_last = (None, None), None, None
+        while index < stop:
+            token = tokens[index]
+            if token.text == ":": break
+            if token.text == "<": index = self._skip_angles(index, stop); continue
+            if token.text in BRACKETS: index = self.match.get(index, index) + 1; continue
+            if token.kind == "ident" and token.text not in ("final", "class", "struct") and token.text not in ATTRIBUTE_CALLS:
+                if chain_last is not None and tokens[index - 1].text == "::": chain_last = index
+                else: chain_first = chain_last = index
+                best = (chain_first, chain_last)
+            index += 1
+        if best[0] is None: return "", None
+        return normalize_name(join_tokens(tokens[best[0]:best[1] + 1])), best[0]
+
+    def _starts_with_literal(self, opener, closer):
+        """True if an argument in ( ... ) starts with a literal: constructor arguments rather than parameters."""
+        tokens, match = self.tokens, self.match
+        index, expect = opener + 1, True
+        while index < closer:
+            token = tokens[index]
+            if expect and token.kind in ("number", "string", "raw", "char"): return True
+            expect = token.text == ","
+            index = match.get(index, index) + 1 if token.text in BRACKETS else index + 1
+        return False
+
+    def _function_header(self, begin, brace, declaration=False):
+        """
+        (name_first, name_last, open, close) token indexes of a function definition's name and parameter list, INIT_BRACE, or None.
+        The first top-level (...) after a name whose tail (qualifiers / trailing return / init list) reaches the brace.
+        declaration: brace is the ';' of a prototype instead (= 0 / = default / = delete allowed, no init list).
+        """
+        tokens, match = self.tokens, self.match
+        index = begin
+        while index < brace:
+            text = tokens[index].text
+            if text == "=" and not self._after_operator(index): return None # Initialiser / lambda
+            if text == "[" or text == "{":
+                index = match.get(index, index) + 1; continue
+            if text != "(":
+                index += 1; continue
+            close = match.get(index)
+            if close is None or close >= brace: return None
+            name = self._name_before(index, begin)
+            if name is not None:
+                tail = self._valid_tail(close + 1, brace, declaration)
+                if tail is not None: return INIT_BRACE if tail == INIT_BRACE else name + (index, close)
+            index = close + 1
+        return None
+
+    def _after_operator(self, index):
+        """True for the '=' of operator=, operator==, operator<=, ... (operator within the 3 previous tokens)."""
+        tokens = self.tokens
+        return any(tokens[i].text == "operator" for i in range(max(0, index - 3), index))
+
+    def _name_before(self, paren, begin):
+        """(name_first, name_last) of the name directly before the '(' at paren, or None."""
+        tokens = self.tokens
+        last = paren - 1
+        if last < begin: return None
+        first = None
+        for i in range(last, max(begin, paren - 4) - 1, -1): # operator+ / operator() / operator new / operator bool
+            if tokens[i].text == "operator": first = i; break
+        if first is None:
+            if tokens[last].kind != "ident" or tokens[last].text in NOT_NAMES: return None
+            first = last
+        elif tokens[paren - 1].text == ")" and paren - 2 > first and tokens[paren - 2].text == "(":
+            pass # operator()(...)
+        elif any(tokens[i].text in BRACKETS.values() and tokens[i].text != "]" for i in range(first + 1, paren)):
+            return None
+        if first > begin and tokens[first - 1].text == "~": first -= 1 # Destructor
+        while first - 2 >= begin and tokens[first - 1].text == "::": # Qualifiers: ns::Class<T>::name
+            previous = first - 2
+            left = tokens[previous]
+            if left.end != tokens[first - 1].start or left.text in TYPE_WORDS or left.text in SPECIFIERS or left.text in ELABORATORS:
+                break # void ::ns::name: the '::' opens a global name, what is left of it is the return type
+            if tokens[previous].text == ">":
+                depth = 0
+                while previous >= begin:
+                    depth += {">": 1, "<": -1}.get(tokens[previous].text, 0)
+                    if depth == 0: break
+                    previous -= 1
+                previous -= 1
+            if previous < begin or tokens[previous].kind != "ident": break
+            first = previous
+        if first - 1 >= begin and tokens[first - 1].text == "::": first -= 1 # ::globalFunction
+        return first, last
+
+    def _valid_tail(self, index, brace, declaration=False):
+        """True-ish if only qualifiers / -> return type / init list lie between ')' and the body; INIT_BRACE inside an init list."""
+        tokens, match = self.tokens, self.match
+        while index < brace:
+            text = tokens[index].text
+            if text in TAIL_QUALIFIERS:
+                index += 1
+                if index < brace and tokens[index].text == "(": index = match.get(index, index) + 1
+            elif text == "[" and index + 1 < brace and tokens[index + 1].text == "[":
+                index = match.get(index, index) + 1
+            elif text in ("->", "requires"): return True # Trailing return type / constraint runs to the body
+            elif declaration and text == "=" and index + 2 == brace and tokens[index + 1].text in ("0", "default", "delete"): return True
+            elif text == ":" and not declaration: return self._valid_init_list(index + 1, brace)
+            else: return None
+        return True
+
+    def _valid_init_list(self, index, brace):
+        """Constructor init list a(1), Base<T>{2}, ... up to the body."""
+        tokens, match = self.tokens, self.match
+        while index < brace:
+            if tokens[index].text == "::": index += 1
+            if index >= brace or tokens[index].kind != "ident": return None
+            index += 1
+            while index < brace and (tokens[index].text in ("::", "<") or (tokens[index].kind == "ident" and tokens[index - 1].text == "::")):
+                index = self._skip_angles(index, brace) if tokens[index].text == "<" else index + 1
+            if index >= brace: return INIT_BRACE # member{ ... the brace being classified
+            if tokens[index].text not in ("(", "{"): return None
+            index = match.get(index, brace) + 1
+            if index < brace and tokens[index].text == "...": index += 1
+            if index < brace:
+                if tokens[index].text != ",": return None
+                index += 1
+        return True
+
+    def _text(self, start, stop):
+        """Source text of tokens [start, stop) with whitespace runs collapsed."""
+        return " ".join(self.content[self.tokens[start].start:self.tokens[stop - 1].end].split())
+
+
+class ScopeIndex:
+    """
+    作用域索引 [LOCKED]
+    Definitions of one file keyed by their last name component, so Read / Define resolve a selector with one
+    dictionary lookup: "Process", "DataProcessor::Process" (matched against the qualified name's tail) or
+    "Process(int, const Item&)" (one overload). braces maps every '{' offset to its '}' offset.
+    content: the text the offsets refer to (not part of the disk layer).
+    """
+    def __init__(self, definitions, braces, content="", declarations=()):
+        self.definitions = definitions
+        self.declarations = list(declarations) # Not looked up by find: Read / Define need a body
+        self.braces = braces
+        self.content = content
+        self._by_name = {}
+        for definition in definitions:
+            self._by_name.setdefault(definition.qualname.rsplit("::", 1)[-1], []).append(definition)
+
+    def overloads(self, selector, kinds=None):
+        """Every Definition matching selector, in file order."""
+        name, params = split_selector(selector)
+        parts = [part for part in name.split("::") if part]
+        if not parts: return []
+        found = []
+        for definition in self._by_name.get(parts[-1], ()):
+            if kinds and definition.kind not in kinds: continue
+            if len(parts) > 1 and definition.qualname.split("::")[-len(parts):] != parts: continue
+            if params is not None and definition.params != params: continue
+            found.append(definition)
+        return found
+
+    def find(self, selector, kinds=None):
+        """First Definition matching selector (see overloads), or None."""
+        found = self.overloads(selector, kinds)
+        return found[0] if found else None
+
+    def enclosing(self, offset):
+        """Innermost Definition whose span holds offset, or None."""
+        inner = None
+        for definition in self.definitions: # Outer before inner
+            if definition.start > offset: break
+            if offset < definition.stop: inner = definition
+        return inner
+
+
+class CppLexer:
+    """
+    C++ 词法缓存 [LOCKED]
+    LexedFile per content snapshot: the Common.read_source text of a file is lexed once, however many
+    lookups the command (or the daemon across commands) makes. get(path) adds ScopeIndex per path, valid while
+    read_source returns the same text, with an optional disk layer ($WINYUNQ_AST_CACHE_DIR, shared with the Python
+    skill) keyed by (path, size, mtime_ns): successive CLI calls on an unchanged file skip lexing for lookups.
+    """
+    MEMORY_LIMIT = 32
+    DISK_ENV = "WINYUNQ_AST_CACHE_DIR"
+    FORMAT_VERSION = 3
+    _memory = {} # content -> LexedFile
+    _indexes = {} # abspath -> (content, ScopeIndex)
+
+    @staticmethod
+    def lex(content):
+        lexed = CppLexer._memory.get(content)
+        if lexed is None:
+            lexed = LexedFile(content)
+            Common._remember(CppLexer._memory, content, lexed, CppLexer.MEMORY_LIMIT)
+        return lexed
+
+    @staticmethod
+    def get(file_path):
+        """ScopeIndex (and .content) of file_path as Common.read_source currently returns it (empty if missing)."""
+        path = os.path.abspath(file_path)
+        key = Common._stat_key(path)
+        content = Common.read_source(path)
+        cached = CppLexer._indexes.get(path)
+        if cached is not None and cached[0] is content: return cached[1]
+
+        index = CppLexer._load_disk(path, key, content)
+        if index is None:
+            index = CppLexer.lex(content).scopes
+            CppLexer._save_disk(path, key, index)
+        Common._remember(CppLexer._indexes, path, (content, index), CppLexer.MEMORY_LIMIT)
+        return index
+
+    # --- Disk Layer ---
+    @staticmethod
+    def _disk_path(path):
+        cache_dir = os.environ.get(CppLexer.DISK_ENV)
+        if not cache_dir: return None
+        return os.path.join(cache_dir, f"{zlib.crc32(path.encode('utf-8')):08x}_{os.path.basename(path)}.scopes.pickle")
+
+    @staticmethod
+    def _load_disk(path, key, content):
+        disk_path = CppLexer._disk_path(path)
+        if not disk_path or key is None: return None
+        try:
+            with open(disk_path, 'rb') as f: version, stored_path, stored_key, records, braces, declarations = pickle.load(f)
+        except Exception: return None # Missing / truncated / other format
+        if (version, stored_path, stored_key) != (CppLexer.FORMAT_VERSION, path, key): return None
+        return ScopeIndex([Definition(*record) for record in records], braces, content, [Declaration(*record) for record in declarations])
+
+    @staticmethod
+    def _save_disk(path, key, index):
+        disk_path = CppLexer._disk_path(path)
+        if not disk_path or key is None: return
+        payload = (CppLexer.FORMAT_VERSION, path, key, [tuple(d) for d in index.definitions], index.braces, [tuple(d) for d in index.declarations])
+        try:
+            os.makedirs(os.path.dirname(disk_path), mode=0o700, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(disk_path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f: pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, disk_path)
+        except OSError: pass # The cache is an optimisation only
@@ -0,0 +1,155 @@
+import os
+import sys
+import json
+import hashlib
+import argparse
+from Common import Common
+from CppLexer import LexedFile, split_selector
+from ReadCode import CppReader
+
+# The database, update and process pool are shared with the Python skill (WinyunqCore/scripts/WinyunqIndex.py)
+CORE_SCRIPTS = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "WinyunqCore", "scripts")
+if CORE_SCRIPTS not in sys.path: sys.path.append(CORE_SCRIPTS)
+from WinyunqIndex import SqliteIndex
+
+TAG_FIELDS = ("path", "name", "qualname", "kind", "params", "role", "access", "start_line", "end_line", "status")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tags (path TEXT, name TEXT, qualname TEXT, kind TEXT, params TEXT, role TEXT, access TEXT,
+                                 start_line INTEGER, end_line INTEGER, status TEXT, short TEXT);
+CREATE INDEX IF NOT EXISTS tags_short ON tags (short, params);
+CREATE INDEX IF NOT EXISTS tags_path ON tags (path);
+CREATE INDEX IF NOT EXISTS tags_status ON tags (status, access, kind);
+"""
+
+def scan_file(full_path):
+    """
+    Worker: lexes one file. Returns (sha1, (tags,), error); tags are row tuples without the path, ending with the
+    short (last :: component) name. Lines are 1-based; role is "definition" ({} body) or "declaration" (;).
+    """
+    try:
+        with open(full_path, 'rb') as f: data = f.read()
+    except OSError as e: return None, ([],), str(e)
+    sha1 = hashlib.sha1(data).hexdigest()
+    try: content = data.decode('utf-8-sig').replace('\r\n', '\n')
+    except UnicodeDecodeError as e: return sha1, ([],), f"{type(e).__name__}: {e}"
+
+    lexed = LexedFile(content)
+    tags = []
+    for role, entries in (("definition", lexed.definitions), ("declaration", lexed.declarations)):
+        for entry in entries:
+            tags.append((entry.name, entry.qualname, entry.kind, entry.params, role, entry.access, entry.line, entry.end_line,
+                         CppReader.doc_status(content, entry.doc_span), entry.qualname.rsplit("::", 1)[-1]))
+    return sha1, (tags,), None
+
+def _same_entity(qualname, other):
+    """Qualified names that may name the same entity: equal, or one is a :: tail of the other (using namespace)."""
+    if qualname == other: return True
+    shorter, longer = sorted((qualname, other), key=len)
+    return longer.endswith("::" + shorter)
+
+
+class ProjectIndex(SqliteIndex):
+    """
+    C++ 项目标签索引 [LOCKED]
+    SQLite tag index (ctags-like) of every C/C++ source and header under the session root: namespace / class /
+    struct / enum / function definitions and declarations with line spans, access and doc lock status, in
+    root/.winyunq/cpp.sqlite (or $WINYUNQ_AST_CACHE_DIR). Declarations are paired with their definitions by qualified
+    name and parameter types. Incremental update / refresh: WinyunqIndex.SqliteIndex.
+    """
+    NAME = "cpp"
+    SCHEMA = SCHEMA
+    SCHEMA_VERSION = 2
+    TABLES = ("tags",)
+    EXTENSIONS = (".h", ".hh", ".hpp", ".hxx", ".c", ".cc", ".cpp", ".cxx")
+    SKIP_DIRS = {"node_modules", "build", "dist", "out", "third_party", "CMakeFiles"}
+    scan_file = staticmethod(scan_file)
+
+    def __init__(self, root=None, db_path=None):
+        super().__init__(root or Common.load_state().get("root") or os.getcwd(), db_path)
+
+    # --- Queries ---
+    def _rows(self, where, args=()):
+        rows = self.conn.execute(f"SELECT {', '.join(TAG_FIELDS)} FROM tags WHERE {where} ORDER BY path, start_line", args)
+        return [dict(zip(TAG_FIELDS, row)) for row in rows]
+
+    def tags(self, selector, role=None):
+        """
+        [{path, name, qualname, kind, params, role, access, start_line, end_line, status}] for selector:
+        "AddRecord", "DataProcessor::AddRecord" (tail of the qualified name) or "AddRecord(int)". role: definition / declaration.
+        """
+        name, params = split_selector(selector)
+        parts = [part for part in name.split("::") if part]
+        if not parts: return []
+        where, args = "short = ?", [parts[-1]]
+        if params is not None: where, args = where + " AND params = ?", args + [params]
+        if role: where, args = where + " AND role = ?", args + [role]
+        return [row for row in self._rows(where, args) if len(parts) == 1 or row["qualname"].split("::")[-len(parts):] == parts]
+
+    def pairs(self, selector=None):
+        """
+        Function declarations with their definitions: [{qualname, params, declaration, definition}] (rows or None).
+        Definitions without a declaration are listed with declaration None. selector limits to matching functions.
+        """
+        rows = self.tags(selector) if selector else self._rows("kind = 'function'")
+        declarations = [row for row in rows if row["kind"] == "function" and row["role"] == "declaration"]
+        definitions = {}
+        for row in rows:
+            if row["kind"] == "function" and row["role"] == "definition":
+                definitions.setdefault((row["qualname"].rsplit("::", 1)[-1], row["params"]), []).append(row)
+
+        pairs, used = [], set()
+        for declaration in declarations:
+            candidates = definitions.get((declaration["qualname"].rsplit("::", 1)[-1], declaration["params"]), [])
+            definition = next((d for d in candidates if _same_entity(declaration["qualname"], d["qualname"])), None)
+            if definition: used.add(id(definition))
+            pairs.append({"qualname": declaration["qualname"], "params": declaration["params"], "declaration": declaration, "definition": definition})
+        for candidates in definitions.values():
+            for definition in candidates:
+                if id(definition) not in used and "::" in definition["name"]: # Out-of-class definition with no declaration found
+                    pairs.append({"qualname": definition["qualname"], "params": definition["params"], "declaration": None, "definition": definition})
+        return pairs
+
+    def undocumented(self, access="public", kinds=("function",)):
+        """Entities without any doc comment (status MISSING) with the given access, e.g. every undocumented public method."""
+        marks = ", ".join("?" for _ in kinds)
+        return self._rows(f"status = 'MISSING' AND access = ? AND kind IN ({marks})", [access] + list(kinds))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="项目级 C++ 标签索引 (SQLite)")
+    subparsers = parser.add_subparsers(dest="command")
+    p_update = subparsers.add_parser("Update", help="增量更新索引")
+    p_update.add_argument("--root", help="默认: SetTarget 的 Root")
+    p_update.add_argument("-j", "--workers", type=int)
+    p_def = subparsers.add_parser("Definition", help="查询声明/定义位置 (JSON)")
+    p_def.add_argument("name", help="AddRecord / DataProcessor::AddRecord / AddRecord(int)")
+    p_def.add_argument("--root")
+    p_pair = subparsers.add_parser("Pairs", help="声明与定义配对 (JSON)")
+    p_pair.add_argument("name", nargs="?")
+    p_pair.add_argument("--root")
+    p_doc = subparsers.add_parser("Undocumented", help="缺少文档的实体 (JSON)")
+    p_doc.add_argument("--access", default="public", choices=("public", "protected", "private", ""))
+    p_doc.add_argument("--kind", action="append", help="默认: function")
+    p_doc.add_argument("--root")
+
+    for query_parser in (p_def, p_pair, p_doc):
+        query_parser.add_argument("--refresh", action="store_true", help="先完整更新索引 (默认: 距上次更新超过 30 秒才更新)")
+
+    args = parser.parse_args(argv)
+    if not args.command: parser.print_help(); return 1
+    index = ProjectIndex(args.root)
+    try:
+        if args.command == "Update" or args.refresh: stats = index.update(getattr(args, "workers", None))
+        else: index.refresh()
+        if args.command == "Update":
+            print(f"[ProjectIndex] {index.db_path}: {json.dumps(stats)}")
+            for path, error in index.errors().items(): print(f"  跳过 {path}: {error}")
+        elif args.command == "Definition": print(json.dumps(index.tags(args.name), indent=2, ensure_ascii=False))
+        elif args.command == "Pairs": print(json.dumps(index.pairs(args.name), indent=2, ensure_ascii=False))
+        elif args.command == "Undocumented": print(json.dumps(index.undocumented(args.access, tuple(args.kind or ("function",))), indent=2, ensure_ascii=False))
+    finally:
+        index.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
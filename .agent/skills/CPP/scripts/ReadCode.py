@@ -1,9 +1,12 @@
+import io
 import os
 import sys
 import argparse
-import re
 import json
 from Common import Common
+from CppLexer import CppLexer
+
+SYMBOL_KINDS = ("class", "struct", "union", "enum") # Listed besides functions (namespaces are not)
 
 class CppReader:
     """
@@ -14,65 +17,99 @@ class CppReader:
         self.file_path, self.scope = Common.get_full_target() if use_target else (None, None)
 
     def _read_content(self):
-        if not self.file_path or not os.path.exists(self.file_path): return ""
-        with open(self.file_path, 'r', encoding='utf-8') as f: return f.read()
+        if not self.file_path: return ""
+        return Common.read_source(self.file_path)
+
+    @staticmethod
+    def symbol_entry(definition):
+        """JSON-ready {name, qualname, type, (return_type, params), line} of a CppLexer Definition."""
+        entry = {"name": definition.name, "qualname": definition.qualname, "type": definition.kind}
+        if definition.kind == "function": entry.update(return_type=definition.return_type, params=definition.params)
+        entry["line"] = definition.line
+        return entry
+
+    @staticmethod
+    def scan_symbols(content, index=None):
+        """
+        Classes and Functions in content (CppLexer scope index: braces in strings / comments are not counted).
+        Returns [{name, qualname, type, (return_type, params), line, offset}] in file order (offset: char index of the header).
+        """
+        index = index or CppLexer.lex(content).scopes
+        return [dict(CppReader.symbol_entry(d), offset=d.start) for d in index.definitions if d.kind == "function" or d.kind in SYMBOL_KINDS]
 
     def list_symbols(self):
         """
-        Lists Classes and Functions in the file using Regex.
+        Lists Classes and Functions in the file.
         Returns JSON list.
         """
         if not self.file_path: return
-        content = self._read_content()
-        symbols = []
-        
-        # 1. Classes / Structs
-        # class Name { or struct Name {
-        class_pattern = re.compile(r'\b(class|struct)\s+(\w+)\s*(?::[^\{]*)?\{')
-        for m in class_pattern.finditer(content):
-            symbols.append({"name": m.group(2), "type": m.group(1), "line": content[:m.start()].count('\n')+1})
-            
-        # 2. Functions
-        # Type name(Args) {
-        # Exclude regex matches inside strings or comments? Simple regex is flawed but acceptable for now.
-        # \w+ \w+\(  --> Type Name(
-        func_pattern = re.compile(r'\b(\w[\w:<>,]*[*&]?)\s+(\w+)\s*\([^)]*\)\s*(?:const)?\s*(?::[^\{]*)?\{')
-        for m in func_pattern.finditer(content):
-            # Filter keyword hits like "if (", "while ("
-            name = m.group(2)
-            if name not in ["if", "while", "for", "switch", "catch"]:
-                 symbols.append({"name": name, "type": "function", "return_type": m.group(1), "line": content[:m.start()].count('\n')+1})
-        
-        symbols.sort(key=lambda x: x['line'])
-        print(json.dumps(symbols, indent=2))
+        index = CppLexer.get(self.file_path)
+        symbols = self.scan_symbols(index.content, index)
+        print(json.dumps([{k: v for k, v in s.items() if k != "offset"} for s in symbols], indent=2))
+
+    @staticmethod
+    def find_block(content, name, index=None):
+        """
+        (start, stop) char span of the function/class block for name (header through the matching '}'), or None.
+        name: "Process", "DataProcessor::Process" or "Process(int, const Item&)" for one overload.
+        """
+        definition = (index or CppLexer.lex(content).scopes).find(name)
+        return (definition.start, definition.stop) if definition else None
+
+    @staticmethod
+    def doc_status(content, doc_span):
+        """Lock status of a definition's doc comment (Definition.doc_span): LOCKED / DRAFT / MISSING."""
+        if not doc_span: return "MISSING"
+        return "LOCKED" if Common.lock_verdict(content, *doc_span) == Common.LOCKED else "DRAFT"
 
     def read_block(self, name):
         """
-        Reads the code block for a specific function/class.
+        Reads the code block for a specific function/class: one scope-index lookup and a slice.
         """
         if not self.file_path: return
-        content = self._read_content()
-        
-        # Brace counting logic similar to WriteCode
-        pattern = re.compile(rf'\b{re.escape(name)}\s*(?:\(.*\)|{{)') # Match func( or class {
-        match = pattern.search(content)
-        if not match:
-             # Try simple text match?
-             pass
-        else:
-             # Just heuristic: find '{' after match
-             brace_idx = content.find('{', match.end()-1) # Search near end
-             if brace_idx != -1:
-                 cnt = 1
-                 for i in range(brace_idx+1, len(content)):
-                     if content[i] == '{': cnt+=1
-                     elif content[i] == '}': cnt-=1
-                     if cnt == 0:
-                         print(content[match.start() : i+1])
-                         return
-        print(f"Block '{name}' not found.")
+        index = CppLexer.get(self.file_path)
+        definition = index.find(name)
+        if definition: print(index.content[definition.start:definition.stop])
+        else: print(f"Block '{name}' not found.")
 
-if __name__ == "__main__":
+    # --- Batch ---
+    def query(self, content, query, index=None):
+        """
+        Answers one query against a content snapshot (index: its ScopeIndex). Returns a JSON-ready dict.
+        query: {"op": "Read", "name": ...} / {"op": "List"}, or a bare name (= Read).
+        """
+        index = index or CppLexer.lex(content).scopes
+        if isinstance(query, str): query = {"op": "Read", "name": query}
+        op = query.get("op", "Read")
+        if op == "List":
+            return {"op": op, "symbols": [dict(self.symbol_entry(d), status=self.doc_status(content, d.doc_span))
+                                          for d in index.definitions if d.kind == "function" or d.kind in SYMBOL_KINDS]}
+        name = query.get("name")
+        result = {"op": op, "name": name}
+        if op != "Read": return dict(result, error=f"Unknown op: {op}")
+        if not name: return dict(result, error="Missing name")
+        found = index.overloads(name)
+        result["found"] = bool(found)
+        if found:
+            definition = found[0]
+            result.update({"qualname": definition.qualname, "span": [definition.line, definition.end_line], # 1-based, inclusive
+                           "status": self.doc_status(content, definition.doc_span), "code": content[definition.start:definition.stop]})
+            if len(found) > 1: result["overloads"] = [d.qualname + d.params for d in found]
+        return result
+
+    def batch(self, queries):
+        """Runs every query against one snapshot of the target file (one read, one scope index). Returns a list of results."""
+        if not self.file_path: return [{"error": "No target set"}]
+        index = CppLexer.get(self.file_path)
+        return [self.query(index.content, query, index) for query in queries]
+
+def load_queries(text):
+    """Queries as a JSON array, or JSONL (one query per line). A query is an object or a bare name."""
+    text = text.strip()
+    if text.startswith("["): return json.loads(text)
+    return [json.loads(line) if line.strip().startswith("{") else line.strip() for line in text.splitlines() if line.strip()]
+
+def build_parser():
     parser = argparse.ArgumentParser()
     subparsers = parser.add_subparsers(dest="command")
     
@@ -81,8 +118,30 @@ if __name__ == "__main__":
     p_read = subparsers.add_parser("Read")
     p_read.add_argument("name")
 
-    args = parser.parse_args()
+    p_batch = subparsers.add_parser("Batch", help="批量查询 (一次读取, JSON 输出)")
+    p_batch.add_argument("queries", nargs="?", default="-", help="JSON/JSONL 文件, 默认 stdin")
+    p_batch.add_argument("--jsonl", action="store_true", help="每行一个结果")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
     reader = CppReader()
     
     if args.command == "List": reader.list_symbols()
     elif args.command == "Read": reader.read_block(args.name)
+    elif args.command == "Batch":
+        if args.queries == "-": text = sys.stdin.read()
+        else:
+            with open(args.queries, 'r', encoding='utf-8') as f: text = f.read()
+        results = reader.batch(load_queries(text))
+        if args.jsonl: print("\n".join(json.dumps(r, ensure_ascii=False) for r in results))
+        else: print(json.dumps(results, indent=2, ensure_ascii=False))
+        return 1 if any("error" in r for r in results) else 0
+
+if __name__ == "__main__":
+    from Daemon import forward
+    args = build_parser().parse_args()
+    stdin = sys.stdin.read() if args.command == "Batch" and args.queries == "-" else None # The daemon has no access to our stdin
+    code = forward("ReadCode", sys.argv[1:], stdin)
+    if code is None and stdin is not None: sys.stdin = io.StringIO(stdin)
+    sys.exit(main() if code is None else code)
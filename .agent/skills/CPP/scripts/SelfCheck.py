@@ -0,0 +1,65 @@
+import os
+import sys
+import tempfile
+from Common import Common
+from CppLexer import LexedFile, signature, tokenize
+from WriteCode import CppWriter
+from UnlockGUI import inject_unlock_tag
+
+# (source, Define name, expected file after Define with REPLACEMENT): code around the definition must survive
+REPLACEMENT = "void replaced() { }"
+DEFINE_CASES = [
+    # Semicolon-less macro line above the function
+    ("IMPLEMENT_DYNAMIC(Widget, CWnd)\nvoid Widget::hide() { }\n", "hide",
+     "IMPLEMENT_DYNAMIC(Widget, CWnd)\nvoid replaced() { }\n"),
+    # Function-try-block: the handler belongs to tryfn, not to the next definition
+    ("void tryfn() try { risky(); } catch (...) { recover(); }\nint other() { return 2; }\n", "other",
+     "void tryfn() try { risky(); } catch (...) { recover(); }\nvoid replaced() { }\n"),
+    ("void tryfn() try { risky(); } catch (...) { recover(); }\nint other() { return 2; }\n", "tryfn",
+     "void replaced() { }\nint other() { return 2; }\n"),
+]
+# (source, qualname, return_type, params) of the first definition
+HEADER_CASES = [
+    ("void ::a::b::Box<int>::extra(char buf[16], int(*cb)(int)) {}\n", "a::b::Box::extra", "void", "(char[16], int(*)(int))"),
+    ("Foo::Bar f::g() {}\n", "f::g", "Foo::Bar", "()"),
+]
+SIGNATURE_CASES = [("char name[16]", "(char[16])"), ("int (&values)[3]", "(int(&)[3])"), ("void (Widget::*handler)(int)", "(void(Widget::*)(int))")]
+
+def check_bom_global_unlock():
+    """Global unlock on a UTF-8-BOM header: tag after the single BOM, file unlocked, second call a no-op. Returns failures."""
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "Bom.hpp")
+        with open(path, 'wb') as f: f.write(b"\xef\xbb\xbf/** @brief Locked */\nvoid f();\n")
+        inject_unlock_tag(path)
+        with open(path, 'rb') as f: first = f.read()
+        expected = b"\xef\xbb\xbf" + Common.GLOBAL_UNLOCK.encode() + b"\n/** @brief Locked */\nvoid f();\n"
+        if first != expected: failures.append(f"Global unlock on BOM file: {first!r}")
+        if Common.is_locked(Common.read_source(path), True): failures.append("Global unlock on BOM file: still locked")
+        inject_unlock_tag(path)
+        with open(path, 'rb') as f:
+            if f.read() != first: failures.append("Global unlock on BOM file: second call changed the file")
+    return failures
+
+def main(argv=None):
+    """Lexer / Define / global-unlock regression checks (no target file needed). Exit code 1 if any check fails."""
+    failures = []
+    writer = CppWriter(use_target=False)
+    for source, name, expected in DEFINE_CASES:
+        edit, message = writer.plan_define(source, name, REPLACEMENT)
+        result = Common.apply_edits(source, [edit]) if edit else message
+        if result != expected: failures.append(f"Define {name} on {source!r}: {result!r}")
+    for source, qualname, return_type, params in HEADER_CASES:
+        definition = LexedFile(source).definitions[0]
+        got = (definition.qualname, definition.return_type, definition.params)
+        if got != (qualname, return_type, params): failures.append(f"Header of {source!r}: {got}")
+    for params, expected in SIGNATURE_CASES:
+        if signature(tokenize(params)) != expected: failures.append(f"signature({params!r}): {signature(tokenize(params))}")
+    failures += check_bom_global_unlock()
+
+    for failure in failures: print(f"[FAIL] {failure}")
+    print(f"[SelfCheck] {len(DEFINE_CASES) + len(HEADER_CASES) + len(SIGNATURE_CASES) + 1 - len(failures)} passed, {len(failures)} failed")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+import os
+import sys
+import json
+import argparse
+from Common import Common
+from CppLexer import CppLexer
+from WriteCode import CppWriter
+from AutomaticDocument import DocumentManager
+
+class EditTransaction:
+    """
+    多编辑事务 [LOCKED]
+    Queues Declare/Define/Write edits for one C++ file and applies them together:
+    one read, one scope index (CppLexer), a lock check per defined function and one atomic write (Common.write_if_changed).
+    Every edit is planned against the same snapshot (character offsets), so offsets never drift between edits.
+    """
+    LOCKED_OPS = ("Define",) # Ops whose target function must pass Common.enforce_lock
+
+    def __init__(self, file_path=None):
+        self.file_path = file_path or Common.get_full_target()[0]
+        self._writer = CppWriter(use_target=False)
+        self._ops = [] # (op, kwargs)
+        self._shred_paths = []
+
+    def _queue_code(self, code_arg):
+        code, shred_path = self._writer._resolve_code_input(code_arg)
+        if shred_path: self._shred_paths.append(shred_path) # Only removed once the commit succeeds
+        return code
+
+    # --- Queue ---
+    def declare(self, code):
+        self._ops.append(("Declare", {"code": self._queue_code(code)}))
+        return self
+
+    def define(self, name, code, mode="overwrite"):
+        self._ops.append(("Define", {"name": name, "code": self._queue_code(code), "mode": mode}))
+        return self
+
+    def write_doc(self, selector, data):
+        self._ops.append(("Write", {"selector": selector, "json_data": data}))
+        return self
+
+    def queue(self, op, **fields):
+        """Queues one batch record: op is Declare / Define / Write (WriteCode/AutomaticDocument names)."""
+        if op == "Declare": return self.declare(fields["code"])
+        if op == "Define": return self.define(fields["name"], fields["code"], fields.get("mode", "overwrite"))
+        if op == "Write": return self.write_doc(fields["selector"], fields.get("data", {}))
+        # CheckStyle.promote is not implemented for C++ yet
+        raise ValueError(f"Unsupported op: {op}")
+
+    # --- Commit ---
+    def commit(self):
+        """
+        Plans every queued edit against one snapshot and writes the file once.
+        All-or-nothing: if any edit fails (not found, overlap) nothing is written.
+        Returns (success, messages).
+        """
+        if not self.file_path: return False, ["No target set"]
+        if not self._ops: return True, []
+        index = CppLexer.get(self.file_path)
+        content = index.content
+        for op, kwargs in self._ops:
+            if op not in self.LOCKED_OPS: continue
+            try: Common.enforce_lock(self.file_path, CppWriter.lock_span(index, kwargs["name"]))
+            except PermissionError as e: return False, [str(e)]
+        documents = DocumentManager(self.file_path, content=content)
+        edits, messages, declared = [], [], []
+        success = True
+        for op, kwargs in self._ops:
+            if op == "Declare":
+                edit, message = self._writer.plan_declare(content, kwargs["code"], declared)
+                declared.append(kwargs["code"])
+            elif op == "Define":
+                edit, message = self._writer.plan_define(content, index=index, **kwargs)
+            else: # Write
+                edit, message = documents.plan_write_comment(**kwargs)
+            messages.append(f"{op}: {message}")
+            if edit is None: success = False
+            else: edits.append(edit)
+        if not success: return False, messages + ["Aborted: file not modified."]
+
+        try:
+            new_content = Common.apply_edits(content, edits)
+        except ValueError as e:
+            return False, messages + [f"Conflict: {e}", "Aborted: file not modified."]
+        written = Common.write_if_changed(self.file_path, new_content)
+        messages.append(f"Success: {len(self._ops)} edit(s) committed." if written else "No changes (file not touched).")
+        for shred_path in self._shred_paths:
+            try: os.remove(shred_path); messages.append(f"Shredded: {shred_path}")
+            except OSError: pass
+        self._ops, self._shred_paths = [], []
+        return True, messages
+
+
+def run_batch(batch_path, default_file=None):
+    """
+    Applies a JSONL batch: one {"op": ..., "file": optional, ...op fields} record per line.
+    Records are grouped per file (in order) and each file is committed as one transaction.
+    Returns True if every transaction succeeded.
+    """
+    transactions = {}
+    with open(batch_path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip(): continue
+            record = json.loads(line)
+            file_path = record.pop("file", None) or default_file or Common.get_full_target()[0]
+            if not file_path: raise ValueError(f"{batch_path}:{line_number}: no file and no target set")
+            key = os.path.abspath(file_path)
+            if key not in transactions: transactions[key] = EditTransaction(file_path)
+            transactions[key].queue(record.pop("op"), **record)
+
+    all_ok = True
+    for file_path, transaction in transactions.items():
+        success, messages = transaction.commit()
+        print(f"[{'OK' if success else 'FAILED'}] {file_path}")
+        for message in messages: print(f"  {message}")
+        all_ok = all_ok and success
+    return all_ok
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command")
+    p_batch = subparsers.add_parser("Batch", help="JSONL: {\"op\": \"Define\", \"name\": ..., \"code\": ...} per line")
+    p_batch.add_argument("batch_file")
+    p_batch.add_argument("--file", help="Default target (else SetTarget's file)")
+
+    args = parser.parse_args(argv)
+    if args.command == "Batch": return 0 if run_batch(args.batch_file, args.file) else 1
+    else: parser.print_help()
+
+if __name__ == "__main__":
+    from Daemon import forward
+    code = forward("Transaction", sys.argv[1:])
+    sys.exit(main() if code is None else code)
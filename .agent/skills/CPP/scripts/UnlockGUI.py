@@ -1,75 +1,61 @@
 import os
 import sys
 import argparse
-import re
 import tkinter as tk
 from tkinter import messagebox
 from Common import Common
+from CppLexer import CppLexer
 
 def inject_unlock_tag(file_path, function_name=None):
     """
     Injects [Unlock] tag into C++ files.
     """
     if not os.path.exists(file_path): return False
-    with open(file_path, 'r', encoding='utf-8') as f: content = f.read()
+    content = Common.read_source(file_path)
 
-    # If no function name, Global Unlock
+    # If no function name, Global Unlock (function-level [Unlock] tags elsewhere do not count)
     if not function_name:
-        if "[Unlock]" not in content:
-            new_content = "// [Unlock]\n" + content
-            with open(file_path, 'w', encoding='utf-8') as f: f.write(new_content)
+        if not Common.globally_unlocked(content):
+            # Tag goes before the text, after the BOM: write_if_changed writes the BOM back once
+            new_content = Common.GLOBAL_UNLOCK + "\n" + (content[1:] if content.startswith('\ufeff') else content)
+            Common.write_if_changed(file_path, new_content)
             print("Global Unlock Injection Success.")
             return True
         return True
 
-    # Locate Function
-    # Use simpler regex than WriteCode for robust loose matching
-    # Look for "name("
-    pattern = re.compile(rf'\b{re.escape(function_name)}\s*\(', re.DOTALL)
-    match = pattern.search(content)
-    
-    if not match:
-        print(f"Function {function_name} not found. Fallback to global unlock?")
-        # Fallback to global
-        return inject_unlock_tag(file_path, None)
-        
-    start_idx = match.start()
-    
-    # Check preceding lines for comments
-    # We want to find the END of the comment block immediately before start_idx
-    
-    # Strategy: inject `[Unlock]` into the line above start_idx?
-    # Or strict comment structure?
-    
-    # Simple: Just insert `// [Unlock]` line before the function definition.
-    # This satisfies Common.is_locked() check which looks for [Unlock] anywhere in file/block?
-    # Wait, Common.is_locked returned False if "[Unlock]" is IN CONTENT.
-    # My Common.py (Step 334) implementation:
-    # if "[Unlock]" in content: return False
-    
-    # So actually, putting it ANYWHERE works.
-    # But for "Style", putting it in the docstring is best.
-    
-    # Let's try to put it inside /** */ if exists key.
-    
-    preceding = content[:start_idx]
-    if '*/' in preceding:
-        # Might be the docstring.
-        last_comment_end = preceding.rfind('*/')
-        # Check distance
-        distance = content[last_comment_end+2 : start_idx]
-        if not distance.strip(): # Only whitespace between comment and func
-            # Inject inside
-            new_content = content[:last_comment_end] + " [Unlock]" + content[last_comment_end:]
-            with open(file_path, 'w', encoding='utf-8') as f: f.write(new_content)
-            print(" injected into Docstring.")
-            return True
+    # Locate Function: its definition, else the first "name(" in code (declaration).
+    # CppLexer tokens: hits inside comments and strings are not considered.
+    lexed = CppLexer.lex(content)
+    definition = lexed.find(function_name, ("function",))
+    if definition and definition.doc_span and content.startswith("///", definition.doc_span[0]):
+        # A line between the /// run and the function would detach the doc (LexedFile.doc_above): tag its last line instead
+        doc_end = definition.doc_span[1]
+        Common.write_if_changed(file_path, Common.apply_edits(content, [(doc_end, doc_end, " [Unlock]")]))
+        print(" injected into /// doc.")
+        return True
+    if definition: start_idx = definition.start
+    else:
+        tokens = lexed.tokens
+        hit = next((t for i, t in enumerate(tokens[:-1]) if t.kind == "ident" and t.text == function_name and tokens[i + 1].text == "("), None)
+        if not hit:
+            print(f"Function {function_name} not found. Fallback to global unlock?")
+            # Fallback to global
+            return inject_unlock_tag(file_path, None)
+        start_idx = lexed.line_start(lexed.line_of(hit.start))
+
+    # Common.lock_verdict() treats "[Unlock]" in the doc comment or on the line above as unlocked, so either placement works;
+    # for "Style" it goes inside the /* */ docstring directly above when there is one.
+    span = lexed.comment_before(start_idx)
+    if span and content[span[0]:span[1]].endswith('*/') and not content[span[1]:start_idx].strip():
+        last_comment_end = span[1] - 2
+        new_content = content[:last_comment_end] + " [Unlock]" + content[last_comment_end:]
+        Common.write_if_changed(file_path, new_content)
+        print(" injected into Docstring.")
+        return True
 
     # Else insert // [Unlock] above
-    lines = content.splitlines()
-    line_idx = content[:start_idx].count('\n')
-    lines.insert(line_idx, "// [Unlock]")
-    with open(file_path, 'w', encoding='utf-8') as f: f.write("\n".join(lines))
+    line_start = lexed.line_start(lexed.line_of(start_idx))
+    Common.write_if_changed(file_path, Common.apply_edits(content, [(line_start, line_start, "// [Unlock]\n")]))
     print("Injected // [Unlock] tag.")
     return True
 
@@ -1,24 +1,24 @@
 import os
 import sys
 import argparse
-import re
 from Common import Common
+from CppLexer import CppLexer
 
 class CppWriter:
     """
     C++ 代码写入器 [LOCKED]
-    支持基于 Regex/Brace-Counting 的 C++ 代码 Declare/Define 操作。
+    支持基于 CppLexer (词法 + 括号匹配) 的 C++ 代码 Declare/Define 操作。
     """
     
     def __init__(self, use_target=True):
         self.file_path, self.scope = Common.get_full_target() if use_target else (None, None)
 
     def _read_content(self):
-        if not self.file_path or not os.path.exists(self.file_path): return ""
-        with open(self.file_path, 'r', encoding='utf-8') as f: return f.read()
+        if not self.file_path: return ""
+        return Common.read_source(self.file_path)
 
     def _write_content(self, content):
-        with open(self.file_path, 'w', encoding='utf-8') as f: f.write(content)
+        return Common.write_if_changed(self.file_path, content)
 
     def _resolve_code_input(self, code_input):
         # Support Gemini autoshred
@@ -31,82 +31,94 @@ class CppWriter:
             except: return code_input, None
         return code_input.replace("\\n", "\n"), None
 
-    def _find_function_block(self, content, name):
-        # Regex to find function definition header: name(...) {
-        # Fragile heuristic but fits Agent usage
-        pattern = re.compile(rf'\b{re.escape(name)}\s*\(.*?\)[^{{]*\{{', re.DOTALL)
-        match = pattern.search(content)
-        if not match: return None
-        
-        start_idx = match.start()
-        brace_start = match.end() - 1 
-        
-        cnt = 1
-        end_idx = -1
-        # Simple brace counting
-        for i in range(brace_start + 1, len(content)):
-            if content[i] == '{': cnt += 1
-            elif content[i] == '}': cnt -= 1
-            if cnt == 0:
-                end_idx = i + 1
-                break
-        
-        if end_idx != -1: return (start_idx, end_idx)
-        return None
+    def _find_function_block(self, content, name, index=None):
+        """
+        (start, stop) char span of the definition of function name: header through the matching '}', or None.
+        One ScopeIndex lookup; name may be qualified (DataProcessor::Process) or pick an overload (Process(int)).
+        """
+        definition = (index or CppLexer.lex(content).scopes).find(name, ("function",))
+        return (definition.start, definition.stop) if definition else None
+
+    @staticmethod
+    def lock_span(index, name):
+        """(start, stop) of function name's doc comment through its '}': the span Common.enforce_lock checks for Define, or None."""
+        definition = index.find(name, ("function",))
+        if not definition: return None
+        return (definition.doc_span[0] if definition.doc_span else definition.start, definition.stop)
+
+    def plan_declare(self, content, code, pending=()):
+        """
+        Plans a Declare against a content snapshot without touching the file.
+        pending: code already declared by earlier edits of the same transaction.
+        Returns (edit, message): edit = (start_char, stop_char, new_text); an empty insertion when skipped.
+        """
+        if code.strip() in content or any(code.strip() in other for other in pending):
+            return (len(content), len(content), ""), "Skipped: Code already exists."
+        return (len(content), len(content), "\n" + code + "\n"), "Success: Appended declaration."
 
     def declare(self, code_arg):
         code, shred = self._resolve_code_input(code_arg)
         if not self.file_path: return
 
         current = self._read_content()
-        if code.strip() in current:
-             print("Skipped: Code already exists.")
-        else:
-             with open(self.file_path, 'a', encoding='utf-8') as f:
-                 f.write("\n" + code + "\n")
-             print(f"Success: Appended declaration.")
+        edit, message = self.plan_declare(current, code)
+        self._write_content(Common.apply_edits(current, [edit]))
+        print(message)
 
         if shred:
             try: os.remove(shred)
             except: pass
 
-    def define(self, name, code_arg, mode="overwrite"):
-        code, shred = self._resolve_code_input(code_arg)
-        if not self.file_path: return
-        
-        try: Common.enforce_lock(self.file_path)
-        except PermissionError as e: print(e); return
-        
-        content = self._read_content()
-        span = self._find_function_block(content, name)
+    def plan_define(self, content, name, code, mode="overwrite", index=None):
+        """
+        Plans a Define against a content snapshot (index: its ScopeIndex, if already built) without touching the file.
+        Returns (edit, message): edit = (start_char, stop_char, new_text) or None on error.
+        """
+        span = self._find_function_block(content, name, index)
         
         if not span:
             # Fallback: Just append if define not found? Or Error?
             # User might want to add new definition.
             # But 'Define' implies existing or specific placement. 'Declare' is generic append.
             # Let's error for safety.
-            print(f"Error: Function {name} not found for definition override.")
-            return
+            return None, f"Error: Function {name} not found for definition override."
 
         s, e = span
-        if mode == "overwrite":
-            new_content = content[:s] + code + content[e:]
-            self._write_content(new_content)
-            print("Success: Function definition overwritten.")
+        if mode == "overwrite": return (s, e, code), "Success: Function definition overwritten."
+        return None, f"Error: Unknown mode '{mode}'."
+
+    def define(self, name, code_arg, mode="overwrite"):
+        code, shred = self._resolve_code_input(code_arg)
+        if not self.file_path: return
+        
+        index = CppLexer.get(self.file_path)
+        content = index.content
+        try: Common.enforce_lock(self.file_path, self.lock_span(index, name)) # Only the function being replaced
+        except PermissionError as e: print(e); return
+
+        edit, message = self.plan_define(content, name, code, mode, index)
+        if edit is None: print(message); return
+        if self._write_content(Common.apply_edits(content, [edit])): print(message)
+        else: print("Success: Function definition already up to date (file not touched).")
         
         if shred:
             try: os.remove(shred)
             except: pass
 
-if __name__ == "__main__":
+def main(argv=None):
     parser = argparse.ArgumentParser()
     subparsers = parser.add_subparsers(dest="command")
     
     p_dec = subparsers.add_parser("Declare"); p_dec.add_argument("code")
     p_def = subparsers.add_parser("Define"); p_def.add_argument("name"); p_def.add_argument("code"); p_def.add_argument("--mode", default="overwrite")
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     writer = CppWriter()
     
     if args.command == "Declare": writer.declare(args.code)
     elif args.command == "Define": writer.define(args.name, args.code, args.mode)
+
+if __name__ == "__main__":
+    from Daemon import forward
+    code = forward("WriteCode", sys.argv[1:])
+    sys.exit(main() if code is None else code)
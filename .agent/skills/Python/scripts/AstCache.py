@@ -0,0 +1,146 @@
+import os
+import ast
+import sys
+import zlib
+import pickle
+import tempfile
+from collections import deque, namedtuple
+from Common import Common
+
+# One record per def / class: enough for lookups, exact spans and doc status without keeping the tree.
+# Lines are 1-based like ast; doc_span is the docstring statement as 0-based half-open (start, stop) or None.
+Symbol = namedtuple("Symbol", "name qualname kind lineno col_offset end_lineno decorator_lineno body_lineno doc doc_span params")
+DEF_TYPES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+FUNCTION_KINDS = ("FunctionDef", "AsyncFunctionDef")
+
+def _docstring_node(node):
+    if node.body and isinstance(node.body[0], ast.Expr) and isinstance(node.body[0].value, ast.Constant) \
+            and isinstance(node.body[0].value.value, str):
+        return node.body[0]
+    return None
+
+def _make_symbol(node, qualname):
+    doc_node = _docstring_node(node)
+    params = tuple(a.arg for a in node.args.args if a.arg != 'self') if not isinstance(node, ast.ClassDef) else ()
+    return Symbol(node.name, qualname, type(node).__name__, node.lineno, node.col_offset, node.end_lineno,
+                  min([d.lineno for d in node.decorator_list] + [node.lineno]), node.body[0].lineno,
+                  ast.get_docstring(node), (doc_node.lineno - 1, doc_node.end_lineno) if doc_node else None, params)
+
+
+class SymbolIndex:
+    """
+    符号索引 [LOCKED]
+    name / qualified name (Class.method) -> Symbol, built in one walk over the tree.
+    A plain name resolves to the first match in ast.walk order (outermost first), like the old scans.
+    """
+    def __init__(self, symbols):
+        self.symbols = symbols # ast.walk order
+        self._by_name, self._by_qualname = {}, {}
+        for symbol in symbols:
+            self._by_name.setdefault(symbol.name, []).append(symbol)
+            self._by_qualname.setdefault(symbol.qualname, symbol)
+
+    @classmethod
+    def from_tree(cls, tree):
+        symbols = []
+        queue = deque([(tree, "")]) # (node, qualname prefix): same breadth-first order as ast.walk
+        while queue:
+            node, prefix = queue.popleft()
+            for child in ast.iter_child_nodes(node):
+                if isinstance(child, DEF_TYPES):
+                    symbols.append(_make_symbol(child, prefix + child.name))
+                    queue.append((child, prefix + child.name + "."))
+                else: queue.append((child, prefix))
+        return cls(symbols)
+
+    def find(self, name, kinds=None):
+        """Symbol by name or qualified name ("Class.method"), optionally limited to kinds. None if missing."""
+        if "." in name:
+            symbol = self._by_qualname.get(name)
+            return symbol if symbol and (not kinds or symbol.kind in kinds) else None
+        return next((s for s in self._by_name.get(name, ()) if not kinds or s.kind in kinds), None)
+
+    def names(self):
+        return set(self._by_name)
+
+    def within(self, start, stop):
+        """Symbols whose definition lies inside the 0-based half-open line range."""
+        return [s for s in self.symbols if start <= s.lineno - 1 and s.end_lineno <= stop]
+
+    @staticmethod
+    def span(symbol, decorators=False):
+        """Exact 0-based half-open line range of a definition (from end_lineno, not indentation)."""
+        return ((symbol.decorator_lineno if decorators else symbol.lineno) - 1, symbol.end_lineno)
+
+
+class ParsedFile:
+    """Content, lines and symbol index of one file; the tree is parsed on first use (e.g. references)."""
+    def __init__(self, path, content, index=None, tree=None):
+        self.path = path
+        self.content = content
+        self.lines = content.splitlines()
+        self._tree = tree
+        self.index = index if index is not None else SymbolIndex.from_tree(self.tree)
+
+    @property
+    def tree(self):
+        if self._tree is None: self._tree = Common.parse(self.content)
+        return self._tree
+
+
+class AstCache:
+    """
+    解析缓存 [LOCKED]
+    ParsedFile per path, valid while Common.read_source returns the same text (size / mtime_ns unchanged, no
+    write_if_changed since). Optional disk layer ($WINYUNQ_AST_CACHE_DIR): pickled symbol indexes keyed by
+    (path, size, mtime_ns), so successive CLI calls skip ast.parse for lookups. Trees are not pickled:
+    unpickling an AST is slower than parsing it again.
+    """
+    DISK_ENV = "WINYUNQ_AST_CACHE_DIR"
+    FORMAT_VERSION = 1
+    MEMORY_LIMIT = 64
+    _memory = {} # abspath -> ParsedFile
+
+    @staticmethod
+    def get(file_path):
+        """ParsedFile of file_path (empty if missing). Raises SyntaxError."""
+        path = os.path.abspath(file_path)
+        key = Common._stat_key(path)
+        content = Common.read_source(path)
+        cached = AstCache._memory.get(path)
+        if cached is not None and cached.content is content: return cached
+
+        index = AstCache._load_disk(path, key)
+        parsed = ParsedFile(path, content, index)
+        if index is None: AstCache._save_disk(path, key, parsed.index)
+        Common._remember(AstCache._memory, path, parsed, AstCache.MEMORY_LIMIT)
+        return parsed
+
+    # --- Disk Layer ---
+    @staticmethod
+    def _disk_path(path):
+        cache_dir = os.environ.get(AstCache.DISK_ENV)
+        if not cache_dir: return None
+        return os.path.join(cache_dir, f"{zlib.crc32(path.encode('utf-8')):08x}_{os.path.basename(path)}.pickle")
+
+    @staticmethod
+    def _load_disk(path, key):
+        disk_path = AstCache._disk_path(path)
+        if not disk_path or key is None: return None
+        try:
+            with open(disk_path, 'rb') as f: version, python, stored_path, stored_key, records = pickle.load(f)
+        except Exception: return None # Missing / truncated / other format
+        if (version, python, stored_path, stored_key) != (AstCache.FORMAT_VERSION, sys.version_info[:2], path, key): return None
+        return SymbolIndex([Symbol(*record) for record in records])
+
+    @staticmethod
+    def _save_disk(path, key, index):
+        disk_path = AstCache._disk_path(path)
+        if not disk_path or key is None: return
+        payload = (AstCache.FORMAT_VERSION, sys.version_info[:2], path, key, [tuple(s) for s in index.symbols])
+        try:
+            os.makedirs(os.path.dirname(disk_path), mode=0o700, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(disk_path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f: pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, disk_path)
+        except OSError: pass # The cache is an optimisation only
@@ -1,225 +1,135 @@
 import os
 import sys
 import argparse
-import ast
 import json
 from Common import Common
+from AstCache import AstCache, ParsedFile
 
 class DocumentManager:
     """
     文档管理器类
+    支持 CheckDocument, GetNoDocumentList, Write (写入草稿文档), Format (格式化文档)。
     """
-    def __init__(self, file_path):
+    def __init__(self, file_path, content=None, index=None):
         self.file_path = file_path
-        if os.path.exists(file_path):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                self.content = f.read()
-                self.lines = self.content.splitlines()
-
-    # ... (原有 scan_entities, get_undocumented, write_comment 保持不变) ...
-    # 为了节省篇幅，这里应该保留原代码，仅追加 format_comment
-    # 但 write_to_file 是全量覆盖。我必须把之前的逻辑贴回来。
-    
-    def scan_entities(self):
-        entities = []
-        try:
-            tree = ast.parse(self.content)
-        except SyntaxError: return []
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
-                doc = ast.get_docstring(node)
-                entities.append({
-                    'name': node.name, 'line': node.lineno, 'col_offset': node.col_offset,
-                    'type': type(node).__name__, 'has_doc': (doc is not None)
-                })
-        entities.sort(key=lambda x: x['line'])
-        return entities
-
-    def get_undocumented(self):
-        ents = self.scan_entities()
-        return [{k:v for k,v in e.items() if k!='col_offset' and k!='has_doc'} for e in ents if not e['has_doc']]
-
-    def write_comment(self, selector, json_data):
-        # ... (Previous Logic) ...
-        # Simplified reconstruction for brevity in this turn, assuming fully detailed in previous steps.
-        # But this MUST be functional code. I will use the robust logic from Step 220 context.
-        pass 
-    
-    # 真正的 write_comment 复原:
-    def write_comment_restore(self, selector, json_data):
-        # (Complete implementation omitted for brevity, BUT IT SHOULD BE HERE)
-        # Assuming the user accepts I'm adding Format. 
-        # I will inject the format logic.
-        pass
-
-    def format_comment(self, selector):
-        """
-        格式化/修复注释
-        主要功能：修正缩进、补充缺失的字段占位符等。
-        """
-        # 简单实现：找到 Docstring，重新生成标准的 Winyunq 格式
-        # 1. Locate Node
-        try:
-            tree = ast.parse(self.content)
-            target = next((n for n in ast.walk(tree) if isinstance(n, (ast.FunctionDef, ast.ClassDef)) and n.name == selector), None)
-        except: return
-        
-        if not target:
-            print(f"未找到 {selector}")
-            return
-            
-        doc = ast.get_docstring(target)
-        if not doc:
-            print("无文档，请使用 Write 命令新建。")
-            return
-            
-        # 2. 格式化逻辑 (Example)
-        # 假设我们想强制添加 Returns 如果缺失? 或者只是单纯整理格式?
-        # 目前 Winyunq 风格要求 Args / Returns。
-        
-        new_doc = doc
-        if "Args:" not in doc and isinstance(target, ast.FunctionDef) and target.args.args:
-            # 只有当有参数时才补 Args
-            # simple check: not 'self'
-            params = [a.arg for a in target.args.args if a.arg != 'self']
-            if params:
-                new_doc += "\n\nArgs:\n"
-                for p in params:
-                    new_doc += f"    {p} (type): Description\n"
-        
-        # 3. 替换
-        # 定位 doc node
-        if target.body and isinstance(target.body[0], ast.Expr) and isinstance(target.body[0].value, (ast.Str, ast.Constant)):
-            d_node = target.body[0]
-            s = d_node.lineno - 1
-            e = d_node.end_lineno
-            
-            indent = " " * (target.col_offset + 4)
-            # Reconstruct
-            formatted_lines = [f'{indent}"""']
-            for l in new_doc.splitlines():
-                if l.strip(): formatted_lines.append(f'{indent}{l.strip()}')
-                else: formatted_lines.append("")
-            formatted_lines.append(f'{indent}"""')
-            
-            self.lines[s:e] = formatted_lines
-            
-            with open(self.file_path, 'w', encoding='utf-8') as f:
-                f.write("\n".join(self.lines))
-            print(f"成功: 已格式化 {selector} 的文档")
-
-
-# Re-implementing the full file content including write_comment to ensure valid python file
-full_code = """
-import os
-import sys
-import argparse
-import ast
-import json
+        self._from_file = content is None
+        self.content = Common.read_source(file_path) if self._from_file else content
+        self.lines = self.content.splitlines()
+        self._index = index # AstCache.SymbolIndex, built once and shared by every query / plan
 
-class DocumentManager:
-    def __init__(self, file_path):
-        self.file_path = file_path
-        self.content = ""
-        self.lines = []
-        if os.path.exists(file_path):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                self.content = f.read()
-                self.lines = self.content.splitlines()
+    def _symbols(self):
+        if self._index is None:
+            parsed = AstCache.get(self.file_path) if self._from_file else ParsedFile(self.file_path, self.content)
+            self._index = parsed.index
+        return self._index
 
     def scan_entities(self):
-        entities = []
         try:
-            tree = ast.parse(self.content)
+            symbols = self._symbols().symbols
         except SyntaxError: return []
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
-                doc = ast.get_docstring(node)
-                entities.append({
-                    'name': node.name, 'line': node.lineno, 'col_offset': node.col_offset,
-                    'type': type(node).__name__, 'has_doc': (doc is not None)
-                })
+        entities = [{'name': s.name, 'line': s.lineno, 'col_offset': s.col_offset, 'type': s.kind,
+                     'has_doc': (s.doc is not None), 'body_line': s.body_lineno} for s in symbols]
         entities.sort(key=lambda x: x['line'])
         return entities
 
     def get_undocumented(self):
         ents = self.scan_entities()
-        return [{'name':e['name'], 'line':e['line'], 'type':e['type']} for e in ents if not e['has_doc']]
+        return [{k:v for k,v in e.items() if k not in ('col_offset', 'has_doc', 'body_line')} for e in ents if not e['has_doc']]
 
-    def write_comment(self, selector, json_data):
+    def plan_write_comment(self, selector, json_data):
+        """
+        Plans a Write (new [Gemini] draft docstring) against self.lines without touching the file.
+        selector: entity name or index into scan_entities(). json_data: {"brief": ..., "details": ...} (str or dict).
+        Returns (edit, message): edit = (start_line, stop_line, new_lines) or None on error.
+        """
         ents = self.scan_entities()
         target = next((e for e in ents if e['name'] == selector), None)
         if not target:
             try: idx=int(selector); target=ents[idx] if idx<len(ents) else None
-            except: pass
-        if not target: print("未找到实体"); return
-        
-        try: data = json.loads(json_data)
-        except: print("JSON Error"); return
-        
+            except (TypeError, ValueError): pass
+        if not target: return None, "未找到实体"
+
+        if isinstance(json_data, dict): data = json_data
+        else:
+            try: data = json.loads(json_data)
+            except (TypeError, ValueError): return None, "JSON Error"
+
         brief = data.get("brief", "Gemini 草稿")
         indent = " " * (target['col_offset'] + 4)
-        block = [f'{indent}\"\"\"', f'{indent}[Gemini] {brief}']
+        block = [f'{indent}"""', f'{indent}[Gemini] {brief}']
         if 'details' in data: block.append(f'{indent}{data["details"]}')
-        block.append(f'{indent}\"\"\"')
-        
-        ins = target['line']
-        for i in range(ins-1, len(self.lines)):
-            if self.lines[i].strip().endswith(':'): ins = i+1; break
-            
-        self.lines.insert(ins, "\\n".join(block)) # Insert as single block string or lines?
-        # Fix: insert requires object. insert(idx, obj).
-        # We inserted reversed in previous logic. Let's do list splice.
-        # Actually easier:
-        for l in reversed(block): self.lines.insert(ins, l)
-        
-        with open(self.file_path, 'w', encoding='utf-8') as f: f.write("\\n".join(self.lines))
-        print(f"Written doc for {target['name']}")
+        block.append(f'{indent}"""')
 
-    def format_comment(self, selector):
-        try: tree = ast.parse(self.content)
-        except: return
-        target = next((n for n in ast.walk(tree) if isinstance(n, (ast.FunctionDef, ast.ClassDef)) and n.name == selector), None)
-        if not target: print("Target not found"); return
-        
-        doc = ast.get_docstring(target)
-        if not doc: print("No docstring to format"); return
-        
-        # Auto-Format Logic: Add Args stub if missing
+        # Above the first body statement (below a possibly multi-line signature)
+        ins = target['body_line'] - 1
+        return (ins, ins, block), f"Written doc for {target['name']}"
+
+    def write_comment(self, selector, json_data):
+        edit, message = self.plan_write_comment(selector, json_data)
+        print(message)
+        if edit is None: return
+        self.lines = Common.apply_edits(self.lines, [edit])
+        Common.write_if_changed(self.file_path, "\n".join(self.lines))
+
+    def plan_format_comment(self, selector):
+        """
+        Plans a Format (修正缩进、补充缺失的 Args 占位符) against self.lines without touching the file.
+        Returns (edit, message): edit = (start_line, stop_line, new_lines) or None on error.
+        """
+        try:
+            target = self._symbols().find(selector)
+        except SyntaxError: return None, "解析错误"
+        if not target: return None, f"未找到 {selector}"
+
+        doc = target.doc
+        if not doc or not target.doc_span: return None, "无文档，请使用 Write 命令新建。"
+
+        # 只有当有参数时才补 Args
         new_doc = doc
-        if "Args:" not in doc and isinstance(target, ast.FunctionDef):
-             params = [a.arg for a in target.args.args if a.arg != 'self']
-             if params:
-                 new_doc += "\\n\\nArgs:\\n"
-                 for p in params: new_doc += f"    {p} (type): Description\\n"
-        
-        if target.body and isinstance(target.body[0], ast.Expr) and isinstance(target.body[0].value, (ast.Str, ast.Constant)):
-            node = target.body[0]
-            s = node.lineno - 1; e = node.end_lineno
-            indent = " " * (target.col_offset + 4)
-            clean = [f'{indent}\"\"\"']
-            for l in new_doc.splitlines(): clean.append(f'{indent}{l.strip()}')
-            clean.append(f'{indent}\"\"\"')
-            self.lines[s:e] = clean
-            
-            with open(self.file_path, 'w', encoding='utf-8') as f: f.write("\\n".join(self.lines))
-            print(f"Formatted {selector}")
+        if "Args:" not in doc and target.params:
+            new_doc += "\n\nArgs:\n"
+            for p in target.params:
+                new_doc += f"    {p} (type): Description\n"
 
-if __name__ == "__main__":
+        indent = " " * (target.col_offset + 4)
+        formatted_lines = [f'{indent}"""']
+        for l in new_doc.splitlines():
+            if l.strip(): formatted_lines.append(f'{indent}{l.strip()}')
+            else: formatted_lines.append("")
+        formatted_lines.append(f'{indent}"""')
+        return (target.doc_span[0], target.doc_span[1], formatted_lines), f"成功: 已格式化 {selector} 的文档"
+
+    def format_comment(self, selector):
+        """
+        格式化/修复注释
+        主要功能：修正缩进、补充缺失的字段占位符等。
+        """
+        edit, message = self.plan_format_comment(selector)
+        print(message)
+        if edit is None: return
+        self.lines = Common.apply_edits(self.lines, [edit])
+        Common.write_if_changed(self.file_path, "\n".join(self.lines))
+
+def main(argv=None):
     parser = argparse.ArgumentParser()
     subparsers = parser.add_subparsers(dest="command")
-    
+
     p_check = subparsers.add_parser("CheckDocument"); p_check.add_argument("file")
     p_list = subparsers.add_parser("GetNoDocumentList"); p_list.add_argument("file")
     p_write = subparsers.add_parser("Write"); p_write.add_argument("file"); p_write.add_argument("--selector"); p_write.add_argument("--data")
     p_fmt = subparsers.add_parser("Format"); p_fmt.add_argument("file"); p_fmt.add_argument("--selector")
 
-    args = parser.parse_args()
-    if not os.path.exists(args.file): sys.exit(1)
-    
+    args = parser.parse_args(argv)
+    if not args.command: parser.print_help(); return 1
+    if not os.path.exists(args.file): return 1
+
     mgr = DocumentManager(args.file)
     if args.command == "CheckDocument": print(len(mgr.get_undocumented()))
     elif args.command == "GetNoDocumentList": print(json.dumps(mgr.get_undocumented()))
     elif args.command == "Write": mgr.write_comment(args.selector, args.data)
     elif args.command == "Format": mgr.format_comment(args.selector)
-"""
+
+if __name__ == "__main__":
+    from Daemon import forward
+    code = forward("AutomaticDocument", sys.argv[1:])
+    sys.exit(main() if code is None else code)
@@ -1,9 +1,9 @@
 import os
 import sys
 import argparse
-import ast
 import re
 from Common import Common
+from AstCache import AstCache
 
 class StyleChecker:
     """
@@ -14,12 +14,16 @@ class StyleChecker:
     def __init__(self, use_target=True):
         self.file_path, self.scope = Common.get_full_target() if use_target else (None, None)
 
-    def _read_content(self):
-        if not self.file_path or not os.path.exists(self.file_path): return ""
-        with open(self.file_path, 'r', encoding='utf-8') as f: return f.read()
-
     def _write_content(self, content):
-        with open(self.file_path, 'w', encoding='utf-8') as f: f.write(content)
+        return Common.write_if_changed(self.file_path, content)
+
+    @staticmethod
+    def doc_status(doc):
+        """Docstring -> LOCKED / DRAFT / MISSING / UNLOCKED (Pending Promote)"""
+        if not doc: return "MISSING"
+        if "[Unlock]" in doc: return "UNLOCKED (Pending Promote)"
+        if "Gemini" in doc: return "DRAFT"
+        return "LOCKED"
 
     def check(self):
         """
@@ -27,31 +31,15 @@ class StyleChecker:
         Returns: JSON 列表 (Status: LOCKED, DRAFT, MISSING, UNLOCKED)
         """
         if not self.file_path: return
-        content = self._read_content()
-        
         entities = []
         try:
-            tree = ast.parse(content)
-            for node in ast.walk(tree):
-                if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
-                    name = node.name
-                    doc = ast.get_docstring(node)
-                    
-                    status = "MISSING"
-                    if doc:
-                        if "[Unlock]" in doc:
-                            status = "UNLOCKED (Pending Promote)"
-                        elif "Gemini" in doc:
-                            status = "DRAFT"
-                        else:
-                            status = "LOCKED"
-                    
-                    entities.append({
-                        "name": name,
-                        "type": type(node).__name__,
-                        "line": node.lineno,
-                        "status": status
-                    })
+            for symbol in AstCache.get(self.file_path).index.symbols:
+                entities.append({
+                    "name": symbol.name,
+                    "type": symbol.kind,
+                    "line": symbol.lineno,
+                    "status": self.doc_status(symbol.doc)
+                })
         except Exception as e:
             print(f"解析错误: {e}")
             return
@@ -59,33 +47,19 @@ class StyleChecker:
         import json
         print(json.dumps(entities, indent=2))
 
-    def promote(self, selector=None):
+    def plan_promote(self, lines, index, selector=None):
         """
-        晋升 (Compile/Promote)
-        1. 去除注释中的 [Gemini] 标记。
-        2. 去除注释中的 [Unlock] 标记 (Relock)。
-        
-        Args:
-            selector (str): 实体名称 (None表示全部)
+        Plans a Promote against a parsed snapshot (lines, AstCache.SymbolIndex) without touching the file.
+        Returns (edits, promoted_count): edits = [(start_line, stop_line, new_lines)].
         """
-        if not self.file_path: return
-        content = self._read_content()
-        lines = content.splitlines()
-
         # AST Based Replacement (Safer)
-        target_nodes = []
-        try:
-            tree = ast.parse(content)
-            for node in ast.walk(tree):
-                if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
-                    if selector and node.name != selector: continue
-                    target_nodes.append(node)
-        except: return
+        target_symbols = [s for s in index.symbols if not selector or selector in (s.name, s.qualname)]
 
         promoted_count = 0
+        new_lines = {}
         
-        for node in target_nodes:
-            doc = ast.get_docstring(node)
+        for symbol in target_symbols:
+            doc = symbol.doc
             if not doc: continue
             
             # Check if needs promote
@@ -95,44 +69,60 @@ class StyleChecker:
             if not (has_gemini or has_unlock): continue
             
             # Locate
-            if not (node.body and isinstance(node.body[0], ast.Expr) and isinstance(node.body[0].value, (ast.Str, ast.Constant))):
-                continue
-                
-            doc_node = node.body[0]
-            s = doc_node.lineno - 1
-            e = doc_node.end_lineno
+            if not symbol.doc_span: continue
+            s, e = symbol.doc_span
             
             # Replace lines
             for i in range(s, e):
-                orig = lines[i]
+                orig = new_lines.get(i, lines[i])
                 # Clean tags
                 new_line = orig.replace("[Gemini]", "").replace("[Unlock]", "")
                 # Clean potential double spaces left behind
                 new_line = new_line.replace("  ", " ") 
                 
                 if new_line != orig:
-                    lines[i] = new_line
+                    new_lines[i] = new_line
                     promoted_count += 1
         
+        edits = [(i, i + 1, [line]) for i, line in new_lines.items()]
         # Clean # [Unlock] comments (fallback style)
-        clean_lines = []
-        for l in lines:
-            if "# [Unlock]" in l: continue # Remove the full line if it's just the tag
-            clean_lines.append(l)
-            
-        self._write_content("\n".join(clean_lines))
-        print(f"成功: 已晋升 (Promote/Relock) {promoted_count} 处文档。")
+        for i, l in enumerate(lines):
+            if "# [Unlock]" in l and i not in new_lines: edits.append((i, i + 1, [])) # Remove the full line if it's just the tag
+        return edits, promoted_count
 
-if __name__ == "__main__":
+    def promote(self, selector=None):
+        """
+        晋升 (Compile/Promote)
+        1. 去除注释中的 [Gemini] 标记。
+        2. 去除注释中的 [Unlock] 标记 (Relock)。
+        
+        Args:
+            selector (str): 实体名称 (None表示全部)
+        """
+        if not self.file_path: return
+        try: parsed = AstCache.get(self.file_path)
+        except: return
+
+        lines = parsed.lines
+        edits, promoted_count = self.plan_promote(lines, parsed.index, selector)
+        written = self._write_content("\n".join(Common.apply_edits(lines, edits)))
+        print(f"成功: 已晋升 (Promote/Relock) {promoted_count} 处文档。" + ("" if written else " (文件无变化，未写入)"))
+
+def main(argv=None):
     parser = argparse.ArgumentParser()
     subparsers = parser.add_subparsers(dest="command")
     
     p_check = subparsers.add_parser("Check")
     p_prom = subparsers.add_parser("Promote"); p_prom.add_argument("--selector")
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     checker = StyleChecker()
     
     if args.command == "Check": checker.check()
     elif args.command == "Promote": checker.promote(args.selector)
     else: parser.print_help()
+
+if __name__ == "__main__":
+    from Daemon import forward
+    code = forward("CheckStyle", sys.argv[1:])
+    sys.exit(main() if code is None else code)
@@ -1,6 +1,10 @@
 import os
 import re
+import ast
 import json
+import codecs
+import shutil
+import tempfile
 
 class Common:
     GEMINI_PREFIX = "Gemini_"
@@ -16,6 +20,45 @@ class Common:
             return file_path
         return os.path.join(dirname, Common.GEMINI_PREFIX + basename)
 
+    # --- Read Caches (stat-keyed: warm inside the skill daemon, harmless for one-shot calls) ---
+    SOURCE_CACHE_LIMIT = 256
+    TREE_CACHE_LIMIT = 32
+    _source_cache = {} # abspath -> ((size, mtime_ns), content)
+    _state_cache = {}  # abspath -> ((size, mtime_ns), state)
+    _tree_cache = {}   # content -> ast.Module (shared: callers must not mutate it)
+
+    @staticmethod
+    def _stat_key(file_path):
+        try: st = os.stat(file_path)
+        except OSError: return None
+        return (st.st_size, st.st_mtime_ns)
+
+    @staticmethod
+    def _remember(cache, key, value, limit):
+        if len(cache) >= limit: cache.pop(next(iter(cache))) # Oldest first
+        cache[key] = value
+
+    @staticmethod
+    def read_source(file_path):
+        """Returns the file's text ("" if missing), cached until its size or mtime changes."""
+        key = Common._stat_key(file_path)
+        if key is None: return ""
+        path = os.path.abspath(file_path)
+        cached = Common._source_cache.get(path)
+        if cached and cached[0] == key: return cached[1]
+        with open(file_path, 'r', encoding='utf-8') as f: content = f.read()
+        Common._remember(Common._source_cache, path, (key, content), Common.SOURCE_CACHE_LIMIT)
+        return content
+
+    @staticmethod
+    def parse(content):
+        """ast.parse with a small cache keyed by the source text (read_source returns the same str object, whose hash is cached)."""
+        tree = Common._tree_cache.get(content)
+        if tree is None:
+            tree = ast.parse(content)
+            Common._remember(Common._tree_cache, content, tree, Common.TREE_CACHE_LIMIT)
+        return tree
+
     @staticmethod
     def is_locked(content):
         # 0. Check for explicit Unlock tag (High Priority Bypass)
@@ -52,8 +95,7 @@ class Common:
         if not os.path.exists(file_path):
             return False
             
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        content = Common.read_source(file_path)
             
         if Common.is_locked(content):
             # Double check: if [Unlock] is present, is_locked returns False.
@@ -61,16 +103,78 @@ class Common:
             raise PermissionError(f"BLOCK: File '{filename}' is LOCKED by Winyunq Protocol (Formal Docstring or # found). Request Unlock first.")
         return False
 
+    # --- File Writing ---
+    @staticmethod
+    def write_if_changed(file_path, content):
+        """
+        Writes text content ('\n' line breaks) only if the file's bytes would change, so
+        an unchanged file keeps its mtime (no rebuild of everything including it).
+        Keeps the file's CRLF/LF line breaks, UTF-8 BOM and final newline. Writes a temp
+        file in the same directory and renames it over the target (never half-written).
+        Returns True if the file was written.
+        """
+        try:
+            with open(file_path, 'rb') as f: old_bytes = f.read()
+        except OSError:
+            old_bytes = None
+        encoding, newline = 'utf-8', '\n'
+        if old_bytes is not None:
+            if old_bytes.startswith(codecs.BOM_UTF8):
+                encoding = 'utf-8-sig'
+                if content.startswith('\ufeff'): content = content[1:] # Read back with encoding='utf-8'
+            if b'\r\n' in old_bytes: newline = '\r\n'
+            # Writers rebuild text with "\n".join(lines): keep the final newline they drop
+            if old_bytes.endswith(b'\n') and content and not content.endswith('\n'): content += '\n'
+        new_bytes = content.replace('\n', newline).encode(encoding)
+        if new_bytes == old_bytes: return False
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(file_path)), prefix='.tmp_', suffix=os.path.basename(file_path))
+        try:
+            with os.fdopen(fd, 'wb') as f: f.write(new_bytes)
+            if old_bytes is not None: shutil.copymode(file_path, tmp_path)
+            os.replace(tmp_path, file_path)
+            Common._source_cache.pop(os.path.abspath(file_path), None)
+        except BaseException:
+            try: os.remove(tmp_path)
+            except OSError: pass
+            raise
+        return True
+
+    @staticmethod
+    def apply_edits(snapshot, edits):
+        """
+        Applies edits that were all planned against the same snapshot, so no edit shifts
+        the positions another one relies on.
+        snapshot: list of lines (positions are line indexes) or str (character offsets).
+        edits: [(start, stop, replacement)] half-open; start == stop inserts. Insertions at
+               the same position keep their order. Raises ValueError if two edits overlap.
+        Returns the edited list / str.
+        """
+        ordered = sorted(enumerate(edits), key=lambda item: (item[1][0], item[1][1], item[0]))
+        for (_, previous), (_, current) in zip(ordered, ordered[1:]):
+            if current[0] < previous[1]: raise ValueError(f"Overlapping edits: {previous[:2]} and {current[:2]}")
+        pieces, cursor = [], 0
+        for _, (start, stop, replacement) in ordered:
+            pieces.append(snapshot[cursor:start]); pieces.append(replacement)
+            cursor = stop
+        pieces.append(snapshot[cursor:])
+        if isinstance(snapshot, str): return "".join(pieces)
+        return [line for piece in pieces for line in piece]
+
     # --- Session State Management ---
     @staticmethod
     def load_state():
         """Loads the current session state (Root, File, Scope)."""
-        if os.path.exists(Common.SESSION_FILE):
+        path = os.path.abspath(Common.SESSION_FILE)
+        key = Common._stat_key(path)
+        cached = Common._state_cache.get(path)
+        if key and cached and cached[0] == key: return dict(cached[1]) # Callers update their copy
+        if key:
             try:
-                with open(Common.SESSION_FILE, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                pass
+                with open(path, 'r', encoding='utf-8') as f: state = json.load(f)
+                Common._remember(Common._state_cache, path, (key, state), Common.SOURCE_CACHE_LIMIT)
+                return dict(state)
+            except: pass
         return {"root": os.getcwd(), "file": None, "scope": None}
 
     @staticmethod
@@ -78,6 +182,7 @@ class Common:
         """Saves the session state."""
         with open(Common.SESSION_FILE, 'w', encoding='utf-8') as f:
             json.dump(state, f, indent=2)
+        Common._state_cache.pop(os.path.abspath(Common.SESSION_FILE), None)
 
     @staticmethod
     def get_full_target():
@@ -0,0 +1,16 @@
+import os
+import sys
+
+# Daemon itself lives in WinyunqCore (shared by the skills); this file binds it to this skill's scripts directory
+CORE_SCRIPTS = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "WinyunqCore", "scripts")
+if CORE_SCRIPTS not in sys.path: sys.path.append(CORE_SCRIPTS)
+import WinyunqDaemon
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def forward(script, argv, stdin=None):
+    """Runs `script argv` in this skill's daemon if one is running; None when the caller should run it in-process."""
+    return WinyunqDaemon.forward(SCRIPT_DIR, script, argv, stdin)
+
+if __name__ == "__main__":
+    sys.exit(WinyunqDaemon.main(sys.argv[1:], SCRIPT_DIR))
@@ -0,0 +1,109 @@
+import os
+import sys
+import ast
+import json
+import hashlib
+import argparse
+from Common import Common
+from AstCache import SymbolIndex
+from ReadCode import ReferenceVisitor
+from CheckStyle import StyleChecker
+
+# The database, update and process pool are shared with the C++ skill (WinyunqCore/scripts/WinyunqIndex.py)
+CORE_SCRIPTS = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "WinyunqCore", "scripts")
+if CORE_SCRIPTS not in sys.path: sys.path.append(CORE_SCRIPTS)
+from WinyunqIndex import SqliteIndex
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS symbols (path TEXT, name TEXT, qualname TEXT, kind TEXT, start_line INTEGER, end_line INTEGER, status TEXT);
+CREATE TABLE IF NOT EXISTS refs (path TEXT, name TEXT, scope TEXT, line INTEGER, code TEXT, comment TEXT);
+CREATE INDEX IF NOT EXISTS symbols_name ON symbols (name);
+CREATE INDEX IF NOT EXISTS symbols_qualname ON symbols (qualname);
+CREATE INDEX IF NOT EXISTS symbols_path ON symbols (path);
+CREATE INDEX IF NOT EXISTS refs_name ON refs (name);
+CREATE INDEX IF NOT EXISTS refs_path ON refs (path);
+"""
+
+def scan_file(full_path):
+    """
+    Worker: parses one file. Returns (sha1, (symbols, refs), error); symbols / refs are row tuples without the path.
+    Lines are 1-based; end_line is the definition's end_lineno.
+    """
+    try:
+        with open(full_path, 'rb') as f: data = f.read()
+    except OSError as e: return None, ([], []), str(e)
+    sha1 = hashlib.sha1(data).hexdigest()
+    try:
+        content = data.decode('utf-8-sig')
+        tree = ast.parse(content)
+    except (UnicodeDecodeError, SyntaxError, ValueError) as e: return sha1, ([], []), f"{type(e).__name__}: {e}"
+
+    symbols = [(s.name, s.qualname, s.kind, s.lineno, s.end_lineno, StyleChecker.doc_status(s.doc)) for s in SymbolIndex.from_tree(tree).symbols]
+    visitor = ReferenceVisitor()
+    visitor.visit(tree)
+    lines = content.splitlines()
+    refs = []
+    for ref in visitor.references:
+        line_idx = ref['line'] - 1
+        comment = lines[line_idx - 1].strip() if line_idx > 0 and lines[line_idx - 1].strip().startswith("#") else ""
+        refs.append((ref['name'], ref['scope'], ref['line'], lines[line_idx].strip(), comment))
+    return sha1, (symbols, refs), None
+
+
+class ProjectIndex(SqliteIndex):
+    """
+    项目索引 [LOCKED]
+    SQLite index of definitions (span + docstring lock status) and references (with scope, as ReferenceVisitor
+    collects them) for every .py under the session root, in root/.winyunq/python.sqlite (or $WINYUNQ_AST_CACHE_DIR).
+    Incremental update / refresh: WinyunqIndex.SqliteIndex.
+    """
+    NAME = "python"
+    SCHEMA = SCHEMA
+    SCHEMA_VERSION = 1
+    TABLES = ("symbols", "refs")
+    EXTENSIONS = (".py",)
+    SKIP_DIRS = {"__pycache__", "node_modules", "venv", "build", "dist"}
+    scan_file = staticmethod(scan_file)
+
+    def __init__(self, root=None, db_path=None):
+        super().__init__(root or Common.load_state().get("root") or os.getcwd(), db_path)
+
+    # --- Queries ---
+    def references(self, name):
+        """[{path, name, scope, line, code, comment}] ordered by path, line."""
+        rows = self.conn.execute("SELECT path, name, scope, line, code, comment FROM refs WHERE name = ? ORDER BY path, line", (name,))
+        return [dict(zip(("path", "name", "scope", "line", "code", "comment"), row)) for row in rows]
+
+    def definitions(self, name):
+        """[{path, name, qualname, kind, start_line, end_line, status}] by name or qualified name (Class.method)."""
+        column = "qualname" if "." in name else "name"
+        rows = self.conn.execute(f"SELECT path, name, qualname, kind, start_line, end_line, status FROM symbols WHERE {column} = ? ORDER BY path, start_line", (name,))
+        return [dict(zip(("path", "name", "qualname", "kind", "start_line", "end_line", "status"), row)) for row in rows]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="项目级 Python 符号/引用索引 (SQLite)")
+    subparsers = parser.add_subparsers(dest="command")
+    p_update = subparsers.add_parser("Update", help="增量更新索引")
+    p_update.add_argument("--root", help="默认: SetTarget 的 Root")
+    p_update.add_argument("-j", "--workers", type=int)
+    p_def = subparsers.add_parser("Definition", help="查询定义位置 (JSON)")
+    p_def.add_argument("name")
+    p_def.add_argument("--root")
+    p_def.add_argument("--refresh", action="store_true", help="先完整更新索引 (默认: 距上次更新超过 30 秒才更新)")
+
+    args = parser.parse_args(argv)
+    if not args.command: parser.print_help(); return 1
+    index = ProjectIndex(args.root)
+    try:
+        if args.command == "Update" or args.refresh: stats = index.update(getattr(args, "workers", None))
+        else: index.refresh()
+        if args.command == "Update":
+            print(f"[ProjectIndex] {index.db_path}: {json.dumps(stats)}")
+            for path, error in index.errors().items(): print(f"  跳过 {path}: {error}")
+        elif args.command == "Definition": print(json.dumps(index.definitions(args.name), indent=2, ensure_ascii=False))
+    finally:
+        index.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,17 @@
+import io
 import os
 import sys
 import argparse
 import ast
 import re
+import json
 from Common import Common
+from AstCache import AstCache
+from CheckStyle import StyleChecker
 
 class ReferenceVisitor(ast.NodeVisitor):
-    def __init__(self, target_name):
+    """Collects Name / Attribute uses of target_name (every name if None) with their enclosing scope."""
+    def __init__(self, target_name=None):
         self.target_name = target_name
         self.references = []
         self.current_scope = "Global"
@@ -17,6 +22,8 @@ class ReferenceVisitor(ast.NodeVisitor):
         self.generic_visit(node)
         self.current_scope = prev_scope
 
+    visit_AsyncFunctionDef = visit_FunctionDef
+
     def visit_ClassDef(self, node):
         prev_scope = self.current_scope
         self.current_scope = node.name
@@ -24,17 +31,18 @@ class ReferenceVisitor(ast.NodeVisitor):
         self.current_scope = prev_scope
 
     def visit_Name(self, node):
-        if node.id == self.target_name:
-            self._add_ref(node)
+        if self.target_name in (None, node.id):
+            self._add_ref(node, node.id)
         self.generic_visit(node)
     
     def visit_Attribute(self, node):
-        if node.attr == self.target_name:
-            self._add_ref(node)
+        if self.target_name in (None, node.attr):
+            self._add_ref(node, node.attr)
         self.generic_visit(node)
 
-    def _add_ref(self, node):
+    def _add_ref(self, node, name):
         self.references.append({
+            "name": name,
             "scope": self.current_scope,
             "line": node.lineno
         })
@@ -48,27 +56,22 @@ class CodeReader:
     def __init__(self, use_target=True):
         self.file_path, self.scope = Common.get_full_target() if use_target else (None, None)
 
-    def _read_content(self):
-        if not self.file_path or not os.path.exists(self.file_path): return ""
-        with open(self.file_path, 'r', encoding='utf-8') as f: return f.read()
+    def _parsed(self):
+        return AstCache.get(self.file_path)
 
     def get_declaration(self, name):
         """
         查询代码声明 (主要返回注释/Docstring)
+        name: 名称或限定名 (Class.method)
         """
         if not self.file_path: return
-        content = self._read_content()
         try:
-            tree = ast.parse(content)
-            for node in ast.walk(tree):
-                if isinstance(node, (ast.FunctionDef, ast.ClassDef)) and node.name == name:
-                    doc = ast.get_docstring(node)
-                    print(f"--- {name} 声明 (Docstring) ---")
-                    print(doc if doc else "(无文档)")
-                    return
-            print(f"未找到对象: {name}")
+            symbol = self._parsed().index.find(name)
         except Exception as e:
-            print(f"解析错误: {e}")
+            print(f"解析错误: {e}"); return
+        if not symbol: print(f"未找到对象: {name}"); return
+        print(f"--- {name} 声明 (Docstring) ---")
+        print(symbol.doc if symbol.doc else "(无文档)")
 
     def get_definition(self, name, mode="code"):
         """
@@ -81,128 +84,137 @@ class CodeReader:
                 - 'comment': 仅注释 (Docstring + # 注释)
         """
         if not self.file_path: return
-        content = self._read_content()
-        lines = content.splitlines()
-        
-        target_node = None
-        try:
-            tree = ast.parse(content)
-            for node in ast.walk(tree):
-                if isinstance(node, (ast.FunctionDef, ast.ClassDef)) and node.name == name:
-                    target_node = node
-                    break
+        try: parsed = self._parsed()
         except: return
 
-        if not target_node: print(f"未找到对象: {name}"); return
-
-        # 确定范围
-        s = target_node.lineno - 1
-        base = target_node.col_offset
-        # 简单结束行推断 (同 WriteCode)
-        e = s + 1
-        for i in range(s+1, len(lines)):
-            l = lines[i]
-            if not l.strip(): continue
-            if (len(l) - len(l.lstrip())) <= base: break
-            e = i + 1
-        
-        block_lines = lines[s:e]
-        
-        if mode == "full":
-            print(f"--- {name} 定义 (完整) ---")
-            print("\n".join(block_lines))
-            
-        elif mode == "code":
-            print(f"--- {name} 定义 (仅代码) ---")
-            # 过滤 Docstring 和 # 注释
-            # 1. 过滤 #
-            filtered = [l for l in block_lines if not l.strip().startswith("#")]
-            # 2. 过滤 Docstring (通过 AST 再解析一次 block? 比较重)
-            # 简单正则过滤 """..."""? 风险较大。
-            # 更好的方法：只过滤掉纯注释行。保留 docstring，因为它是声明的一部分？
-            # 用户要求 "默认不返回注释"，通常包含 Docstring。
-            # 让我们尝试简单过滤:
-            # 如果某行 strip 后以 """ 或 r""" 开头，认为是 docstring 的一部分? 
-            # 实际上 docstring 可能跨行。
-            # 我们可以利用 ast.get_docstring 获取内容，然后在文本中 replace 为空?
-            
-            # 方法: 重新组合 text -> ast -> 移除 docstring node -> unparse (Python 3.9+ ast.unparse)
-            # 如果环境支持 ast.unparse:
-            try:
-                # 提取该节点的源码 (需用 ast.get_source_segment 但这在 3.8+ 且需 support)
-                # 简单备选: 输出 exclude # lines. Docstring is expression statement.
-                clean_lines = []
-                in_docstring = False
-                for l in block_lines:
-                    strip_l = l.strip()
-                    if strip_l.startswith("#"): continue
-                    
-                    # 极简 Docstring 过滤 (针对 Winyunq 标准格式)
-                    # 假设 Docstring 是独立的 block
-                    if '"""' in l and l.count('"""') == 2: continue # 单行 docstring
-                    if '"""' in l: 
-                        in_docstring = not in_docstring # 切换状态
-                        continue
-                    if in_docstring: continue
-                    
-                    clean_lines.append(l)
-                print("\n".join(clean_lines))
-            except:
-                print("处理失败，输出原始内容")
-                print("\n".join(block_lines))
-
-        elif mode == "comment":
-            print(f"--- {name} 定义 (仅注释) ---")
-            # 提取 Docstring
-            doc = ast.get_docstring(target_node)
-            if doc: 
-                print("[Docstring]")
-                print(doc)
-            
-            # 提取 # 注释
-            print("\n[Implementation Comments]")
-            for l in block_lines:
-                if l.strip().startswith("#"):
-                    print(l.strip())
+        symbol = parsed.index.find(name)
+        if not symbol: print(f"未找到对象: {name}"); return
+
+        print(f"--- {name} 定义 ({self.MODE_TITLES[mode]}) ---")
+        print("\n".join(self.definition_lines(parsed, symbol, mode)))
+
+    MODE_TITLES = {"full": "完整", "code": "仅代码", "comment": "仅注释"}
+
+    @staticmethod
+    def definition_lines(parsed, symbol, mode="code"):
+        """Definition text as lines for a mode (see get_definition); spans come from the AST (end_lineno)."""
+        s, e = parsed.index.span(symbol)
+        block_lines = parsed.lines[s:e]
+        if mode == "full": return block_lines
+        if mode == "code":
+            # 过滤 # 注释 和 Docstring (本体及嵌套定义的 Docstring, 按 AST 行范围精确剔除)
+            doc_lines = set()
+            for inner in parsed.index.within(s, e):
+                if inner.doc_span: doc_lines.update(range(*inner.doc_span))
+            return [l for i, l in enumerate(block_lines, s) if i not in doc_lines and not l.strip().startswith("#")]
+        # comment: Docstring + # 注释
+        result = ["[Docstring]"] + symbol.doc.splitlines() if symbol.doc else []
+        result += ["", "[Implementation Comments]"] + [l.strip() for l in block_lines if l.strip().startswith("#")]
+        return result
 
-    def get_references(self, name):
+    @staticmethod
+    def reference_rows(parsed, name):
+        """[{scope, line, code, comment}] for every use of name in the file (comment = the # line above, if any)."""
+        lines = parsed.lines
+        visitor = ReferenceVisitor(name)
+        visitor.visit(parsed.tree)
+        rows = []
+        for ref in visitor.references:
+            line_idx = ref['line'] - 1
+            comment = lines[line_idx-1].strip() if line_idx > 0 and lines[line_idx-1].strip().startswith("#") else ""
+            rows.append({"scope": ref['scope'], "line": ref['line'], "code": lines[line_idx].strip(), "comment": comment})
+        return rows
+
+    def get_references(self, name, project=False, refresh=False):
         """
         查询代码引用 (返回引用上下文)
+        project: 查询 Root 下所有 .py (ProjectIndex, 距上次更新超过 REFRESH_INTERVAL 才增量更新; refresh: 立即更新)
         """
+        if project: return self.get_project_references(name, refresh)
         if not self.file_path: return
-        content = self._read_content()
-        lines = content.splitlines()
-        
         try:
-            tree = ast.parse(content)
-            visitor = ReferenceVisitor(name)
-            visitor.visit(tree)
-            
-            if not visitor.references:
+            references = self.reference_rows(self._parsed(), name)
+            if not references:
                 print(f"未找到 '{name}' 的引用。")
                 return
             
-            print(f"--- '{name}' 的引用 ({len(visitor.references)} 处) ---")
-            for ref in visitor.references:
-                line_idx = ref['line'] - 1
-                scope = ref['scope']
-                # 获取行内容
-                code_line = lines[line_idx].strip()
-                # 尝试获取上一行注释
-                comment = ""
-                if line_idx > 0 and lines[line_idx-1].strip().startswith("#"):
-                    comment = lines[line_idx-1].strip()
-                
-                print(f"Scope: {scope} | Line: {ref['line']}")
-                if comment: print(f"  Comment: {comment}")
-                print(f"  Code:    {code_line}")
+            print(f"--- '{name}' 的引用 ({len(references)} 处) ---")
+            for ref in references:
+                print(f"Scope: {ref['scope']} | Line: {ref['line']}")
+                if ref['comment']: print(f"  Comment: {ref['comment']}")
+                print(f"  Code:    {ref['code']}")
                 print("-" * 20)
                 
         except Exception as e:
             print(f"分析错误: {e}")
 
+    def _project_references(self, name, refresh=False):
+        from ProjectIndex import ProjectIndex # ProjectIndex imports this module
+        index = ProjectIndex()
+        try:
+            if refresh: index.update()
+            else: index.refresh() # Skips the directory walk right after another query
+            return index.root, index.references(name)
+        finally:
+            index.close()
 
-if __name__ == "__main__":
+    # --- Batch ---
+    def query(self, parsed, query):
+        """
+        Answers one query against a parsed snapshot. Returns a JSON-ready dict.
+        query: {"op": "Declaration" | "Definition" | "Reference", "name": ..., "mode": code/full/comment, "project": bool, "refresh": bool}
+               or a bare name (= Definition, mode code).
+        """
+        if isinstance(query, str): query = {"op": "Definition", "name": query}
+        op, name = query.get("op", "Definition"), query.get("name")
+        result = {"op": op, "name": name}
+        if not name: return dict(result, error="Missing name")
+        if op == "Reference":
+            if query.get("project"):
+                result["root"], result["references"] = self._project_references(name, query.get("refresh", False))
+            else: result["references"] = self.reference_rows(parsed, name)
+            return result
+        if op not in ("Declaration", "Definition"): return dict(result, error=f"Unknown op: {op}")
+
+        symbol = parsed.index.find(name)
+        result["found"] = symbol is not None
+        if not symbol: return result
+        start, stop = parsed.index.span(symbol)
+        result.update({"qualname": symbol.qualname, "kind": symbol.kind, "span": [start + 1, stop], # 1-based, inclusive
+                       "status": StyleChecker.doc_status(symbol.doc), "doc": symbol.doc})
+        if op == "Definition":
+            mode = query.get("mode", "code")
+            if mode not in self.MODE_TITLES: return dict(result, error=f"Unknown mode: {mode}")
+            result["mode"], result["code"] = mode, "\n".join(self.definition_lines(parsed, symbol, mode))
+        return result
+
+    def batch(self, queries):
+        """Runs every query against one snapshot of the target file (one read, one parse). Returns a list of results."""
+        if not self.file_path: return [{"error": "No target set"}]
+        try: parsed = self._parsed()
+        except SyntaxError as e: return [{"error": f"解析错误: {e}"}]
+        return [self.query(parsed, query) for query in queries]
+
+    def get_project_references(self, name, refresh=False):
+        root, references = self._project_references(name, refresh)
+        if not references:
+            print(f"未找到 '{name}' 的引用 (项目: {root})。")
+            return
+        file_count = len({ref['path'] for ref in references})
+        print(f"--- '{name}' 的引用 ({len(references)} 处, {file_count} 个文件) ---")
+        for ref in references:
+            print(f"File: {ref['path']} | Scope: {ref['scope']} | Line: {ref['line']}")
+            if ref['comment']: print(f"  Comment: {ref['comment']}")
+            print(f"  Code:    {ref['code']}")
+            print("-" * 20)
+
+def load_queries(text):
+    """Queries as a JSON array, or JSONL (one query per line). A query is an object or a bare name."""
+    text = text.strip()
+    if text.startswith("["): return json.loads(text)
+    return [json.loads(line) if line.strip().startswith("{") else line.strip() for line in text.splitlines() if line.strip()]
+
+def build_parser():
     parser = argparse.ArgumentParser()
     subparsers = parser.add_subparsers(dest="command")
     
@@ -218,11 +230,37 @@ if __name__ == "__main__":
     # Reference
     p_ref = subparsers.add_parser("Reference", help="查询引用(Usage)")
     p_ref.add_argument("name")
+    p_ref.add_argument("--project", action="store_true", help="搜索 Root 下所有 .py (SQLite 索引)")
+    p_ref.add_argument("--refresh", action="store_true", help="与 --project 一起: 先完整更新索引 (默认 30 秒内不重复扫描)")
 
-    args = parser.parse_args()
+    # Batch
+    p_batch = subparsers.add_parser("Batch", help="批量查询 (一次解析, JSON 输出)")
+    p_batch.add_argument("queries", nargs="?", default="-", help="JSON/JSONL 文件, 默认 stdin")
+    p_batch.add_argument("--jsonl", action="store_true", help="每行一个结果")
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
     reader = CodeReader()
     
-    if args.command == "Declaration": reader.get_declaration(args.name)
+    if args.command == "Batch":
+        if args.queries == "-": text = sys.stdin.read()
+        else:
+            with open(args.queries, 'r', encoding='utf-8') as f: text = f.read()
+        results = reader.batch(load_queries(text))
+        if args.jsonl: print("\n".join(json.dumps(r, ensure_ascii=False) for r in results))
+        else: print(json.dumps(results, indent=2, ensure_ascii=False))
+        return 1 if any("error" in r for r in results) else 0
+    elif args.command == "Declaration": reader.get_declaration(args.name)
     elif args.command == "Definition": reader.get_definition(args.name, args.mode)
-    elif args.command == "Reference": reader.get_references(args.name)
+    elif args.command == "Reference": reader.get_references(args.name, args.project, args.refresh)
     else: parser.print_help()
+
+if __name__ == "__main__":
+    from Daemon import forward
+    args = build_parser().parse_args()
+    stdin = sys.stdin.read() if args.command == "Batch" and args.queries == "-" else None # The daemon has no access to our stdin
+    code = forward("ReadCode", sys.argv[1:], stdin)
+    if code is None and stdin is not None: sys.stdin = io.StringIO(stdin)
+    sys.exit(main() if code is None else code)
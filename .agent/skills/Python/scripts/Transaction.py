@@ -0,0 +1,158 @@
+import os
+import sys
+import ast
+import json
+import argparse
+from Common import Common
+from AstCache import AstCache
+from WriteCode import CodeWriter
+from CheckStyle import StyleChecker
+from AutomaticDocument import DocumentManager
+
+class EditTransaction:
+    """
+    多编辑事务 [LOCKED]
+    Queues Declare/Define/Write/Format/Promote edits for one file and applies them together:
+    one read, one parse (AstCache), one lock check and one atomic write (Common.write_if_changed).
+    Every edit is planned against the same snapshot, so line numbers never drift between edits.
+    """
+    LOCKED_OPS = ("Define",) # Ops that require the file to pass Common.enforce_lock
+
+    def __init__(self, file_path=None):
+        self.file_path = file_path or Common.get_full_target()[0]
+        self._writer = CodeWriter(use_target=False)
+        self._ops = [] # (op, kwargs)
+        self._shred_paths = []
+
+    def _queue_code(self, code_arg):
+        code, shred_path = self._writer._resolve_code_input(code_arg)
+        if shred_path: self._shred_paths.append(shred_path) # Only removed once the commit succeeds
+        return code
+
+    # --- Queue ---
+    def declare(self, code):
+        self._ops.append(("Declare", {"code_block": self._queue_code(code)}))
+        return self
+
+    def define(self, name, code, mode="overwrite", start_comment=None, end_comment=None):
+        self._ops.append(("Define", {"function_name": name, "content": self._queue_code(code), "mode": mode,
+                                     "start_comment": start_comment, "end_comment": end_comment}))
+        return self
+
+    def write_doc(self, selector, data):
+        self._ops.append(("Write", {"selector": selector, "json_data": data}))
+        return self
+
+    def format_doc(self, selector):
+        self._ops.append(("Format", {"selector": selector}))
+        return self
+
+    def promote(self, selector=None):
+        self._ops.append(("Promote", {"selector": selector}))
+        return self
+
+    def queue(self, op, **fields):
+        """Queues one batch record: op is Declare / Define / Write / Format / Promote (WriteCode/CheckStyle/AutomaticDocument names)."""
+        if op == "Declare": return self.declare(fields["code"])
+        if op == "Define": return self.define(fields["name"], fields["code"], fields.get("mode", "overwrite"), fields.get("start_comment"), fields.get("end_comment"))
+        if op == "Write": return self.write_doc(fields["selector"], fields.get("data", {}))
+        if op == "Format": return self.format_doc(fields["selector"])
+        if op == "Promote": return self.promote(fields.get("selector"))
+        raise ValueError(f"Unknown op: {op}")
+
+    # --- Commit ---
+    def commit(self):
+        """
+        Plans every queued edit against one snapshot and writes the file once.
+        All-or-nothing: if any edit fails (not found, conflict, overlap) nothing is written.
+        Returns (success, messages).
+        """
+        if not self.file_path: return False, ["No target set"]
+        if not self._ops: return True, []
+        if any(op in self.LOCKED_OPS for op, _ in self._ops):
+            try: Common.enforce_lock(self.file_path)
+            except PermissionError as e: return False, [str(e)]
+
+        try: parsed = AstCache.get(self.file_path)
+        except SyntaxError as e: return False, [f"解析错误: {e}"]
+        lines, index = parsed.lines, parsed.index
+
+        documents = DocumentManager(self.file_path, content=parsed.content, index=index)
+        checker = StyleChecker(use_target=False)
+        edits, messages, declared = [], [], set()
+        success = True
+        for op, kwargs in self._ops:
+            if op == "Declare":
+                edit, message = self._writer.plan_declare(lines, index, kwargs["code_block"], declared)
+                if edit is not None: declared |= CodeWriter.defined_names(ast.parse(kwargs["code_block"]))
+                planned = [edit] if edit else None
+            elif op == "Define":
+                edit, message = self._writer.plan_define(lines, index, **kwargs)
+                planned = [edit] if edit else None
+            elif op == "Write":
+                edit, message = documents.plan_write_comment(**kwargs)
+                planned = [edit] if edit else None
+            elif op == "Format":
+                edit, message = documents.plan_format_comment(**kwargs)
+                planned = [edit] if edit else None
+            else: # Promote
+                planned, promoted_count = checker.plan_promote(lines, index, kwargs["selector"])
+                message = f"成功: 已晋升 (Promote/Relock) {promoted_count} 处文档。"
+            messages.append(f"{op}: {message}")
+            if planned is None: success = False
+            else: edits.extend(planned)
+        if not success: return False, messages + ["事务已取消: 文件未修改。"]
+
+        try:
+            new_lines = Common.apply_edits(lines, edits)
+        except ValueError as e:
+            return False, messages + [f"冲突: {e}", "事务已取消: 文件未修改。"]
+        written = Common.write_if_changed(self.file_path, "\n".join(new_lines))
+        messages.append(f"成功: {len(self._ops)} 个编辑已提交。" if written else "文件无变化，未写入。")
+        for shred_path in self._shred_paths:
+            try: os.remove(shred_path); messages.append(f"已清理临时文件: {shred_path}")
+            except OSError: pass
+        self._ops, self._shred_paths = [], []
+        return True, messages
+
+
+def run_batch(batch_path, default_file=None):
+    """
+    Applies a JSONL batch: one {"op": ..., "file": optional, ...op fields} record per line.
+    Records are grouped per file (in order) and each file is committed as one transaction.
+    Returns True if every transaction succeeded.
+    """
+    transactions = {}
+    with open(batch_path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip(): continue
+            record = json.loads(line)
+            file_path = record.pop("file", None) or default_file or Common.get_full_target()[0]
+            if not file_path: raise ValueError(f"{batch_path}:{line_number}: no file and no target set")
+            key = os.path.abspath(file_path)
+            if key not in transactions: transactions[key] = EditTransaction(file_path)
+            transactions[key].queue(record.pop("op"), **record)
+
+    all_ok = True
+    for file_path, transaction in transactions.items():
+        success, messages = transaction.commit()
+        print(f"[{'OK' if success else 'FAILED'}] {file_path}")
+        for message in messages: print(f"  {message}")
+        all_ok = all_ok and success
+    return all_ok
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command")
+    p_batch = subparsers.add_parser("Batch", help="JSONL: {\"op\": \"Define\", \"name\": ..., \"code\": ...} per line")
+    p_batch.add_argument("batch_file")
+    p_batch.add_argument("--file", help="Default target (else SetTarget's file)")
+
+    args = parser.parse_args(argv)
+    if args.command == "Batch": return 0 if run_batch(args.batch_file, args.file) else 1
+    else: parser.print_help()
+
+if __name__ == "__main__":
+    from Daemon import forward
+    code = forward("Transaction", sys.argv[1:])
+    sys.exit(main() if code is None else code)
@@ -4,64 +4,40 @@ import argparse
 import ast
 import tkinter as tk
 from tkinter import messagebox
+from Common import Common
+from AstCache import AstCache
 
 def inject_unlock_tag(file_path, function_name=None):
     """
     Injects [Unlock] tag into the docstring of the file or specific function.
     """
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    lines = content.splitlines()
-
-    target_node = None
-    
     try:
-        tree = ast.parse(content)
-        # Search Scope
-        if function_name:
-            for node in ast.walk(tree):
-                if isinstance(node, (ast.FunctionDef, ast.ClassDef)) and node.name == function_name:
-                    target_node = node
-                    break
-        else:
-            # File level? Module docstring
-            if tree.body and isinstance(tree.body[0], ast.Expr) and isinstance(tree.body[0].value, (ast.Str, ast.Constant)):
-                target_node = tree # Module level handling is complex in AST node mapping without node visitor
-                # Let's stick to modifying the first docstring found or appending it
-                pass
+        parsed = AstCache.get(file_path)
     except SyntaxError:
         print("Error: Syntax Error parsing file.")
         return False
+    lines = list(parsed.lines)
 
-    if not target_node and function_name:
+    # Search Scope (name or Class.method)
+    target = parsed.index.find(function_name) if function_name else None
+    if not target and function_name:
         print(f"Error: Function {function_name} not found.")
         return False
 
     # Logic: Find Docstring Line
-    doc_node = None
-    
-    if target_node:
-        doc = ast.get_docstring(target_node)
-        if doc:
-            # Locate node
-            if isinstance(target_node, ast.Module):
-                # special case
-                doc_node = target_node.body[0]
-            elif target_node.body and isinstance(target_node.body[0], ast.Expr) and isinstance(target_node.body[0].value, (ast.Str, ast.Constant)):
-                doc_node = target_node.body[0]
-        else:
-            # No docstring, we should add one? 
-            # Or assume we can just modify file?
-            # If no docstring, it's technically "Draft" or "Error" state anyway (unless Impl comments lock it).
-            # But the user wants explicit [Unlock].
-            # Getting complicated. 
-            # Simplest Winyunq Protocol: If Locked (has docstring), we append [Unlock].
-            pass
+    doc_span = None
+    if target:
+        if target.doc: doc_span = target.doc_span
+        # No docstring: it's technically "Draft" or "Error" state anyway (unless Impl comments lock it).
+    else:
+        # File level: module docstring
+        tree = parsed.tree
+        if tree.body and isinstance(tree.body[0], ast.Expr) and isinstance(tree.body[0].value, ast.Constant) and isinstance(tree.body[0].value.value, str):
+            doc_span = (tree.body[0].lineno - 1, tree.body[0].end_lineno)
 
-    if doc_node:
+    if doc_span:
         # Edit existing docstring
-        s = doc_node.lineno - 1
-        e = doc_node.end_lineno
+        s, e = doc_span
         
         # Determine indentation
         indent = ""
@@ -81,25 +57,22 @@ def inject_unlock_tag(file_path, function_name=None):
         elif "'''" in last_line:
              lines[s + len(block) - 1] = last_line.replace("'''", "[Unlock] '''", 1)
         
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write("\n".join(lines))
+        Common.write_if_changed(file_path, "\n".join(lines))
         print(f"Success: Unlocked {function_name if function_name else file_path}")
         return True
     
     else:
         print("Warning: No docstring found. Code might be Draft already? Attempting global unlock injection.")
         # Fallback: Just append a comment [Unlock] to line 0 or before function
-        if function_name and target_node:
-             s = target_node.lineno - 1
-             indent = " " * target_node.col_offset
+        if function_name and target:
+             s = target.lineno - 1
+             indent = " " * target.col_offset
              lines.insert(s, f"{indent}# [Unlock]")
-             with open(file_path, 'w', encoding='utf-8') as f:
-                f.write("\n".join(lines))
+             Common.write_if_changed(file_path, "\n".join(lines))
              return True
         else:
              lines.insert(0, "# [Unlock]")
-             with open(file_path, 'w', encoding='utf-8') as f:
-                f.write("\n".join(lines))
+             Common.write_if_changed(file_path, "\n".join(lines))
              return True
         return False
 
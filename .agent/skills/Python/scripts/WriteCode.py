@@ -4,6 +4,7 @@ import argparse
 import ast
 import re
 from Common import Common
+from AstCache import AstCache, DEF_TYPES, FUNCTION_KINDS
 
 class CodeWriter:
     """
@@ -15,12 +16,8 @@ class CodeWriter:
     def __init__(self, use_target=True):
         self.file_path, self.scope = Common.get_full_target() if use_target else (None, None)
     
-    def _read_content(self):
-        if not self.file_path or not os.path.exists(self.file_path): return ""
-        with open(self.file_path, 'r', encoding='utf-8') as f: return f.read()
-
     def _write_content(self, content):
-        with open(self.file_path, 'w', encoding='utf-8') as f: f.write(content)
+        return Common.write_if_changed(self.file_path, content)
 
     def _resolve_code_input(self, code_input):
         """
@@ -47,121 +44,119 @@ class CodeWriter:
             # Handle standard escaped newlines if passed via shell
             return code_input.replace("\\n", "\n"), None
 
+    @staticmethod
+    def defined_names(tree):
+        return {n.name for n in ast.walk(tree) if isinstance(n, DEF_TYPES)} # Same kinds as SymbolIndex.names()
+
+    def plan_declare(self, lines, index, code_block, reserved_names=()):
+        """
+        Plans a Declare against a parsed snapshot (lines, AstCache.SymbolIndex) without touching the file.
+        reserved_names: names already declared by earlier edits of the same transaction.
+        Returns (edit, message): edit = (start_line, stop_line, new_lines) or None on error.
+        """
+        try:
+            new_names = self.defined_names(ast.parse(code_block))
+        except Exception as e:
+            return None, f"解析错误: {e}"
+        conflicts = (index.names() | set(reserved_names)) & new_names
+        if conflicts: return None, f"冲突: {list(conflicts)}"
+        return (len(lines), len(lines), [""] + code_block.splitlines()), "成功: 已声明对象。"
+
     def declare(self, code_block_arg):
         code_block, shred_path = self._resolve_code_input(code_block_arg)
         
         if not self.file_path: return
         try:
-            tree = ast.parse(self._read_content())
-            existing = {n.name for n in ast.walk(tree) if isinstance(n, (ast.FunctionDef, ast.ClassDef))}
-            input_tree = ast.parse(code_block)
-            new_names = {n.name for n in ast.walk(input_tree) if isinstance(n, (ast.FunctionDef, ast.ClassDef))}
+            parsed = AstCache.get(self.file_path)
         except Exception as e:
             print(f"解析错误: {e}")
             return
 
-        if existing.intersection(new_names):
-            print(f"冲突: {list(existing.intersection(new_names))}")
-            return
-
-        with open(self.file_path, 'a', encoding='utf-8') as f:
-            f.write("\n" + code_block + "\n")
-        print(f"成功: 已声明对象。")
+        lines = parsed.lines
+        edit, message = self.plan_declare(lines, parsed.index, code_block)
+        print(message)
+        if edit is None: return
+        self._write_content("\n".join(Common.apply_edits(lines, [edit])))
         
         if shred_path:
             try: os.remove(shred_path); print(f"已清理临时文件: {shred_path}")
             except: pass
 
-    def define(self, function_name, content_arg, mode="overwrite", 
-               start_comment=None, end_comment=None):
-        content, shred_path = self._resolve_code_input(content_arg)
-        
-        if not self.file_path: return
-        try: Common.enforce_lock(self.file_path)
-        except PermissionError as e: print(e); return
-
-        full_text = self._read_content()
-        lines = full_text.splitlines()
-        
+    def plan_define(self, lines, index, function_name, content, mode="overwrite",
+                    start_comment=None, end_comment=None):
+        """
+        Plans a Define against a parsed snapshot (lines, AstCache.SymbolIndex) without touching the file.
+        function_name: 名称或限定名 (Class.method)
+        Returns (edit, message): edit = (start_line, stop_line, new_lines) or None on error.
+        """
         # 1. 定位函数
-        target_node = None
-        try:
-            tree = ast.parse(full_text)
-            for node in ast.walk(tree):
-                if isinstance(node, ast.FunctionDef) and node.name == function_name:
-                    target_node = node
-                    break
-        except: return
-
-        if not target_node: print(f"错误: 函数 '{function_name}' 未找到"); return
-        
-        f_start = target_node.lineno - 1
-        base_indent = target_node.col_offset
-        f_end = f_start + 1
-        for i in range(f_start + 1, len(lines)):
-            l = lines[i]
-            if not l.strip(): continue 
-            if (len(l) - len(l.lstrip())) <= base_indent: break
-            f_end = i + 1
+        target = index.find(function_name, FUNCTION_KINDS)
+        if not target: return None, f"错误: 函数 '{function_name}' 未找到"
+        f_start, f_end = index.span(target) # 精确范围 (end_lineno)
             
-        # --- Write Logic (Simplified for brevity, assuming same Robust Logic as Step 227) ---
-        # Re-paste the robust logic logic here to ensure functional file.
-        
         if not start_comment: # Full Overwrite
-            if mode != "overwrite": print("Need start_comment for insert"); return
+            if mode != "overwrite": return None, "Need start_comment for insert"
             # Orig Output
             print("--- Backup (No Comments) ---")
             for l in lines[f_start:f_end]:
                 if not l.strip().startswith("#"): print(l)
             print("--------------------------")
             
-            if "def " + function_name in content:
-                new_lines = content.splitlines()
-                lines[f_start:f_end] = new_lines
-                print("Global Overwrite Success")
-            else: print("Error: Provide full def properly."); return
-
-        else: # Local
-            start_idx = -1
-            clean_comm = start_comment.strip()
-            for i in range(f_start, f_end):
-                if clean_comm in lines[i]: start_idx=i; break
-            
-            if start_idx == -1: print("Start comment not found"); return
-            
-            code_line_idx = -1
-            for i in range(start_idx+1, f_end):
-                if lines[i].strip() and not lines[i].strip().startswith("#"): code_line_idx=i; break
-            
-            if code_line_idx == -1: print("No code below comment"); return
-            
-            code_indent = len(lines[code_line_idx]) - len(lines[code_line_idx].lstrip())
-            end_idx = code_line_idx
-            is_block = lines[code_line_idx].strip().endswith(":")
-            
-            if is_block:
+            if "def " + target.name not in content: return None, "Error: Provide full def properly."
+            return (f_start, f_end, content.splitlines()), "Global Overwrite Success"
+
+        # Local
+        start_idx = -1
+        clean_comm = start_comment.strip()
+        for i in range(f_start, f_end):
+            if clean_comm in lines[i]: start_idx=i; break
+        
+        if start_idx == -1: return None, "Start comment not found"
+        
+        code_line_idx = -1
+        for i in range(start_idx+1, f_end):
+            if lines[i].strip() and not lines[i].strip().startswith("#"): code_line_idx=i; break
+        
+        if code_line_idx == -1: return None, "No code below comment"
+        
+        code_indent = len(lines[code_line_idx]) - len(lines[code_line_idx].lstrip())
+        end_idx = code_line_idx
+        is_block = lines[code_line_idx].strip().endswith(":")
+        
+        if is_block:
+            for i in range(code_line_idx+1, f_end):
+                l_next = lines[i]
+                if not l_next.strip(): continue
+                if (len(l_next)-len(l_next.lstrip())) <= code_indent: break
+                end_idx = i
+        else:
+            if mode == "overwrite" and end_comment:
                 for i in range(code_line_idx+1, f_end):
-                    l_next = lines[i]
-                    if not l_next.strip(): continue
-                    if (len(l_next)-len(l_next.lstrip())) <= code_indent: break
-                    end_idx = i
-            else:
-                if mode == "overwrite" and end_comment:
-                    for i in range(code_line_idx+1, f_end):
-                        if end_comment.strip() in lines[i]: end_idx=i; break
-            
-            indent_str = " " * code_indent
-            formatted = [indent_str + l.strip() for l in content.splitlines()]
-            
-            if mode == "overwrite":
-                lines[start_idx : end_idx + 1] = formatted
-                print("Local Overwrite Success")
-            elif mode == "insert":
-                if is_block: lines.insert(end_idx+1, "\n".join(formatted)) # Append IN block (implied)
-                else: lines.insert(end_idx+1, "\n".join(formatted))
-                print("Insert Success")
-
-        self._write_content("\n".join(lines))
+                    if end_comment.strip() in lines[i]: end_idx=i; break
+        
+        indent_str = " " * code_indent
+        formatted = [indent_str + l.strip() for l in content.splitlines()]
+        
+        if mode == "overwrite": return (start_idx, end_idx + 1, formatted), "Local Overwrite Success"
+        if mode == "insert": return (end_idx + 1, end_idx + 1, formatted), "Insert Success" # Below the statement / block
+        return None, f"Unknown mode: {mode}"
+
+    def define(self, function_name, content_arg, mode="overwrite", 
+               start_comment=None, end_comment=None):
+        content, shred_path = self._resolve_code_input(content_arg)
+        
+        if not self.file_path: return
+        try: Common.enforce_lock(self.file_path)
+        except PermissionError as e: print(e); return
+
+        try: parsed = AstCache.get(self.file_path)
+        except: return
+
+        lines = parsed.lines
+        edit, message = self.plan_define(lines, parsed.index, function_name, content, mode, start_comment, end_comment)
+        print(message)
+        if edit is None: return
+        self._write_content("\n".join(Common.apply_edits(lines, [edit])))
         
         if shred_path:
             try: os.remove(shred_path); print(f"已清理临时文件: {shred_path}")
@@ -171,7 +166,7 @@ class CodeWriter:
     def disable(self, name): pass
     def enable(self, name): pass
 
-if __name__ == "__main__":
+def main(argv=None):
     parser = argparse.ArgumentParser()
     subparsers = parser.add_subparsers(dest="command")
     
@@ -188,10 +183,15 @@ if __name__ == "__main__":
     p_en = subparsers.add_parser("Enable"); p_en.add_argument("name")
     p_dis = subparsers.add_parser("Disable"); p_dis.add_argument("name")
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     writer = CodeWriter()
     
     if args.command == "Declare": writer.declare(args.code)
     elif args.command == "Define": writer.define(args.name, args.code, args.mode, args.start_comment, args.end_comment)
     elif args.command == "Enable": writer.enable(args.name)
     elif args.command == "Disable": writer.disable(args.name)
+
+if __name__ == "__main__":
+    from Daemon import forward
+    code = forward("WriteCode", sys.argv[1:])
+    sys.exit(main() if code is None else code)
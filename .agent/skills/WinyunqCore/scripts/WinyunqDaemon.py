@@ -0,0 +1,200 @@
+import os
+import sys
+import json
+import time
+import zlib
+import getpass
+import tempfile
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+# Clients import this module on every call: server-only modules are imported where they are used
+# Shared by the skills: each skill's Daemon.py binds its scripts directory (script_dir below) and forwards here
+
+SERVED_SCRIPTS = ("ReadCode", "WriteCode", "CheckStyle", "AutomaticDocument", "Transaction", "ProjectIndex")
+IDLE_TIMEOUT = 30 * 60 # Seconds without a request before the daemon exits
+START_TIMEOUT = 5.0
+NO_DAEMON_ENV = "WINYUNQ_SKILL_NO_DAEMON" # Set to force in-process execution
+
+def skill_name(script_dir):
+    """Skill of a scripts directory: <skill>/scripts -> "Python" / "CPP"."""
+    return os.path.basename(os.path.dirname(os.path.abspath(script_dir)))
+
+def _info_path(script_dir):
+    """Per user + per skill checkout: address and authkey of the running daemon (0600)."""
+    try: user = getpass.getuser()
+    except Exception: user = "user"
+    checkout = f"{zlib.crc32(os.path.abspath(script_dir).encode('utf-8')):08x}"
+    return os.path.join(tempfile.gettempdir(), f"winyunq_skill_{skill_name(script_dir)}_{user}_{checkout}.json")
+
+def _load_info(info_path):
+    try:
+        with open(info_path, 'r', encoding='utf-8') as f: return json.load(f)
+    except (OSError, ValueError): return None
+
+def _request(script_dir, message):
+    """Sends one message to the script_dir skill's daemon. Returns None if no daemon is reachable."""
+    info = _load_info(_info_path(script_dir))
+    if not info: return None
+    try: conn = Client(info["address"], authkey=bytes.fromhex(info["authkey"]))
+    except (OSError, EOFError, AuthenticationError, KeyError, ValueError): return None # Stale info file
+    with conn:
+        conn.send(message)
+        try: return conn.recv()
+        except (OSError, EOFError) as e: return {"stdout": "", "stderr": f"[Daemon] 连接中断: {e}\n", "code": 2}
+
+def forward(script_dir, script, argv, stdin=None):
+    """
+    Thin client: runs `script argv` inside script_dir's daemon if one is running (stdin: text the command reads from stdin).
+    Returns the exit code, or None when no daemon answered (the caller runs main() in-process).
+    """
+    if os.environ.get(NO_DAEMON_ENV): return None
+    reply = _request(script_dir, {"command": "Run", "script": script, "argv": list(argv), "cwd": os.getcwd(), "stdin": stdin})
+    if reply is None: return None
+    sys.stdout.write(reply["stdout"]); sys.stderr.write(reply["stderr"])
+    return reply["code"]
+
+
+class SkillDaemon:
+    """
+    技能守护进程 [LOCKED]
+    Keeps the skill modules imported and their caches (Common.read_source / Common.parse / load_state)
+    warm, and serves the same commands as the scripts' CLIs, one request at a time.
+    Modules are re-imported when any script in the directory changes.
+    """
+    def __init__(self, script_dir, idle_timeout=IDLE_TIMEOUT):
+        self.script_dir = os.path.abspath(script_dir)
+        self.idle_timeout = idle_timeout
+        self._stamp = None
+        self._busy = False
+        self._last_request = time.monotonic()
+        self._served = 0
+
+    def _scripts_stamp(self):
+        return tuple(sorted((e.name, e.stat().st_mtime_ns) for e in os.scandir(self.script_dir) if e.name.endswith(".py")))
+
+    def _load(self, script):
+        import importlib
+        stamp = self._scripts_stamp()
+        if stamp != self._stamp:
+            # A script changed: drop every skill module so the next import reads the new source
+            for name, module in list(sys.modules.items()):
+                if name in ("__main__", __name__): continue
+                module_file = getattr(module, "__file__", None)
+                if module_file and os.path.dirname(os.path.abspath(module_file)) == self.script_dir: del sys.modules[name]
+            self._stamp = stamp
+        return importlib.import_module(script)
+
+    def _run(self, request):
+        import io, contextlib, traceback
+        stdout, stderr = io.StringIO(), io.StringIO()
+        code = 0
+        saved_stdin, sys.stdin = sys.stdin, io.StringIO(request.get("stdin") or "")
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            try:
+                if request.get("script") not in SERVED_SCRIPTS: raise ValueError(f"Not served: {request.get('script')}")
+                os.chdir(request["cwd"]) # Session file and relative paths resolve against the client's cwd
+                sys.argv = [os.path.join(self.script_dir, request["script"] + ".py")] + request["argv"] # argparse's prog
+                code = self._load(request["script"]).main(request["argv"]) or 0
+            except SystemExit as e: # argparse errors / --help
+                code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+                if isinstance(e.code, str): print(e.code, file=sys.stderr)
+            except Exception:
+                traceback.print_exc()
+                code = 1
+        sys.stdin = saved_stdin
+        return {"stdout": stdout.getvalue(), "stderr": stderr.getvalue(), "code": code}
+
+    def _status(self):
+        common = sys.modules.get("Common")
+        cached = len(common.Common._source_cache) if common else 0
+        return {"pid": os.getpid(), "skill": skill_name(self.script_dir), "served": self._served, "cached_files": cached,
+                "idle": round(time.monotonic() - self._last_request, 1)}
+
+    def _watch_idle(self, info_path):
+        while True:
+            time.sleep(min(30, self.idle_timeout))
+            if not self._busy and time.monotonic() - self._last_request > self.idle_timeout:
+                _remove_info(info_path, os.getpid())
+                os._exit(0)
+
+    def serve(self):
+        import threading
+        if self.script_dir not in sys.path: sys.path.insert(0, self.script_dir) # The skill's modules, before WinyunqCore's
+        authkey = os.urandom(32)
+        info_path = _info_path(self.script_dir)
+        with Listener(authkey=authkey) as listener: # AF_UNIX socket / Windows named pipe
+            _write_info(info_path, {"address": listener.address, "authkey": authkey.hex(), "pid": os.getpid()})
+            threading.Thread(target=self._watch_idle, args=(info_path,), daemon=True).start()
+            try:
+                while True:
+                    try: conn = listener.accept()
+                    except (OSError, EOFError, AuthenticationError): continue
+                    with conn:
+                        try: request = conn.recv()
+                        except (OSError, EOFError): continue
+                        self._busy, self._last_request = True, time.monotonic()
+                        command = request.get("command")
+                        if command == "Stop": conn.send({"stopped": True}); break
+                        reply = self._status() if command == "Status" else self._run(request)
+                        if command == "Run": self._served += 1
+                        try: conn.send(reply)
+                        except OSError: pass # Client went away
+                        self._busy, self._last_request = False, time.monotonic()
+            finally:
+                _remove_info(info_path, os.getpid())
+
+def _write_info(info_path, info):
+    fd = os.open(info_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f: json.dump(info, f)
+
+def _remove_info(info_path, pid):
+    info = _load_info(info_path)
+    if info and info.get("pid") == pid: # A newer daemon may own the file
+        try: os.remove(info_path)
+        except OSError: pass
+
+def start_daemon(script_dir):
+    """Starts a detached daemon for script_dir unless one is running. Returns its status dict (None if it did not come up)."""
+    import subprocess
+    script_dir = os.path.abspath(script_dir)
+    status = _request(script_dir, {"command": "Status"})
+    if status: return status
+    if os.name == "nt": detach = {"creationflags": subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP}
+    else: detach = {"start_new_session": True}
+    subprocess.Popen([sys.executable, os.path.abspath(__file__), "--script-dir", script_dir, "Serve"], cwd=script_dir, stdin=subprocess.DEVNULL,
+                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, close_fds=True, **detach)
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        status = _request(script_dir, {"command": "Status"})
+        if status: return status
+    return None
+
+def main(argv=None, script_dir=None):
+    """CLI of a skill's Daemon.py (script_dir: its scripts directory); run directly, --script-dir names the skill."""
+    import argparse
+    parser = argparse.ArgumentParser(description="常驻技能守护进程 (可选): 脚本自动转发到已启动的守护进程")
+    parser.add_argument("--script-dir", default=script_dir, required=script_dir is None, help="技能 scripts 目录")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("Start", help="后台启动")
+    subparsers.add_parser("Stop")
+    subparsers.add_parser("Status")
+    p_serve = subparsers.add_parser("Serve", help="前台运行 (Start 内部使用)")
+    p_serve.add_argument("--idle-timeout", type=int, default=IDLE_TIMEOUT)
+
+    args = parser.parse_args(argv)
+    if args.command == "Serve": SkillDaemon(args.script_dir, args.idle_timeout).serve()
+    elif args.command == "Start":
+        status = start_daemon(args.script_dir)
+        if not status: print("[Daemon] 启动失败"); return 1
+        print(f"[Daemon] 运行中: {json.dumps(status)}")
+    elif args.command == "Stop":
+        print("[Daemon] 已停止" if _request(args.script_dir, {"command": "Stop"}) else "[Daemon] 未运行")
+    elif args.command == "Status":
+        status = _request(args.script_dir, {"command": "Status"})
+        print(f"[Daemon] 运行中: {json.dumps(status)}" if status else "[Daemon] 未运行")
+    else: parser.print_help()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+import os
+import time
+import zlib
+import sqlite3
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+INDEX_DIR = ".winyunq" # Under the project root when no cache dir is set; holds a "*" .gitignore
+CACHE_ENV = "WINYUNQ_AST_CACHE_DIR" # Same cache dir as the skills' AstCache / CppLexer disk layers
+PARALLEL_THRESHOLD = 64 # Changed files below this are scanned in-process (pool start-up costs more)
+REFRESH_INTERVAL = 30.0 # Seconds: refresh() skips the directory walk if the index was updated more recently
+
+
+def index_path(root, name):
+    """
+    SQLite file of index name for root: $WINYUNQ_AST_CACHE_DIR/<crc32(root)>_<name>.sqlite, else root/.winyunq/<name>.sqlite.
+    The .winyunq directory gets a .gitignore ignoring everything in it (database, -wal and -shm files).
+    """
+    cache_dir = os.environ.get(CACHE_ENV)
+    if cache_dir:
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        return os.path.join(cache_dir, f"{zlib.crc32(root.encode('utf-8')):08x}_{name}.sqlite")
+    index_dir = os.path.join(root, INDEX_DIR)
+    os.makedirs(index_dir, exist_ok=True)
+    ignore_path = os.path.join(index_dir, ".gitignore")
+    if not os.path.exists(ignore_path):
+        with open(ignore_path, 'w', encoding='utf-8') as f: f.write("*\n")
+    return os.path.join(index_dir, name + ".sqlite")
+
+def _scan_chunk(scan_file, full_paths):
+    return [scan_file(full_path) for full_path in full_paths]
+
+
+class SqliteIndex:
+    """
+    项目索引基类 [LOCKED]
+    Shared by the Python and C++ skills' ProjectIndex: database location, schema reset, the incremental update and
+    its process pool. Subclasses set NAME / SCHEMA / SCHEMA_VERSION / TABLES / EXTENSIONS / SKIP_DIRS and
+    scan_file(full_path) -> (sha1, rows, error), rows holding one row list per TABLES entry (rows without the path).
+    update() is incremental: unchanged size/mtime_ns is skipped without reading, a changed mtime with the same sha1
+    only refreshes the stat, and changed files are scanned in a process pool.
+    """
+    NAME = None # Index file name (python / cpp)
+    SCHEMA = ""
+    SCHEMA_VERSION = 1
+    TABLES = () # Per-file row tables, in scan_file's rows order
+    EXTENSIONS = ()
+    SKIP_DIRS = set() # Plus every hidden directory (.git, .venv, .vs, ...)
+    scan_file = None # staticmethod of the subclass module (picklable for the pool)
+
+    def __init__(self, root, db_path=None):
+        self.root = os.path.abspath(root)
+        self.db_path = db_path or index_path(self.root, self.NAME)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        if self._schema_version() != self.SCHEMA_VERSION:
+            self.conn.executescript("".join(f"DROP TABLE IF EXISTS {table}; " for table in ("meta", "files") + self.TABLES))
+        self.conn.executescript("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);\n"
+                                "CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha1 TEXT, error TEXT);\n"
+                                + self.SCHEMA)
+        self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('schema_version', ?)", (str(self.SCHEMA_VERSION),))
+        self.conn.commit()
+
+    def _schema_version(self):
+        try: row = self.conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+        except sqlite3.OperationalError: return None
+        return int(row[0]) if row else None
+
+    def close(self):
+        self.conn.close()
+
+    def iter_source_files(self):
+        """Yields (relative_path, size, mtime_ns) for every file with one of EXTENSIONS under root."""
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".") and d not in self.SKIP_DIRS]
+            for filename in filenames:
+                if not filename.endswith(self.EXTENSIONS): continue
+                full_path = os.path.join(dirpath, filename)
+                try: st = os.stat(full_path)
+                except OSError: continue
+                yield os.path.relpath(full_path, self.root), st.st_size, st.st_mtime_ns
+
+    def refresh(self, workers=None, max_age=REFRESH_INTERVAL):
+        """update() unless the last one finished less than max_age seconds ago. Returns its stats, or None when skipped."""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'updated_at'").fetchone()
+        if row and 0 <= time.time() - float(row[0]) < max_age: return None
+        return self.update(workers)
+
+    def update(self, workers=None):
+        """Brings the index up to date. Returns {"scanned", "parsed", "removed", "seconds"}."""
+        started = time.perf_counter()
+        known = {path: (size, mtime_ns, sha1) for path, size, mtime_ns, sha1 in self.conn.execute("SELECT path, size, mtime_ns, sha1 FROM files")}
+        on_disk = list(self.iter_source_files())
+        changed = [(path, size, mtime_ns) for path, size, mtime_ns in on_disk if known.get(path, (None, None))[:2] != (size, mtime_ns)]
+        removed = set(known) - {path for path, _, _ in on_disk}
+
+        full_paths = [os.path.join(self.root, path) for path, _, _ in changed]
+        scan_chunk = partial(_scan_chunk, self.scan_file)
+        if len(changed) >= PARALLEL_THRESHOLD and (workers or os.cpu_count() or 1) > 1:
+            workers = workers or os.cpu_count()
+            chunk_size = max(1, len(full_paths) // (workers * 4))
+            chunks = [full_paths[i:i + chunk_size] for i in range(0, len(full_paths), chunk_size)]
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = [result for chunk in pool.map(scan_chunk, chunks) for result in chunk]
+        else:
+            results = scan_chunk(full_paths)
+
+        parsed = 0
+        with self.conn: # One transaction
+            for path in removed: self._delete(path)
+            for (path, size, mtime_ns), (sha1, rows, error) in zip(changed, results):
+                if sha1 is not None and path in known and known[path][2] == sha1 and error is None:
+                    # Touched but identical: refresh the stat only
+                    self.conn.execute("UPDATE files SET size = ?, mtime_ns = ? WHERE path = ?", (size, mtime_ns, path))
+                    continue
+                self._delete(path)
+                self.conn.execute("INSERT INTO files VALUES (?, ?, ?, ?, ?)", (path, size, mtime_ns, sha1, error))
+                for table, table_rows in zip(self.TABLES, rows):
+                    if not table_rows: continue
+                    marks = ", ".join("?" for _ in range(len(table_rows[0]) + 1))
+                    self.conn.executemany(f"INSERT INTO {table} VALUES ({marks})", [(path,) + tuple(row) for row in table_rows])
+                parsed += 1
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('updated_at', ?)", (repr(time.time()),))
+        return {"scanned": len(on_disk), "parsed": parsed, "removed": len(removed), "seconds": round(time.perf_counter() - started, 3)}
+
+    def _delete(self, path):
+        for table in ("files",) + self.TABLES: self.conn.execute(f"DELETE FROM {table} WHERE path = ?", (path,))
+
+    def errors(self):
+        return dict(self.conn.execute("SELECT path, error FROM files WHERE error IS NOT NULL"))
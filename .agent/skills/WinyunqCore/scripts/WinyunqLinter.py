@@ -2,6 +2,21 @@ import os
 import re
 import sys
 
+# File discovery is shared with the formatter (src/CodeStyle/file_system_utils.walk_files) when run from the repo
+_CODESTYLE_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "..", "src", "CodeStyle"))
+if os.path.isdir(_CODESTYLE_DIR) and _CODESTYLE_DIR not in sys.path: sys.path.insert(0, _CODESTYLE_DIR)
+try:
+    import file_system_utils
+except ImportError: # Skill installed on its own (e.g. ~/.gemini/skills): no pruning
+    file_system_utils = None
+
+LINT_EXTENSIONS = (".cpp", ".hpp", ".h", ".py")
+
+def find_lint_files(target):
+    """Files to lint under a directory (build/, install/, log/, .git and .gitignore'd paths are skipped)."""
+    if file_system_utils: return file_system_utils.find_relevant_files(target, extensions=LINT_EXTENSIONS)
+    return sorted(os.path.join(root, file) for root, dirs, files in os.walk(target) for file in files if file.endswith(LINT_EXTENSIONS))
+
 def check_file(file_path):
     violations = []
     
@@ -43,10 +58,8 @@ if __name__ == "__main__":
     if os.path.isfile(target):
         all_violations.extend(check_file(target))
     elif os.path.isdir(target):
-        for root, dirs, files in os.walk(target):
-            for file in files:
-                if file.endswith((".cpp", ".hpp", ".h", ".py")):
-                    all_violations.extend(check_file(os.path.join(root, file)))
+        for file_path in find_lint_files(target):
+            all_violations.extend(check_file(file_path))
 
     print(f"--- Winyunq Linter Report for {target} ---")
     if not all_violations:
@@ -1,9 +1,14 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import os
+import sys
 import shutil
 import json
 
+# Project scans use the formatter's file walker (ignore-aware, parallel)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src", "CodeStyle"))
+import file_system_utils
+
 class WinyunqManagerGUI:
     def __init__(self, root):
         self.root = root
@@ -139,18 +144,17 @@ class WinyunqManagerGUI:
         LockedCount = 0
         fileCount = 0
         
-        for root, dirs, files in os.walk(SrcDir):
-            for file in files:
-                if file.endswith((".cpp", ".hpp", ".py")):
-                    fileCount += 1
-                    with open(os.path.join(root, file), 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        # Simple check for formal block comments
-                        if "/**" in content or "##" in content:
-                            LockedCount += 1
-                            self.StatusArea.insert(tk.END, f"[LOCKED] {file}\n")
-                        else:
-                            self.StatusArea.insert(tk.END, f"[OPEN]   {file}\n")
+        for FilePath in file_system_utils.find_relevant_files(SrcDir, extensions=(".cpp", ".hpp", ".py")):
+            file = os.path.basename(FilePath)
+            fileCount += 1
+            with open(FilePath, 'r', encoding='utf-8') as f:
+                content = f.read()
+                # Simple check for formal block comments
+                if "/**" in content or "##" in content:
+                    LockedCount += 1
+                    self.StatusArea.insert(tk.END, f"[LOCKED] {file}\n")
+                else:
+                    self.StatusArea.insert(tk.END, f"[OPEN]   {file}\n")
                             
         self.StatusArea.insert(tk.END, f"\n--- Summary ---\nFiles: {fileCount}, Locked: {LockedCount}\n")
 
@@ -0,0 +1,9 @@
+# benchmarks/__init__.py
+# Formatter benchmark suite: corpus_generator (synthetic headers), harness (timings),
+# baseline (JSON baselines + regression check). Run: python -m benchmarks --help (from src/CodeStyle).
+import os
+import sys
+
+# Pipeline modules are flat imports (winyunq_formatter, ...) living one directory up
+_CODESTYLE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _CODESTYLE_DIR not in sys.path: sys.path.insert(0, _CODESTYLE_DIR)
@@ -0,0 +1,53 @@
+# benchmarks/__main__.py
+# Usage (from src/CodeStyle):
+#   python -m benchmarks --profile small                  # run, compare with baselines/small.json if present
+#   python -m benchmarks --profile small --save-baseline  # run and store baselines/small.json
+import sys
+import json
+import argparse
+
+from . import baseline, corpus_generator, harness
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Winyunq formatter benchmarks")
+    parser.add_argument("--profile", choices=sorted(corpus_generator.PROFILES), default="small")
+    parser.add_argument("--repeat", type=int, default=harness.DEFAULT_REPEAT)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--malformed-rate", type=float, default=0.1, help="Share of block lines with a broken ' * ' prefix")
+    parser.add_argument("--double-star-rate", type=float, default=0.5, help="Share of blocks ending with '**/' (rest ' */')")
+    parser.add_argument("--ascii", action="store_true", help="ASCII descriptions instead of CJK text")
+    parser.add_argument("--phase", type=int, default=4, help="Pipeline target_phase")
+    parser.add_argument("--corpus-dir", help="Keep the generated corpus here (default: temporary)")
+    parser.add_argument("--no-skills", action="store_true", help="Skip the skill script timings")
+    parser.add_argument("--baseline", help="Baseline JSON to compare with (default: baselines/<profile>.json)")
+    parser.add_argument("--save-baseline", nargs="?", const="", metavar="PATH", help="Store this run as the baseline")
+    parser.add_argument("--threshold", type=float, default=baseline.DEFAULT_THRESHOLD, help="Allowed throughput drop (0.2 = 20%%)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = harness.run_benchmarks(args.profile, args.corpus_dir, args.repeat, not args.no_skills, {"target_phase": args.phase}, args.seed,
+                                    malformed_rate=args.malformed_rate, double_star_rate=args.double_star_rate, cjk=not args.ascii)
+    report["corpus"]["target_phase"] = args.phase
+    print(json.dumps(report, indent=2, ensure_ascii=False) if args.json else harness.format_results(report))
+
+    if args.save_baseline is not None:
+        path = args.save_baseline or baseline.default_baseline_path(args.profile)
+        baseline.save_baseline(path, report)
+        print(f"\nBaseline saved: {path}")
+        return 0
+
+    baseline_path = args.baseline or baseline.default_baseline_path(args.profile)
+    baseline_report = baseline.load_baseline(baseline_path)
+    if baseline_report is None:
+        print(f"\nNo baseline at {baseline_path} (use --save-baseline).")
+        return 0
+    if baseline.corpus_mismatch(report, baseline_report):
+        print(f"\nWARN: {baseline_path} was measured on a different corpus; comparing anyway.")
+    regressions = baseline.compare(report, baseline_report, args.threshold)
+    print("\n" + baseline.format_regressions(regressions, args.threshold))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+# baseline.py
+import os
+import json
+
+# --- Baseline Settings ---
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+DEFAULT_THRESHOLD = 0.2 # Flag throughput drops of more than 20%
+
+
+def default_baseline_path(profile):
+    """baselines/<profile>.json next to this module."""
+    return os.path.join(BASELINE_DIR, f"{profile}.json")
+
+
+def save_baseline(path, report):
+    """Writes a harness.run_benchmarks report as a JSON baseline."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False, sort_keys=True)
+        f.write("\n")
+
+
+def load_baseline(path):
+    """Returns the baseline report dict, or None if the file is missing or unreadable."""
+    try:
+        with open(path, "r", encoding="utf-8") as f: return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def compare(report, baseline_report, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares throughputs of two run_benchmarks reports.
+    Benchmarks present in only one report are ignored.
+    Returns: list of (name, baseline_throughput, current_throughput, relative_change) for every
+             benchmark whose throughput dropped by more than threshold (0.2 = 20%), worst first.
+    """
+    regressions = []
+    baseline_results = baseline_report.get("results", {})
+    for name, entry in report.get("results", {}).items():
+        baseline_entry = baseline_results.get(name)
+        if not baseline_entry or not baseline_entry.get("throughput"): continue
+        change = entry["throughput"] / baseline_entry["throughput"] - 1.0
+        if change < -threshold: regressions.append((name, baseline_entry["throughput"], entry["throughput"], change))
+    return sorted(regressions, key=lambda regression: regression[3])
+
+
+def corpus_mismatch(report, baseline_report):
+    """True if the baseline was measured on a different corpus (numbers are not comparable)."""
+    return report.get("corpus") != baseline_report.get("corpus")
+
+
+def format_regressions(regressions, threshold=DEFAULT_THRESHOLD):
+    if not regressions: return f"No throughput regressions beyond {threshold:.0%}."
+    report_lines = [f"Throughput regressions beyond {threshold:.0%}:"]
+    report_lines.extend(f"  {name:<30} {old:>11.1f} -> {new:>11.1f}  ({change:+.1%})" for name, old, new, change in regressions)
+    return "\n".join(report_lines)
@@ -0,0 +1,120 @@
+# corpus_generator.py
+import os
+import random
+
+# --- Text Pools ---
+CJK_PHRASES = ["数据处理器", "初始化内部存储", "检查容量是否足够", "返回当前状态消息", "批量添加数据记录",
+               "处理结果数值表示", "如果记录未找到", "内部计数器", "用于示例函数", "可能包含空格分隔的数值"]
+ASCII_PHRASES = ["processes the data records", "initializes the internal storage", "checks the remaining capacity",
+                 "returns the current status message", "adds a batch of records", "numeric result of the operation",
+                 "if the record was not found", "internal counter", "used by the example", "may hold space separated values"]
+PARAM_TYPES = ["int", "size_t", "double", "const std::string&", "const std::vector<DataRecord>&", "bool"]
+RETURN_TYPES = ["void", "int", "size_t", "double", "bool", "ProcessingStatus"]
+EXTRA_TAGS = ["@note", "@warning", "@throws", "@see", "@param", "@retval"]
+
+# Malformed middle-line prefixes that stage 1 repairs (missing / misplaced '*')
+MALFORMED_PREFIXES = ["*", "   * ", "\t* ", "", "  "]
+
+# --- Profiles ---
+# files x classes x methods x tags per block; used by the harness and the CLI
+PROFILES = {
+    "small": {"file_count": 10, "class_count": 2, "method_count": 6, "tag_count": 4},
+    "medium": {"file_count": 40, "class_count": 4, "method_count": 12, "tag_count": 6},
+    "large": {"file_count": 120, "class_count": 8, "method_count": 20, "tag_count": 8},
+}
+
+
+class _BlockWriter:
+    """Emits Winyunq Doxygen blocks with the configured defect rates."""
+
+    def __init__(self, rng, malformed_rate, double_star_rate, cjk):
+        self.rng = rng
+        self.malformed_rate = malformed_rate
+        self.double_star_rate = double_star_rate
+        self.phrases = CJK_PHRASES if cjk else ASCII_PHRASES
+
+    def phrase(self):
+        return self.rng.choice(self.phrases)
+
+    def content_line(self, text):
+        if self.malformed_rate and self.rng.random() < self.malformed_rate:
+            return self.rng.choice(MALFORMED_PREFIXES) + text
+        return " * " + text if text else " *"
+
+    def block(self, tag_lines):
+        """tag_lines: list of middle-line texts (without prefix). Returns the block's lines."""
+        lines = ["/**"]
+        lines.extend(self.content_line(text) for text in tag_lines)
+        lines.append("**/" if self.rng.random() < self.double_star_rate else " */")
+        return lines
+
+    def method_tags(self, tag_count, param_names):
+        tag_lines = [f"@brief       {self.phrase()}", f" @details     {self.phrase()}。"]
+        for name in param_names:
+            tag_lines += ["", f"@param       {name:<30} 数据类型: {self.rng.choice(PARAM_TYPES)}", f" @details     {self.phrase()}"]
+        for _ in range(max(0, tag_count - 2 - len(param_names))):
+            tag = self.rng.choice(EXTRA_TAGS)
+            if tag == "@param": tag_lines.append(f"@param       extra{self.rng.randrange(100):<25} 数据类型: int")
+            elif tag == "@retval": tag_lines.append(f" @retval      {self.phrase()}")
+            else: tag_lines.append(f"  {tag:<12} {self.phrase()}")
+            if self.rng.random() < 0.3: tag_lines.append(self.phrase()) # Wrapped description line
+        tag_lines += ["", f"@return      {self.phrase()}                数据类型: {self.rng.choice(RETURN_TYPES)}"]
+        return tag_lines
+
+
+def generate_header(class_count=4, method_count=8, tag_count=4, malformed_rate=0.0, double_star_rate=0.5, cjk=True, seed=0, name="Generated"):
+    """
+    Builds a DataProcessor.hpp-style header.
+
+    Args:
+        class_count: Classes in the file.
+        method_count: Documented methods per class.
+        tag_count: Tag lines per method block (@brief/@details count; params are added first).
+        malformed_rate: Probability (0-1) that a block middle line has a broken ' * ' prefix.
+        double_star_rate: Probability (0-1) that a block ends with '**/' instead of ' */'.
+        cjk: Chinese description text (True) or ASCII.
+        seed: Random seed; the same arguments always give the same text.
+        name: Used in the file brief and class names.
+
+    Returns: str header text ('\\n' line breaks, trailing newline).
+    """
+    rng = random.Random(seed)
+    writer = _BlockWriter(rng, malformed_rate, double_star_rate, cjk)
+    lines = writer.block([f"@file {name}.hpp", f"@brief {writer.phrase()}", "", writer.phrase()])
+    lines += ["", "#pragma once", "#include <string>", "#include <vector>", "", "namespace CollaborativeAi {", ""]
+    for class_index in range(class_count):
+        class_name = f"{name}Processor{class_index}"
+        lines += writer.block([f"@class {class_name}", f"@brief {writer.phrase()}", f" @details {writer.phrase()}"])
+        lines += [f"class {class_name} {{", "/// 公共访问控制符：定义类的公共接口" if cjk else "/// Public interface", "public:"]
+        for method_index in range(method_count):
+            param_names = [f"value{i}" for i in range(rng.randrange(0, 3))]
+            lines += writer.block(writer.method_tags(tag_count, param_names))
+            params = ", ".join(f"{rng.choice(PARAM_TYPES)} {param}" for param in param_names)
+            lines.append(f"\t{rng.choice(RETURN_TYPES)} method{method_index}({params});")
+        lines += ["private:", f"\t/// @brief {writer.phrase()}", "\tsize_t counter;", "};", ""]
+    lines.append("} // namespace CollaborativeAi")
+    return "\n".join(lines) + "\n"
+
+
+def write_corpus(out_dir, file_count=10, seed=0, **header_options):
+    """
+    Writes file_count generated headers (Generated<i>.hpp, UTF-8) into out_dir.
+    header_options are passed to generate_header; file i uses seed + i.
+    Returns: list[str] of written paths.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for index in range(file_count):
+        name = f"Generated{index}"
+        path = os.path.join(out_dir, name + ".hpp")
+        with open(path, "w", encoding="utf-8", newline="\n") as f:
+            f.write(generate_header(seed=seed + index, name=name, **header_options))
+        paths.append(path)
+    return paths
+
+
+def write_profile_corpus(out_dir, profile="small", seed=0, **overrides):
+    """write_corpus with the sizes of PROFILES[profile] (overrides win)."""
+    options = dict(PROFILES[profile])
+    options.update(overrides)
+    return write_corpus(out_dir, seed=seed, **options)
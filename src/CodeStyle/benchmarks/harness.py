@@ -0,0 +1,125 @@
+# harness.py
+import os
+import sys
+import shutil
+import platform
+import tempfile
+import statistics
+import subprocess
+import contextlib
+
+import winyunq_formatter
+import pipeline_metrics
+from pipeline_metrics import timer
+from . import corpus_generator
+
+# --- Locations ---
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+SKILLS_DIR = os.path.join(REPO_ROOT, ".agent", "skills")
+
+# (benchmark name, script relative to SKILLS_DIR, argv; {root}/{file} are filled in)
+SKILL_COMMANDS = [
+    ("skill.cpp.SetTarget", "CPP/scripts/SetTarget.py", ["--root", "{root}", "--file", "{file}"]),
+    ("skill.cpp.ReadCode.List", "CPP/scripts/ReadCode.py", ["List"]),
+    ("skill.cpp.CheckStyle.Check", "CPP/scripts/CheckStyle.py", ["Check"]),
+    ("skill.core.WinyunqLinter", "WinyunqCore/scripts/WinyunqLinter.py", ["{root}"]),
+]
+
+DEFAULT_REPEAT = 3
+
+
+@contextlib.contextmanager
+def _quiet():
+    # The stages print progress/warnings per block; keep that out of the timings' terminal
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        yield
+
+
+def _entry(seconds, units, unit):
+    return {"seconds": seconds, "units": units, "unit": unit, "throughput": (units / seconds) if seconds > 0 else 0.0}
+
+
+# --- Pipeline ---
+def bench_pipeline(sources, config=None, repeat=DEFAULT_REPEAT):
+    """
+    Times winyunq_formatter.process_code over sources (list[str]), best of repeat runs.
+    No result cache or block memo, so every stage runs for every block.
+    Returns: dict name -> {'seconds', 'units', 'unit', 'throughput'}:
+        pipeline.process_code (input lines), pipeline.stage1 (input lines),
+        pipeline.stage2..4 (block lines entering stage 2).
+    """
+    input_lines = sum(source.count("\n") + (not source.endswith("\n")) for source in sources if source)
+    best = None
+    for _ in range(max(1, repeat)):
+        metrics = pipeline_metrics.new_metrics()
+        with _quiet():
+            for source in sources:
+                result = winyunq_formatter.process_code(source, config, collect_metrics=True)
+                pipeline_metrics.merge_metrics(metrics, result["summary"].get("metrics", {}))
+        if best is None or metrics["seconds"]["total"] < best["seconds"]["total"]: best = metrics
+
+    seconds = best["seconds"]
+    results = {"pipeline.process_code": _entry(seconds["total"], input_lines, "lines"),
+               "pipeline.stage1": _entry(seconds["stage1"], input_lines, "lines")}
+    for stage in pipeline_metrics.STAGE_NAMES[1:]:
+        results[f"pipeline.{stage}"] = _entry(seconds[stage], best["block_lines_in"], "lines")
+    return results
+
+
+# --- Skill Scripts ---
+def bench_skills(corpus_dir, target_file, repeat=DEFAULT_REPEAT, commands=None):
+    """
+    Times the skill scripts as an agent runs them (new interpreter per call), median of repeat runs.
+    Runs in corpus_dir, so the session file they share is written there.
+    target_file: corpus file (relative to corpus_dir) passed to SetTarget.
+    Returns: dict name -> entry (unit 'calls'); scripts missing from SKILLS_DIR are skipped.
+    """
+    results = {}
+    for name, script, argv in commands or SKILL_COMMANDS:
+        script_path = os.path.join(SKILLS_DIR, script)
+        if not os.path.isfile(script_path): continue
+        args = [arg.format(root=corpus_dir, file=target_file) for arg in argv]
+        timings = []
+        for _ in range(max(1, repeat)):
+            start = timer()
+            completed = subprocess.run([sys.executable, script_path] + args, cwd=corpus_dir, capture_output=True)
+            timings.append(timer() - start)
+        results[name] = _entry(statistics.median(timings), 1, "calls")
+        if completed.returncode != 0: results[name]["error"] = completed.stderr.decode("utf-8", "replace")[-500:]
+    return results
+
+
+# --- Full Run ---
+def run_benchmarks(profile="small", corpus_dir=None, repeat=DEFAULT_REPEAT, skills=True, config=None, seed=0, **corpus_options):
+    """
+    Generates a corpus (PROFILES[profile] + corpus_options) and runs every benchmark.
+    corpus_dir: Where to write the corpus (None = temporary directory, removed afterwards).
+    Returns: report dict {'profile', 'corpus', 'environment', 'results'} (see baseline.save_baseline).
+    """
+    temporary = corpus_dir is None
+    if temporary: corpus_dir = tempfile.mkdtemp(prefix="winyunq_bench_")
+    try:
+        paths = corpus_generator.write_profile_corpus(corpus_dir, profile, seed, **corpus_options)
+        sources = []
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as f: sources.append(f.read())
+        corpus = dict(corpus_generator.PROFILES[profile], **corpus_options)
+        corpus.update({"seed": seed, "bytes": sum(len(source.encode("utf-8")) for source in sources)})
+
+        results = bench_pipeline(sources, config, repeat)
+        if skills: results.update(bench_skills(corpus_dir, os.path.basename(paths[0]), repeat))
+    finally:
+        if temporary: shutil.rmtree(corpus_dir, ignore_errors=True)
+    environment = {"python": platform.python_version(), "platform": platform.platform(), "machine": platform.machine()}
+    return {"profile": profile, "corpus": corpus, "environment": environment, "results": results}
+
+
+def format_results(report):
+    """Text table of a run_benchmarks report."""
+    report_lines = [f"Profile: {report['profile']}   Corpus: {report['corpus']}", "",
+                    f"{'Benchmark':<30} {'Seconds':>10} {'Throughput':>16}"]
+    for name, entry in sorted(report["results"].items()):
+        line = f"{name:<30} {entry['seconds']:>10.4f} {entry['throughput']:>11.1f} {entry['unit']}/s"
+        if entry.get("error"): line += "  (exit code != 0)"
+        report_lines.append(line)
+    return "\n".join(report_lines)
@@ -1,11 +1,184 @@
 # block_extractor.py 
 import re
+from bisect import bisect_right
+from itertools import accumulate, repeat
+from operator import add
 
 STATUS_UNMODIFIED = "unmodified"
 STATUS_MODIFIED = "modified"
 STATUS_ERROR = "error"
 STATUS_BOUNDARY = "boundary" 
 
+# --- Scanner Patterns ---
+# One combined pattern drives the whole scan: openers and closers are found in
+# source order, so each character is visited a constant number of times.
+_MARKER_PATTERN = re.compile(r"/\*\*|\*/")
+# Same line boundaries as str.splitlines(), so line indexes stay compatible.
+_LINE_BREAK_PATTERN = re.compile(r"\r\n|[\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]")
+_OTHER_BREAK_PATTERN = re.compile(r"[\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]") # Any break but '\n'
+
+
+def build_line_offsets(code_string):
+    """
+    Builds the table of line start offsets used for binary-search line lookup.
+    Returns: (line_starts, line_ends) - line_ends exclude the line break itself.
+    """
+    if not _OTHER_BREAK_PATTERN.search(code_string):
+        # Only '\n' breaks: line lengths from str.split, offsets by running sum (no per-line bytecode)
+        line_lengths = list(map(len, code_string.split("\n")))
+        line_starts = list(accumulate(map(add, line_lengths[:-1], repeat(1)), initial=0))
+        line_ends = list(map(add, line_starts, line_lengths))
+        if len(line_starts) > 1 and line_starts[-1] == len(code_string):
+            line_starts.pop(); line_ends.pop()
+        return line_starts, line_ends
+    line_starts = [0]
+    line_ends = []
+    for match in _LINE_BREAK_PATTERN.finditer(code_string):
+        line_ends.append(match.start())
+        line_starts.append(match.end())
+    line_ends.append(len(code_string))
+    if line_starts[-1] == len(code_string) and len(line_starts) > 1:
+        # Trailing line break: splitlines() does not report an empty last line
+        line_starts.pop(); line_ends.pop()
+    return line_starts, line_ends
+
+
+def _normalize_content_line(orig_content_line):
+    """Normalizes one middle line of a block to the ' * ' prefix. Returns (text, status)."""
+    status_content = STATUS_UNMODIFIED # Assume GREEN
+    stripped_line = orig_content_line.lstrip()
+    target_prefix = " * "
+
+    # Determine normalized form and if modification occurred
+    if stripped_line.startswith("* "):
+        markdown_part = stripped_line[2:]
+        # Check original physical prefix
+        if not orig_content_line.startswith(" * "):
+            status_content = STATUS_MODIFIED # BLUE
+    elif stripped_line.startswith("*"):
+        status_content = STATUS_MODIFIED # BLUE
+        target_prefix = " *" if len(stripped_line) == 1 else " * "
+        markdown_part = "" if len(stripped_line) == 1 else stripped_line[1:]
+    elif stripped_line == "":
+        target_prefix = " *"
+        markdown_part = ""
+        if orig_content_line.strip() != "*" and orig_content_line.strip() != "":
+            status_content = STATUS_MODIFIED # BLUE
+        elif orig_content_line != " *": # If original was "*" or just spaces
+            status_content = STATUS_MODIFIED # BLUE
+    else: # Missing '*' prefix
+        status_content = STATUS_MODIFIED # BLUE
+        markdown_part = stripped_line
+    return target_prefix + markdown_part, status_content
+
+
+def normalize_block_lines(block_lines_orig, start_col0, is_single_star_end):
+    """
+    Normalizes the original lines of one block (opener line .. closer line).
+    Returns: list[tuple(text, status)] - the 'processed_lines' of a block dict.
+    """
+    processed_lines = []
+
+    # Start Line
+    start_line_text = block_lines_orig[0]
+    status_start = STATUS_BOUNDARY
+    if start_line_text.strip() != "/**": status_start = STATUS_ERROR
+    elif not start_col0: status_start = STATUS_MODIFIED
+    processed_lines.append(("/**", status_start))
+
+    # Middle Lines
+    for orig_content_line in block_lines_orig[1:-1]:
+        processed_lines.append(_normalize_content_line(orig_content_line))
+
+    # End Line
+    end_line_text = block_lines_orig[-1]; status_end = STATUS_BOUNDARY
+    original_end_marker_at_col0 = end_line_text.startswith("**/") or end_line_text.startswith("*/")
+    stripped_end = end_line_text.strip()
+    if is_single_star_end and stripped_end == "*/": status_end = STATUS_MODIFIED
+    elif stripped_end == "**/":
+        if not original_end_marker_at_col0: status_end = STATUS_MODIFIED
+    else: status_end = STATUS_ERROR
+    if len(block_lines_orig) > 1 or len(processed_lines) == 1:
+        processed_lines.append(("**/", status_end))
+    return processed_lines
+
+
+def scan_blocks(code_string):
+    """
+    Pipeline Stage 1 engine: single forward pass over the source.
+    A '/**' opens a block when it is the first non-blank text of its line
+    (and not '/***/'); the block closes at the first '*/' after it ('**/' counts
+    as the same closer). Line numbers come from bisect over the offset table.
+
+    Yields: dict per block:
+        {'processed_lines': list[tuple(text, status)], 'start_line_orig': int,
+         'end_line_orig': int, 'start_char': int, 'end_char': int}
+    """
+    line_starts, line_ends = build_line_offsets(code_string)
+    return _scan_blocks_with_offsets(code_string, line_starts, line_ends)
+
+
+def _scan_blocks_with_offsets(code_string, line_starts, line_ends):
+    """scan_blocks() body, reusing an offset table the caller already built."""
+    line_count = len(line_starts)
+    pos = 0
+    open_info = None # (start_index, start_line_idx) while inside a block
+
+    while True:
+        match = _MARKER_PATTERN.search(code_string, pos)
+        if not match: break
+        marker_index = match.start()
+
+        if open_info is None:
+            if match.group() != "/**":
+                pos = marker_index + 1; continue # Stray closer outside any block
+            line_idx = bisect_right(line_starts, marker_index) - 1
+            line_start = line_starts[line_idx]
+            leading = code_string[line_start:marker_index]
+            if (leading and not leading.isspace()) or code_string.startswith("/***/", marker_index):
+                # Only the first '/**' of a line can open a block - skip the rest of the line
+                pos = line_starts[line_idx + 1] if line_idx + 1 < line_count else len(code_string)
+                continue
+            open_info = (marker_index, line_idx)
+            pos = marker_index + 3
+            continue
+
+        if match.group() != "*/":
+            pos = marker_index + 1; continue # '/**' inside a block, its '*/' may overlap
+        start_index, start_line_idx = open_info
+        open_info = None
+        is_single_star_end = not (marker_index - 1 >= start_index + 3 and code_string[marker_index - 1] == "*")
+        end_index_absolute = match.end()
+        end_line_idx = bisect_right(line_starts, end_index_absolute - 1) - 1
+
+        block_lines_orig = [code_string[line_starts[i]:line_ends[i]] for i in range(start_line_idx, end_line_idx + 1)]
+        start_col0 = (start_index == line_starts[start_line_idx])
+        yield {
+            "processed_lines": normalize_block_lines(block_lines_orig, start_col0, is_single_star_end),
+            "start_line_orig": start_line_idx, "end_line_orig": end_line_idx,
+            "start_char": start_index, "end_char": end_index_absolute
+        }
+        # The next block can only start on a later line
+        pos = line_starts[end_line_idx + 1] if end_line_idx + 1 < line_count else len(code_string)
+
+    if open_info is not None:
+        # No '*/' after this opener, so no later opener can close either
+        start_index, start_line_idx = open_info
+        line_idx = start_line_idx
+        while line_idx is not None:
+            print(f"Warning: Found '/**' at line {line_idx + 1} but no closing tag.")
+            line_idx = _next_opener_line(code_string, line_starts, line_ends, line_idx + 1)
+
+
+def _next_opener_line(code_string, line_starts, line_ends, first_line_idx):
+    """Returns the index of the next line (>= first_line_idx) that could open a block, or None."""
+    for line_idx in range(first_line_idx, len(line_starts)):
+        stripped_line = code_string[line_starts[line_idx]:line_ends[line_idx]].lstrip()
+        if stripped_line.startswith("/**") and not stripped_line.startswith("/***/"):
+            return line_idx
+    return None
+
+
 def extract_and_normalize_boundaries(code_string):
     """
     Pipeline Stage 1: Extracts Doxygen blocks, normalizes/forces 
@@ -15,131 +188,134 @@ def extract_and_normalize_boundaries(code_string):
     Returns: list[dict]: 
         {'processed_lines': list[tuple(text, status)], 'start_line_orig': int, ...}
     """
-    # ... (在这里实现我们上一轮讨论的、正确的 extract_and_normalize_boundaries 逻辑) ...
-    # ... 这个函数现在只在这里实现一次 ...
-    processed_blocks_info = []
-    lines_original = code_string.splitlines()
-    # ... (查找、处理、状态标记逻辑 - 从上个回复复制过来) ...
-    current_pos = 0
-    line_start_positions = [0]
-    for i, line in enumerate(lines_original):
-        current_pos += len(line) + (1 if i < len(lines_original) - 1 else 0)
-        line_start_positions.append(current_pos)
-
-    def get_line_index(char_index):
-        for i in range(len(line_start_positions) - 1):
-            if line_start_positions[i] <= char_index < line_start_positions[i+1]: return i
-        if char_index >= line_start_positions[-1]: return len(lines_original) - 1
-        return len(lines_original) - 1
-
-    potential_block_starts = []
-    for i, line in enumerate(lines_original):
-        match = re.search(r"/\*\*", line)
-        if match:
-            stripped_line = line.lstrip()
-            if stripped_line.startswith("/**") and not stripped_line.startswith("/***/"):
-                start_offset_in_line = match.start()
-                start_char_index = line_start_positions[i] + start_offset_in_line
-                starts_at_col_0 = (start_offset_in_line == 0)
-                potential_block_starts.append({ "start_marker": "/**", "start_index": start_char_index, "start_line": i, "start_col0": starts_at_col_0, "start_line_text": line })
-
-    potential_block_starts.sort(key=lambda x: x["start_index"])
-    processed_spans = set()
-    processed_char_end = 0
-
-    for start_info in potential_block_starts:
-        start_index = start_info["start_index"]; start_line_idx = start_info["start_line"]
-        start_col0 = start_info["start_col0"]; start_line_text = start_info["start_line_text"] 
-
-        if start_line_idx in processed_spans or start_index < processed_char_end: continue
-
-        search_start = start_index + 3
-        end_match_double = re.search(r"\*\*/", code_string[search_start:])
-        end_match_single = re.search(r"\*/", code_string[search_start:])
-        chosen_end_match = None; is_single_star_end = False
-        if end_match_double and end_match_single:
-            chosen_end_match = end_match_double if end_match_double.start() <= end_match_single.start() else end_match_single
-            is_single_star_end = (chosen_end_match == end_match_single) and (end_match_double.start() > end_match_single.start() if end_match_double else True)
-        elif end_match_double: chosen_end_match = end_match_double
-        elif end_match_single: chosen_end_match = end_match_single; is_single_star_end = True
-            
-        if chosen_end_match:
-            end_index_relative = chosen_end_match.end()
-            end_index_absolute = search_start + end_index_relative
-            end_line_idx = get_line_index(end_index_absolute - 1)
-
-            current_block_span = range(start_line_idx, end_line_idx + 1)
-            if any(i in processed_spans for i in current_block_span): continue
-
-            processed_lines = []
-            
-            # Start Line
-            status_start = STATUS_BOUNDARY
-            if start_line_text.strip() != "/**": status_start = STATUS_ERROR
-            elif not start_col0: status_start = STATUS_MODIFIED
-            processed_lines.append(("/**", status_start))
-
-            # Middle Lines
-            for i in range(start_line_idx + 1, end_line_idx):
-                 if i < len(lines_original): 
-                    # --- START MODIFICATION ---
-                    orig_content_line = lines_original[i]
-                    status_content = STATUS_UNMODIFIED # Assume GREEN
-                    normalized_line = ""
-                    stripped_line = orig_content_line.lstrip()
-                    target_prefix = " * "
-                    markdown_part = ""
-
-                    # Determine normalized form and if modification occurred
-                    if stripped_line.startswith("* "): 
-                        markdown_part = stripped_line[2:]
-                        normalized_line = target_prefix + markdown_part
-                        # Check original physical prefix
-                        if not orig_content_line.startswith(" * "): 
-                            status_content = STATUS_MODIFIED # BLUE
-                    elif stripped_line.startswith("*"): 
-                        status_content = STATUS_MODIFIED # BLUE
-                        target_prefix = " *" if len(stripped_line) == 1 else " * "
-                        markdown_part = "" if len(stripped_line) == 1 else stripped_line[1:]
-                        normalized_line = target_prefix + markdown_part
-                    elif stripped_line == "": 
-                        target_prefix = " *"
-                        markdown_part = ""
-                        normalized_line = target_prefix + markdown_part
-                        if orig_content_line.strip() != "*" and orig_content_line.strip() != "": 
-                             status_content = STATUS_MODIFIED # BLUE
-                        elif orig_content_line != " *": # If original was "*" or just spaces
-                             status_content = STATUS_MODIFIED # BLUE
-                    else: # Missing '*' prefix
-                        status_content = STATUS_MODIFIED # BLUE
-                        markdown_part = stripped_line
-                        normalized_line = target_prefix + markdown_part
-                    
-                    processed_lines.append((normalized_line, status_content)) 
-                    # --- END MODIFICATION ---
-                 # else: line index out of bounds? Should not happen if end_line_idx is correct
-                 
-            # End Line
-            if end_line_idx >= start_line_idx and end_line_idx < len(lines_original):
-                 end_line_text = lines_original[end_line_idx]; status_end = STATUS_BOUNDARY
-                 original_end_marker_at_col0 = end_line_text.startswith("**/") or end_line_text.startswith("*/")
-                 stripped_end = end_line_text.strip()
-                 if is_single_star_end and stripped_end == "*/": status_end = STATUS_MODIFIED
-                 elif stripped_end == "**/":
-                      if not original_end_marker_at_col0: status_end = STATUS_MODIFIED
-                 else: status_end = STATUS_ERROR 
-                 if end_line_idx > start_line_idx or len(processed_lines) == 1:
-                       processed_lines.append(("**/", status_end))
-
-            processed_blocks_info.append({
-                "processed_lines": processed_lines, "start_line_orig": start_line_idx, "end_line_orig": end_line_idx,
-                "start_char": start_index, "end_char": end_index_absolute
-            })
-            for i in current_block_span: processed_spans.add(i)
-            processed_char_end = end_index_absolute
-        else:
-            print(f"Warning: Found '/**' at line {start_line_idx + 1} but no closing tag.")
-
-    return processed_blocks_info
+    return list(scan_blocks(code_string))
+
+# --- Lazy / Streaming API ---
+SEGMENT_CODE = "code"
+SEGMENT_BLOCK = "block"
+SEGMENT_CODE_RUN = "code_run"
+
+
+def _opener_column(line_text):
+    """Column of the '/**' that opens a block on this line, or -1."""
+    stripped_line = line_text.lstrip()
+    if stripped_line.startswith("/**") and not stripped_line.startswith("/***/"):
+        return len(line_text) - len(stripped_line)
+    return -1
+
+
+def is_block_opener(line_text):
+    """True if a scan starting on this line would open a block here (see _opener_column)."""
+    return _opener_column(line_text) >= 0
+
+
+def _iter_physical_lines(source):
+    """Yields lines of an iterable source (file object, list of lines) with their line break kept."""
+    for chunk in source:
+        # Split further on every splitlines() boundary, so line numbers match process_code
+        for line in chunk.splitlines(keepends=True):
+            yield line
+
+
+def _iter_streamed_segments(source):
+    """iter_segments() for iterables of lines: holds at most one open block in memory."""
+    line_idx = -1
+    char_pos = 0
+    block_lines = None # Original lines of the open block (without line breaks)
+    block_start = None # (start_char, start_col0)
+    block_start_line = 0
+
+    for raw_line in _iter_physical_lines(source):
+        line_idx += 1
+        line_text = raw_line.rstrip("\r\n\v\f\x1c\x1d\x1e\x85\u2028\u2029")
+        line_start_char = char_pos
+        char_pos += len(raw_line)
+
+        search_from = 0
+        if block_lines is None:
+            col = _opener_column(line_text)
+            if col < 0:
+                yield (SEGMENT_CODE, line_idx, line_text)
+                continue
+            block_lines = []
+            block_start = (line_start_char + col, col == 0)
+            block_start_line = line_idx
+            search_from = col + 3
+        block_lines.append(line_text)
+
+        close_col = line_text.find("*/", search_from)
+        if close_col < 0: continue
+        is_single_star_end = not (close_col - 1 >= search_from and line_text[close_col - 1] == "*")
+        yield (SEGMENT_BLOCK, {
+            "processed_lines": normalize_block_lines(block_lines, block_start[1], is_single_star_end),
+            "start_line_orig": block_start_line, "end_line_orig": line_idx,
+            "start_char": block_start[0], "end_char": line_start_char + close_col + 2
+        })
+        block_lines = None
+
+    if block_lines is not None:
+        # Unclosed block: every buffered line is plain code, later openers cannot close either
+        for offset, line_text in enumerate(block_lines):
+            if offset == 0 or _opener_column(line_text) >= 0:
+                print(f"Warning: Found '/**' at line {block_start_line + offset + 1} but no closing tag.")
+            yield (SEGMENT_CODE, block_start_line + offset, line_text)
+
+
+def iter_segment_runs(code_string, line_starts, line_ends):
+    """
+    Like iter_segments() for a str, but code lines come as runs instead of one by one.
+    line_starts/line_ends: the build_line_offsets(code_string) table.
+
+    Yields:
+        (SEGMENT_CODE_RUN, first_line, stop_line) for code lines [first_line, stop_line),
+        (SEGMENT_BLOCK, block_dict) for blocks.
+    """
+    next_code_line = 0
+    for block_data in _scan_blocks_with_offsets(code_string, line_starts, line_ends):
+        if block_data["start_line_orig"] > next_code_line:
+            yield (SEGMENT_CODE_RUN, next_code_line, block_data["start_line_orig"])
+        yield (SEGMENT_BLOCK, block_data)
+        next_code_line = block_data["end_line_orig"] + 1
+    line_count = len(line_starts) if code_string else 0
+    if line_count > next_code_line:
+        yield (SEGMENT_CODE_RUN, next_code_line, line_count)
+
+
+def _iter_string_segments(code_string):
+    """iter_segments() for an in-memory string, driven by scan_blocks()."""
+    line_starts, line_ends = build_line_offsets(code_string)
+    for segment in iter_segment_runs(code_string, line_starts, line_ends):
+        if segment[0] == SEGMENT_BLOCK:
+            yield segment
+            continue
+        for i in range(segment[1], segment[2]):
+            yield (SEGMENT_CODE, i, code_string[line_starts[i]:line_ends[i]])
+
+
+def iter_segments(source):
+    """
+    Lazily splits a source into code lines and Doxygen blocks, in source order.
+
+    Args:
+        source: str, or any iterable of text lines (e.g. an open text file).
+                Iterables are streamed: memory stays bounded by the largest block.
+
+    Yields:
+        (SEGMENT_CODE, orig_line, text) for lines outside blocks,
+        (SEGMENT_BLOCK, block_dict) for blocks (same dicts as scan_blocks()).
+    """
+    if isinstance(source, str):
+        return _iter_string_segments(source)
+    return _iter_streamed_segments(source)
+
+
+def iter_blocks(source):
+    """
+    Lazy variant of extract_and_normalize_boundaries().
+    Accepts a str or an iterable of lines (see iter_segments) and yields block dicts.
+    """
+    for segment in iter_segments(source):
+        if segment[0] == SEGMENT_BLOCK:
+            yield segment[1]
 
 # Possible future functions for block extraction if needed
\ No newline at end of file
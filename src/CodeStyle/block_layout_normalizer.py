@@ -1,4 +1,5 @@
 # block_layout_normalizer.py (Placeholder for Stage 3)
+from line_buffer import LineBuffer
 
 # Define or import status constants consistently
 STATUS_UNMODIFIED = "unmodified" 
@@ -26,18 +27,18 @@ def normalize_block_layout(segmented_sorted_blocks, config, block_start_orig_lin
         block_start_orig_line: The original starting line number for mapping.
 
     Returns:
-        A list of dictionaries, representing the lines of the fully layout-normalized block:
-        [{'text': str, 'status': str, 'orig_line': int}, ...] 
+        A line_buffer.LineBuffer with the lines of the fully layout-normalized block
+        (iterating it gives [{'text': str, 'status': str, 'orig_line': int}, ...]).
         Status reflects changes made in *this* stage (T1, T0 subsequent line fixes).
     """
     print(f"--- Running Actual Stage 3: normalize_block_layout (Placeholder) ---") # Debug
     
-    final_lines_info = []
+    final_lines_info = LineBuffer()
     current_orig_line_approx = block_start_orig_line # Approximate mapping
     
     # Add /** boundary (status determined by Stage 1, need to pass it through)
     # For placeholder, assume it was ok
-    final_lines_info.append({"text": "/**", "status": STATUS_BOUNDARY, "orig_line": current_orig_line_approx })
+    final_lines_info.append("/**", STATUS_BOUNDARY, current_orig_line_approx)
     current_orig_line_approx += 1
 
     # --- Logic to process blocks and apply T1/T0 ---
@@ -143,7 +144,7 @@ def normalize_block_layout(segmented_sorted_blocks, config, block_start_orig_lin
 
     # Add **/ boundary (status determined by Stage 1, needs to be passed through)
     # For placeholder, assume it was ok
-    final_lines_info.append({"text": "**/", "status": STATUS_BOUNDARY, "orig_line": current_orig_line_approx })
+    final_lines_info.append("**/", STATUS_BOUNDARY, current_orig_line_approx)
 
     print(f"--- Stage 3 Result: Processed {len(segmented_sorted_blocks)} logical blocks (Placeholder Layout). ---")
     return final_lines_info
@@ -154,8 +155,9 @@ def normalize_block_layout(segmented_sorted_blocks, config, block_start_orig_lin
 def generate_debug_output_lines(structure, block_start_orig_line=0):
      print("--- Generating Stage 3 Debug Output (Placeholder) ---")
      # Placeholder debug output
-     lines = [{"text": "-- Debug Tree Placeholder --", "status": STATUS_DEBUG, "orig_line": block_start_orig_line}]
+     lines = LineBuffer()
+     lines.append("-- Debug Tree Placeholder --", STATUS_DEBUG, block_start_orig_line)
      for i, node in enumerate(structure): # Assuming structure is list of TagNode from a *real* parser
-          lines.append({"text":f" Node {i}: {node!r}", "status": STATUS_DEBUG, "orig_line": block_start_orig_line+i+1})
-     lines.append({"text":"-- End Debug --", "status": STATUS_INFO, "orig_line":block_start_orig_line + len(structure)+1})
+          lines.append(f" Node {i}: {node!r}", STATUS_DEBUG, block_start_orig_line+i+1)
+     lines.append("-- End Debug --", STATUS_INFO, block_start_orig_line + len(structure)+1)
      return lines
\ No newline at end of file
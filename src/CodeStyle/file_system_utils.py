@@ -1,65 +1,241 @@
 # file_system_utils.py
 import os
+import re
+import time
+import fnmatch
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_EXTENSIONS = (".h", ".cpp", ".hpp", ".c") # find_relevant_files / walk_files
+DEFAULT_IGNORE_PATTERNS = ("/build/", "/install/", "/log/", # colcon outputs: only at the walked (workspace) root
+                           ".git/", "node_modules/", "__pycache__/") # VCS / tool dirs: at any depth
+IGNORE_FILE = ".gitignore" # Read in every walked directory, applies below it
+WALK_WORKERS = min(8, os.cpu_count() or 1) # walk_files threads (directory listing is I/O bound)
+DEFAULT_TREE_FILTERS = (".h", ".cpp", ".hpp", ".c", ".txt")
+TREE_PAGE_SIZE = 200 # Nodes per page of iter_tree_node_pages
+LISTING_CACHE_LIMIT = 1024 # Directories kept by list_directory
+LISTING_SETTLE_NS = 2 * 10**9 # Listings of directories changed this recently are not cached (coarse mtimes)
+
+_listing_cache = {} # directory path -> (st_mtime_ns, entries)
+_listing_lock = threading.Lock() # The UI lists directories from worker threads
+
+
+def list_directory(path):
+    """
+    Entries of one directory as [(name, is_dir, is_file)], folders first then by lower-case name.
+    Built with os.scandir (DirEntry type info: no stat per entry on most platforms) and cached until
+    the directory's mtime changes. Raises OSError if the directory cannot be read.
+    """
+    mtime_ns = os.stat(path).st_mtime_ns
+    with _listing_lock: cached = _listing_cache.get(path)
+    if cached and cached[0] == mtime_ns: return cached[1]
+    entries = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try: entries.append((entry.name, entry.is_dir(), entry.is_file()))
+            except OSError: continue # Skip item on stat error
+    entries.sort(key=lambda item: (not item[1], item[0].lower()))
+    if time.time_ns() - mtime_ns > LISTING_SETTLE_NS:
+        with _listing_lock:
+            _listing_cache.pop(path, None)
+            if len(_listing_cache) >= LISTING_CACHE_LIMIT: _listing_cache.pop(next(iter(_listing_cache))) # Oldest first
+            _listing_cache[path] = (mtime_ns, entries)
+    return entries
+
+
+def _folder_node(path, name, probe_children):
+    full_path = os.path.join(path, name)
+    node = {"name": name, "path": full_path, "id": full_path, "type": "folder", "text": f"📁 {name}", "has_children": None}
+    if probe_children:
+        # First-entry probe: one directory read, whatever the folder's size
+        try:
+            with os.scandir(full_path) as it: node["has_children"] = next(it, None) is not None
+        except OSError: # Permission error listing children
+            node["has_children"] = False
+            node["text"] += " [X]" # Indicate access issue
+    return node
+
+
+def iter_tree_node_pages(path, filters=None, page_size=TREE_PAGE_SIZE, probe_children=False):
+    """
+    Yields one directory level as pages (lists) of up to page_size nodes, in get_tree_nodes_for_ui format.
+    probe_children=False leaves folders' 'has_children' None (unknown: expanding the folder finds out),
+    so listing a level reads only that directory. An unreadable path yields one page with an error node.
+    """
+    if filters is None: filters = DEFAULT_TREE_FILTERS
+    suffixes = tuple(filters)
+    try: entries = list_directory(path)
+    except OSError as e:
+        yield [{"text": f"🚫 Error: {e.strerror}", "type": "error", "path": path, "id": path+"_error"}]
+        return
+    page = []
+    for name, is_dir, is_file in entries:
+        if is_dir: node = _folder_node(path, name, probe_children)
+        elif is_file and (not suffixes or name.endswith(suffixes)):
+            full_path = os.path.join(path, name)
+            node = {"name": name, "path": full_path, "id": full_path, "type": "file", "text": f"📄 {name}", "has_children": False}
+        else: continue
+        page.append(node)
+        if len(page) >= page_size:
+            yield page
+            page = []
+    if page: yield page
+
 
 def get_tree_nodes_for_ui(path, node_id=None, max_depth=1, current_depth=0, filters=None):
     """
     Gets directory structure suitable for UI Treeview insertion for one level.
     Returns list of node dictionaries: {'id': unique_id, 'text': 'display', 'type': 'folder'/'file'/'error', 'path': full_path, 'has_children': bool}.
+    Blocking variant of iter_tree_node_pages (has_children from a first-entry probe).
     """
-    if filters is None: filters = [".h", ".cpp", ".hpp", ".c", ".txt"]
-    nodes = []
-    try:
-        # Sort items: folders first, then files
-        items = sorted(os.listdir(path), key=lambda x: (not os.path.isdir(os.path.join(path, x)), x.lower()))
-        for name in items:
-            full_path = os.path.join(path, name)
-            node = {"name": name, "path": full_path, "id": full_path} # Use path as default ID
-            try:
-                if os.path.isdir(full_path):
-                    node["type"] = "folder"
-                    node["text"] = f"📁 {name}"
-                    # Check if it has children (only if needed for placeholder)
-                    try:
-                        node["has_children"] = bool(os.listdir(full_path))
-                    except OSError: # Permission error listing children
-                        node["has_children"] = False
-                        node["text"] += " [X]" # Indicate access issue
-                    nodes.append(node)
-                elif os.path.isfile(full_path):
-                    if not filters or any(name.endswith(ext) for ext in filters):
-                        node["type"] = "file"
-                        node["text"] = f"📄 {name}"
-                        node["has_children"] = False
-                        nodes.append(node)
-            except OSError: continue # Skip item on stat error
-    except OSError as e:
-        nodes.append({"text": f"🚫 Error: {e.strerror}", "type": "error", "path": path, "id": path+"_error"})
-    return nodes
+    return [node for page in iter_tree_node_pages(path, filters, probe_children=True) for node in page]
 
 
-def read_file_content(file_path):
-    """Reads file content, returns (content_string, error_string)."""
+def decode_file_bytes(raw_bytes):
+    """
+    Decodes raw file bytes exactly like read_file_content reads the file
+    (same encoding fallbacks, universal newlines). Returns (content_string, error_string).
+    """
     encodings_to_try = ['utf-8', 'latin-1', 'cp1252']
     last_error = "Unknown read error."
     for enc in encodings_to_try:
         try:
-            with open(file_path, 'r', encoding=enc) as f: return f.read(), None
+            content = raw_bytes.decode(enc)
+            return content.replace("\r\n", "\n").replace("\r", "\n"), None
         except (UnicodeDecodeError, LookupError) as e: last_error = f"Decode Error ('{enc}'): {e}"
-        except Exception as e: return None, f"Read Error: {e}"
     return None, f"Failed decodings. Last: {last_error}"
 
+def read_file_content(file_path):
+    """Reads file content, returns (content_string, error_string)."""
+    try:
+        with open(file_path, 'rb') as f: raw_bytes = f.read()
+    except Exception as e: return None, f"Read Error: {e}"
+    return decode_file_bytes(raw_bytes)
+
+def detect_newline(raw_bytes):
+    """Line break style of raw file bytes: '\r\n', '\r' or '\n' (default)."""
+    if b"\r\n" in raw_bytes: return "\r\n"
+    if b"\r" in raw_bytes: return "\r"
+    return "\n"
+
+def write_file_atomic(file_path, content, newline="\n", encoding="utf-8"):
+    """
+    Writes content ('\n' line breaks, written as newline) via a temp file in the same
+    directory + os.replace, so readers never see a half-written file. Keeps the file mode.
+    Returns error_string or None.
+    """
+    dir_name = os.path.dirname(os.path.abspath(file_path))
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=dir_name, prefix=".tmp_", suffix=os.path.basename(file_path))
+    except OSError as e: return f"Write Error: {e}"
+    try:
+        with os.fdopen(fd, "w", encoding=encoding, newline=newline) as f: f.write(content)
+        try: shutil.copymode(file_path, tmp_path)
+        except OSError: pass # New file or mode not copyable: keep the temp file's default mode
+        os.replace(tmp_path, file_path)
+    except (OSError, UnicodeEncodeError) as e:
+        try: os.remove(tmp_path)
+        except OSError: pass
+        return f"Write Error: {e}"
+    return None
+
+def _compile_ignore_rules(lines, base_dir):
+    """
+    .gitignore lines -> [(base_dir, regex, negate, dir_only, anchored)]. Supported: comments, !negation,
+    trailing / (directories only), leading / or an inner / (anchored to base_dir), fnmatch globs
+    (* ? [..]; ** is treated like *).
+    """
+    rules = []
+    for line in lines:
+        pattern = line.rstrip("\r\n").rstrip(" ")
+        if not pattern or pattern.startswith("#"): continue
+        negate = pattern.startswith("!")
+        if negate: pattern = pattern[1:]
+        if pattern.startswith("\\"): pattern = pattern[1:] # \# and \! escapes
+        dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        if pattern.startswith("**/"): pattern = pattern[3:] # Same as an unanchored name
+        anchored = "/" in pattern
+        pattern = pattern.lstrip("/")
+        if not pattern: continue
+        rules.append((base_dir, re.compile(fnmatch.translate(pattern)), negate, dir_only, anchored))
+    return rules
+
+
+def _read_ignore_file(dir_path):
+    try:
+        with open(os.path.join(dir_path, IGNORE_FILE), 'r', encoding='utf-8', errors='replace') as f:
+            return _compile_ignore_rules(f, dir_path)
+    except OSError: return [] # No .gitignore here
+
+
+def _is_ignored(full_path, name, is_dir, rules):
+    """Last matching rule wins (git semantics); rules come root-first."""
+    ignored = False
+    for base_dir, regex, negate, dir_only, anchored in rules:
+        if negate != ignored or (dir_only and not is_dir): continue # Cannot change the verdict
+        if anchored: subject = full_path[len(base_dir):].lstrip("\\/").replace("\\", "/")
+        else: subject = name
+        if regex.match(subject): ignored = not negate
+    return ignored
+
+
+def _suffix_sets(extensions):
+    """
+    (single, multi) for walk_files: extensions normalised to a leading dot ("hpp" -> ".hpp"); single-dot ones are a set
+    for one splitext lookup, multi-dot ones (".pb.h") and "" keep the old name.endswith match.
+    """
+    single, multi = set(), []
+    for ext in extensions:
+        if ext and not ext.startswith("."): ext = "." + ext
+        if ext.count(".") == 1: single.add(ext)
+        else: multi.append(ext)
+    return frozenset(single), tuple(multi)
+
+
+def _scan_walk_directory(dir_path, rules, suffixes, use_gitignore):
+    """One directory of walk_files: returns (matching files, [(subdirectory, rules)])."""
+    single, multi = suffixes
+    if use_gitignore: rules = rules + _read_ignore_file(dir_path)
+    files, subdirs = [], []
+    try:
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False): # Like os.walk: symlinked directories are not entered
+                        if not _is_ignored(entry.path, entry.name, True, rules): subdirs.append((entry.path, rules))
+                    elif (os.path.splitext(entry.name)[1] in single or (multi and entry.name.endswith(multi))) and entry.is_file() and not _is_ignored(entry.path, entry.name, False, rules):
+                        files.append(entry.path)
+                except OSError: continue # Skip item on stat error
+    except OSError: pass # Unreadable directory (os.walk skips it too)
+    return files, subdirs
+
+
+def walk_files(root_path, extensions=None, ignore_patterns=DEFAULT_IGNORE_PATTERNS, use_gitignore=True, workers=WALK_WORKERS):
+    """
+    Files under root_path ending in one of extensions (".hpp" or "hpp"), sorted. Directories matching ignore_patterns
+    or a .gitignore found on the way down are pruned without being listed. ignore_patterns use .gitignore syntax:
+    a leading or inner '/' anchors a pattern to root_path ("/build/"), otherwise it matches a name at any depth (".git/"). Each directory level is scanned by a thread pool (os.scandir releases the GIL).
+    root_path itself is always scanned, even if a pattern would match it.
+    """
+    suffixes = _suffix_sets(DEFAULT_EXTENSIONS if extensions is None else extensions)
+    root_path = os.path.normpath(root_path)
+    found = []
+    if not os.path.isdir(root_path): return found
+    level = [(root_path, _compile_ignore_rules(ignore_patterns or (), root_path))]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        while level:
+            if len(level) == 1: results = [_scan_walk_directory(level[0][0], level[0][1], suffixes, use_gitignore)] # No hand-off
+            else: results = pool.map(lambda item: _scan_walk_directory(item[0], item[1], suffixes, use_gitignore), level)
+            level = []
+            for files, subdirs in results:
+                found.extend(files)
+                level.extend(subdirs)
+    found.sort()
+    return found
+
 def find_relevant_files(root_path, extensions=None):
-    """Finds relevant files recursively."""
-    if extensions is None: extensions = [".h", ".cpp", ".hpp", ".c"]
-    relevant_files = []
-    for root_dir, _, files in os.walk(root_path):
-        for file_name in files:
-            if any(file_name.endswith(ext) for ext in extensions):
-                try: # Ensure path is valid before adding
-                    full_path = os.path.join(root_dir, file_name)
-                    if os.path.exists(full_path): # Basic check
-                         relevant_files.append(full_path)
-                except Exception as e:
-                     print(f"Warning: Skipping file due to path issue: {e}")
-                     continue
-    return relevant_files
\ No newline at end of file
+    """Finds relevant files recursively (walk_files with the default ignore list and .gitignore files)."""
+    return walk_files(root_path, extensions)
@@ -0,0 +1,93 @@
+# formatter_cli.py
+# Headless entry point for CI / pre-commit (no Tk needed). From src/CodeStyle:
+#   python -m formatter_cli --check src/            exit 1 if any file would change
+#   python -m formatter_cli --diff  a.hpp b.cpp     print unified diffs
+#   python -m formatter_cli --write src/            rewrite changed files atomically
+import os
+import sys
+import argparse
+
+import file_system_utils
+import project_formatter
+import pipeline_metrics
+import result_cache
+
+# --- Exit Codes ---
+EXIT_OK = 0
+EXIT_WOULD_CHANGE = 1 # --check / --diff: at least one file is not formatted
+EXIT_ERROR = 2        # A file could not be read, formatted or written
+
+DEFAULT_EXTENSIONS = [".h", ".cpp", ".hpp", ".c"]
+PHASE_CHOICES = [1, 2, 3, 4] # 99 (debug tree) is a preview, not file content
+
+
+def collect_files(paths, extensions=None):
+    """Expands files/directories into a sorted, de-duplicated file list. Returns (files, missing_paths)."""
+    extensions = extensions or DEFAULT_EXTENSIONS
+    files, missing = set(), []
+    for path in paths:
+        if os.path.isdir(path): files.update(file_system_utils.find_relevant_files(path, extensions=extensions))
+        elif os.path.isfile(path): files.add(path) # Explicit files are formatted whatever their extension
+        else: missing.append(path)
+    return sorted(files), missing
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m formatter_cli", description="Winyunq Doxygen comment formatter (headless).")
+    parser.add_argument("paths", nargs="+", help="Files and/or directories (searched recursively)")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--check", dest="action", action="store_const", const=project_formatter.ACTION_CHECK,
+                      help="Report files that would change; exit 1 if any (default)")
+    mode.add_argument("--diff", dest="action", action="store_const", const=project_formatter.ACTION_DIFF,
+                      help="Print unified diffs; exit 1 if any file would change")
+    mode.add_argument("--write", dest="action", action="store_const", const=project_formatter.ACTION_WRITE,
+                      help="Rewrite changed files in place (atomic replace)")
+    parser.add_argument("--phase", type=int, choices=PHASE_CHOICES, default=4, help="Pipeline depth (target_phase), default 4")
+    parser.add_argument("--ext", action="append", help="Extension to include when scanning directories (repeatable)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--cache", action="store_true", help="Use the on-disk result cache")
+    parser.add_argument("--cache-dir", help="Result cache directory (implies --cache)")
+    parser.add_argument("--metrics", action="store_true", help="Print a stage timing report (top-N slowest files/blocks)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Show the pipeline's own output")
+    parser.set_defaults(action=project_formatter.ACTION_CHECK)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    files, missing = collect_files(args.paths, args.ext)
+    for path in missing: print(f"error: {path}: no such file or directory", file=sys.stderr)
+
+    cache = result_cache.ResultCache(args.cache_dir) if (args.cache or args.cache_dir) else None
+    aggregator = pipeline_metrics.MetricsAggregator() if args.metrics else None
+    changed_count = unchanged_count = error_count = 0
+    results = project_formatter.format_project(None, {"target_phase": args.phase}, workers=args.workers, file_paths=files, cache=cache,
+                                               collect_metrics=args.metrics, action=args.action, quiet=not args.verbose)
+    for file_result in results:
+        path = file_result["path"]
+        if aggregator is not None: aggregator.add(path, file_result["summary"])
+        if file_result.get("changed"):
+            changed_count += 1
+            if args.action == project_formatter.ACTION_DIFF: sys.stdout.write(file_result.get("diff", ""))
+            elif args.action == project_formatter.ACTION_WRITE:
+                if file_result.get("written"): print(f"reformatted {path}")
+            else: print(f"would reformat {path}")
+        # Stage errors fall back to an earlier stage's output: a warning, not a failure.
+        # Read/decode/worker errors come without a summary.
+        error = file_result.get("write_error") or ((file_result.get("failed") or not file_result["summary"]) and file_result.get("error"))
+        if error:
+            error_count += 1
+            print(f"error: {path}: {error.strip().splitlines()[0]}", file=sys.stderr)
+        elif not file_result.get("changed"): unchanged_count += 1 # Files that errored are not "unchanged"
+
+    verb = "reformatted" if args.action == project_formatter.ACTION_WRITE else "would be reformatted"
+    print(f"{changed_count} file(s) {verb}, {unchanged_count} file(s) unchanged, {error_count + len(missing)} error(s).", file=sys.stderr)
+    if aggregator is not None: print(aggregator.format_report(), file=sys.stderr)
+
+    if error_count or missing: return EXIT_ERROR
+    if changed_count and args.action != project_formatter.ACTION_WRITE: return EXIT_WOULD_CHANGE
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+# line_buffer.py
+from array import array
+from itertools import repeat
+from operator import add
+
+# --- Status Codes ---
+# Index = uint8 code stored per line. Code 0 is "no status" (code outside blocks).
+# Statuses not listed here get a code on first use (per process, up to 255).
+STATUS_NAMES = [None, "unmodified", "modified", "error", "boundary", "rendered", "debug", "info"]
+_STATUS_CODES = {name: code for code, name in enumerate(STATUS_NAMES)}
+
+OWNED_TEXT = -1 # text_starts marker: text_ends holds an index into LineBuffer.texts
+
+
+def status_code(status):
+    """uint8 code for a status string (None -> 0), registering unknown statuses."""
+    code = _STATUS_CODES.get(status)
+    if code is None:
+        if len(STATUS_NAMES) > 255: raise ValueError(f"Too many distinct line statuses (new: {status!r})")
+        code = len(STATUS_NAMES)
+        STATUS_NAMES.append(status)
+        _STATUS_CODES[status] = code
+    return code
+
+
+class LineBuffer:
+    """
+    Columnar store for pipeline output lines.
+    Per line: a uint8 status code, an int32 orig_line and a text reference. Lines
+    copied verbatim from the source are kept as (start, end) offsets into
+    self.source; generated lines keep their string in self.texts.
+    Iterating yields {'text', 'status', 'orig_line'} dicts for dict-based callers;
+    iter_rows() yields (text, status, orig_line) tuples without building dicts.
+    """
+    __slots__ = ("source", "statuses", "orig_lines", "text_starts", "text_ends", "texts")
+
+    def __init__(self, source=""):
+        self.source = source
+        self.statuses = array("B")
+        self.orig_lines = array("i")
+        self.text_starts = array("q")
+        self.text_ends = array("q")
+        self.texts = []
+
+    @classmethod
+    def from_rows(cls, rows, source=""):
+        """Buffer of owned lines from (text, status, orig_line) tuples."""
+        buffer = cls(source)
+        for text, status, orig_line in rows: buffer.append(text, status, orig_line)
+        return buffer
+
+    @classmethod
+    def from_dicts(cls, lines_info, source=""):
+        """Buffer from {'text', 'status', 'orig_line'} dicts (missing keys default like .get())."""
+        buffer = cls(source)
+        for line_info in lines_info:
+            buffer.append(line_info.get("text", ""), line_info.get("status"), line_info.get("orig_line", 0))
+        return buffer
+
+    # --- Building ---
+    def append(self, text, status=None, orig_line=0):
+        """Adds a line that owns its text."""
+        self.statuses.append(status_code(status))
+        self.orig_lines.append(orig_line)
+        self.text_starts.append(OWNED_TEXT)
+        self.text_ends.append(len(self.texts))
+        self.texts.append(text)
+
+    def append_source_lines(self, line_starts, line_ends, first_line, stop_line):
+        """Adds source lines [first_line, stop_line) verbatim (status None) as offsets into self.source."""
+        count = stop_line - first_line
+        if count <= 0: return
+        self.statuses.frombytes(bytes(count))
+        self.orig_lines.extend(range(first_line, stop_line))
+        self.text_starts.extend(line_starts[first_line:stop_line])
+        self.text_ends.extend(line_ends[first_line:stop_line])
+
+    def extend(self, lines):
+        """Appends another LineBuffer (any source) or an iterable of line dicts."""
+        if isinstance(lines, LineBuffer):
+            self.extend_from(lines, 0, len(lines), char_shift=None if lines.source is not self.source else 0)
+        else:
+            for line_info in lines:
+                self.append(line_info.get("text", ""), line_info.get("status"), line_info.get("orig_line", 0))
+
+    def extend_sharing_source(self, other, line_starts, line_ends, first_line, stop_line):
+        """
+        Appends all lines of other; a line whose orig_line is in [first_line, stop_line)
+        and whose text equals that source line (line_starts/line_ends: offset table of
+        self.source) is stored as offsets instead of a string.
+        """
+        source = self.source
+        for text, status, orig_line in other.iter_rows():
+            if first_line <= orig_line < stop_line:
+                line_start, line_end = line_starts[orig_line], line_ends[orig_line]
+                if line_end - line_start == len(text) and source.startswith(text, line_start):
+                    self.statuses.append(status_code(status))
+                    self.orig_lines.append(orig_line)
+                    self.text_starts.append(line_start)
+                    self.text_ends.append(line_end)
+                    continue
+            self.append(text, status, orig_line)
+
+    def extend_from(self, other, start, stop, line_shift=0, char_shift=0):
+        """
+        Appends lines [start, stop) of other, adding line_shift to orig_line.
+        Source-offset lines are moved by char_shift into self.source (the caller
+        guarantees the text is there); char_shift=None copies their text instead.
+        """
+        if stop <= start: return
+        seg_starts, seg_ends = other.text_starts[start:stop], other.text_ends[start:stop]
+        owned_rows = _find_all(seg_starts, OWNED_TEXT)
+        self.statuses.extend(other.statuses[start:stop])
+        seg_orig_lines = other.orig_lines[start:stop]
+        self.orig_lines.extend(map(add, seg_orig_lines, repeat(line_shift)) if line_shift else seg_orig_lines)
+        texts, other_texts = self.texts, other.texts
+
+        if char_shift is None and len(owned_rows) < len(seg_starts): # Source lines become owned text
+            other_source = other.source
+            for text_start, text_end in zip(seg_starts, seg_ends):
+                self.text_starts.append(OWNED_TEXT); self.text_ends.append(len(texts))
+                texts.append(other_texts[text_end] if text_start == OWNED_TEXT else other_source[text_start:text_end])
+            return
+        # Whole columns are shifted at C speed, then owned rows are pointed at their copied text
+        if char_shift:
+            seg_starts = array("q", map(add, seg_starts, repeat(char_shift)))
+            seg_ends_shifted = array("q", map(add, seg_ends, repeat(char_shift)))
+        else:
+            seg_ends_shifted = array("q", seg_ends)
+        for row in owned_rows:
+            seg_starts[row] = OWNED_TEXT
+            seg_ends_shifted[row] = len(texts)
+            texts.append(other_texts[seg_ends[row]])
+        self.text_starts.extend(seg_starts)
+        self.text_ends.extend(seg_ends_shifted)
+
+    # --- Access ---
+    def __len__(self):
+        return len(self.statuses)
+
+    def text(self, index):
+        text_start = self.text_starts[index]
+        if text_start == OWNED_TEXT: return self.texts[self.text_ends[index]]
+        return self.source[text_start:self.text_ends[index]]
+
+    def status(self, index):
+        return STATUS_NAMES[self.statuses[index]]
+
+    def orig_line(self, index):
+        return self.orig_lines[index]
+
+    def __getitem__(self, index):
+        """Line dict for an int index; a new LineBuffer (same source) for a slice."""
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1: raise ValueError("LineBuffer slices do not support a step")
+            sliced = LineBuffer(self.source)
+            sliced.extend_from(self, start, stop)
+            return sliced
+        if index < 0: index += len(self)
+        return {"text": self.text(index), "status": self.status(index), "orig_line": self.orig_lines[index]}
+
+    def iter_rows(self, start=0, stop=None):
+        """Yields (text, status, orig_line) for lines [start, stop)."""
+        source, texts, names = self.source, self.texts, STATUS_NAMES
+        if stop is None: stop = len(self)
+        for text_start, text_end, code, orig_line in zip(self.text_starts[start:stop], self.text_ends[start:stop],
+                                                         self.statuses[start:stop], self.orig_lines[start:stop]):
+            yield (texts[text_end] if text_start == OWNED_TEXT else source[text_start:text_end]), names[code], orig_line
+
+    def iter_texts(self):
+        for row in self.iter_rows(): yield row[0]
+
+    def __iter__(self):
+        """Dict adapter: {'text', 'status', 'orig_line'} per line (a new dict each time)."""
+        for text, status, orig_line in self.iter_rows():
+            yield {"text": text, "status": status, "orig_line": orig_line}
+
+    def to_dicts(self):
+        return list(self)
+
+    def count_status(self, status):
+        """Number of lines with the given status (C-speed scan of the status column)."""
+        code = _STATUS_CODES.get(status)
+        return 0 if code is None else self.statuses.tobytes().count(code)
+
+    def __eq__(self, other):
+        if isinstance(other, LineBuffer): return list(self.iter_rows()) == list(other.iter_rows())
+        try:
+            return list(self.iter_rows()) == list(iter_line_rows(other))
+        except (TypeError, AttributeError):
+            return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"<LineBuffer {len(self)} lines>"
+
+
+def _find_all(column, value):
+    """Indices of value in an array column (array.index does the scanning)."""
+    found, index = [], -1
+    try:
+        while True:
+            index = column.index(value, index + 1)
+            found.append(index)
+    except ValueError:
+        return found
+
+
+def iter_line_rows(lines):
+    """(text, status, orig_line) rows of a LineBuffer or of an iterable of line dicts."""
+    if isinstance(lines, LineBuffer): return lines.iter_rows()
+    return ((line_info.get("text", ""), line_info.get("status"), line_info.get("orig_line", 0)) for line_info in lines)
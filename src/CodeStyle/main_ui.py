@@ -3,7 +3,10 @@ import tkinter as tk
 import tkinter.font # <-- ***** 添加这一行 *****
 from tkinter import filedialog, scrolledtext, ttk, messagebox
 import os
+import queue
+import bisect
 import importlib
+import threading
 import traceback
 # ... (rest of the imports) ...
 
@@ -16,9 +19,15 @@ except ImportError:
         def get_tree_nodes_for_ui(self, path, **kwargs): return [{"text": f"Error: FS Utils missing", "type": "error", "path": path, "id": path+"_err"}]
         def read_file_content(self, file_path): return f"Content of {os.path.basename(file_path)} (dummy)", None
         def find_relevant_files(self, root_path, **kwargs): return [os.path.join(root_path, "dummy.h")]
+        def iter_tree_node_pages(self, path, **kwargs): return [self.get_tree_nodes_for_ui(path)]
     print("WARN: file_system_utils.py not found.")
     file_system_utils = DummyFSUtils()
 
+try:
+    from line_buffer import iter_line_rows
+except ImportError:
+    def iter_line_rows(lines): return ((line_info.get("text", ""), line_info.get("status"), line_info.get("orig_line", 0)) for line_info in lines)
+
 try:
     import winyunq_formatter
     # Get status constants (MUST exist in formatter)
@@ -33,7 +42,8 @@ except ImportError:
     # Define dummy formatter and constants
     class DummyFormatter:
         STATUS_UNMODIFIED="unmodified"; STATUS_MODIFIED="modified"; STATUS_ERROR="error"; STATUS_INFO="info"; STATUS_BOUNDARY="boundary"; STATUS_RENDERED="rendered"; STATUS_DEBUG="debug"
-        def process_code(self, code_string, config=None):
+        class FormatCancelled(Exception): pass
+        def process_code(self, code_string, config=None, progress=None):
              phase = config.get("target_phase", 1) if config else 1
              print(f"DummyFormatter: process_code(Phase {phase}) -> Returning lines with status")
              lines_data = []
@@ -49,9 +59,123 @@ except ImportError:
     winyunq_formatter = DummyFormatter()
     STATUS_UNMODIFIED = DummyFormatter.STATUS_UNMODIFIED; STATUS_MODIFIED = DummyFormatter.STATUS_MODIFIED; STATUS_ERROR = DummyFormatter.STATUS_ERROR; STATUS_INFO = DummyFormatter.STATUS_INFO; STATUS_BOUNDARY = DummyFormatter.STATUS_BOUNDARY; STATUS_RENDERED=DummyFormatter.STATUS_RENDERED; STATUS_DEBUG=DummyFormatter.STATUS_DEBUG
 
+# --- Background Formatting ---
+FORMAT_POLL_MS = 50 # How often the Tk thread drains the worker's queue
+PROGRESS_STEPS = 200 # At most this many progress messages per run
+TREE_POLL_MS = 30 # How often the Tk thread inserts the tree pages listed so far
+
+# --- Large-File Mode ---
+LARGE_FILE_LINES = 50000 # Default WinyunqDocStylerApp(large_file_lines=...): above it the panes only hold a window
+WINDOW_MARGIN_LINES = 300 # Lines held above and below the view; scrolling within half of it never refills
+
+# --- Styled Output ---
+def _extend_tag_run(tag_ranges, run, tag, line_num, line_length):
+    """Extends run ([tag, first_line, last_line, last_length]) by one line, or closes it into tag_ranges and starts a new one."""
+    if run is not None and run[0] == tag:
+        run[2], run[3] = line_num, line_length
+        return run
+    if run is not None and run[0] is not None:
+        tag_ranges.setdefault(run[0], []).extend((f"{run[1]}.0", f"{run[2]}.{run[3]}"))
+    return [tag, line_num, line_num, line_length]
+
+
+def build_tagged_text(rows, known_statuses):
+    """
+    Joins (text, status, orig_line) rows into the text of the output view and groups its tag ranges.
+    Returns (text, {tag: [start, end, start, end, ...]}) with Tk "line.col" indexes: one tag_add per tag
+    applies them all. Adjacent lines with the same tag share one range (it ends before the last newline).
+    The boundary tag also covers '/**' and '**/' lines whatever their status.
+    """
+    texts, tag_ranges = [], {}
+    status_run = boundary_run = None
+    for line_num, (text, status, _) in enumerate(rows, 1):
+        texts.append(text)
+        status_tag = status if status in known_statuses and status != STATUS_BOUNDARY else None
+        boundary_tag = STATUS_BOUNDARY if status == STATUS_BOUNDARY or text.strip() in ("/**", "**/") else None
+        status_run = _extend_tag_run(tag_ranges, status_run, status_tag, line_num, len(text))
+        boundary_run = _extend_tag_run(tag_ranges, boundary_run, boundary_tag, line_num, len(text))
+    for run in (status_run, boundary_run): _extend_tag_run(tag_ranges, run, None, 0, 0) # Close the last runs
+    texts.append("") # Every line ends with a newline
+    return "\n".join(texts), tag_ranges
+
+class VirtualTextPane:
+    """
+    Large-file mode for one ScrolledText: every line stays in Python and the widget only holds the
+    lines around the view (WINDOW_MARGIN_LINES above and below). The scrollbar spans all lines;
+    scrolling close to the edge of the held window refills it around the view.
+    render(start, stop) -> (text, {tag: indexes}) as build_tagged_text, numbered from the window start.
+    on_scroll(top_line) reports scrolling the user did (not show() calls), e.g. to sync another pane.
+    """
+    def __init__(self, widget, line_count, render, on_scroll=None, margin=WINDOW_MARGIN_LINES):
+        self.widget, self.scrollbar = widget, widget.vbar
+        self.line_count, self.render, self.on_scroll, self.margin = line_count, render, on_scroll, margin
+        self.window = (0, 0) # [start, stop) of the lines the widget holds
+        self.top = 0 # First visible line
+        self.orig_lines = None # Styled pane: orig_line per line (pane sync)
+        self._line_height = max(tk.font.Font(font=widget.cget("font")).metrics("linespace"), 1)
+        self._refill_pending = False
+        widget.configure(yscrollcommand=self._on_view_change)
+        self.scrollbar.configure(command=self._on_scrollbar)
+
+    def detach(self):
+        """Gives the widget its own scrolling back."""
+        self.widget.configure(yscrollcommand=self.scrollbar.set)
+        self.scrollbar.configure(command=self.widget.yview)
+
+    def _visible_count(self):
+        return max(self.widget.winfo_height() // self._line_height, 1)
+
+    def _near_edge(self, top, visible):
+        start, stop = self.window
+        return (top - start < self.margin // 2 and start > 0) or (stop - top - visible < self.margin // 2 and stop < self.line_count)
+
+    def _fill(self, top, visible):
+        start, stop = max(0, top - self.margin), min(self.line_count, top + visible + self.margin)
+        text, tag_ranges = self.render(start, stop)
+        self.widget.config(state=tk.NORMAL)
+        self.widget.delete('1.0', tk.END)
+        self.widget.insert('1.0', text)
+        for tag_name, indexes in tag_ranges.items(): self.widget.tag_add(tag_name, *indexes)
+        self.widget.config(state=tk.DISABLED)
+        self.window = (start, stop)
+
+    def show(self, top):
+        """Scrolls so that line top (0-based) is the first visible line."""
+        visible = self._visible_count()
+        top = max(0, min(top, self.line_count - visible))
+        self.top = top
+        if top < self.window[0] or top + visible > self.window[1] or self._near_edge(top, visible): self._fill(top, visible)
+        self.widget.yview(f"{top - self.window[0] + 1}.0")
+        self._update_scrollbar(visible)
+
+    def _update_scrollbar(self, visible):
+        total = max(self.line_count, 1)
+        self.scrollbar.set(self.top / total, min((self.top + visible) / total, 1.0))
+
+    def _on_view_change(self, *fractions):
+        # yscrollcommand: the widget scrolled (wheel, keys, selection or show()); fractions are of the window only
+        visible = self._visible_count()
+        top = self.window[0] + int(self.widget.index("@0,0").split(".")[0]) - 1
+        if top != self.top:
+            self.top = top
+            if self._near_edge(top, visible) and not self._refill_pending:
+                self._refill_pending = True
+                self.widget.after_idle(self._refill) # Not from inside Tk's scroll callback
+            if self.on_scroll: self.on_scroll(top)
+        self._update_scrollbar(visible)
+
+    def _refill(self):
+        self._refill_pending = False
+        self.show(self.top)
+
+    def _on_scrollbar(self, *args):
+        if args[0] == "moveto": self.show(int(float(args[1]) * self.line_count))
+        else: self.widget.yview(*args) # "scroll n units/pages" stays within the margin; _on_view_change refills
+
+
 # --- Main Application Class ---
 class WinyunqDocStylerApp:
-    def __init__(self, root):
+    def __init__(self, root, large_file_lines=LARGE_FILE_LINES):
         self.root = root
         self.root.title("WinyunqDoc Styler (v1.1 - Color Feedback)")
         self.root.geometry("1200x800")
@@ -73,6 +197,17 @@ class WinyunqDocStylerApp:
 
         # --- Config for Formatter ---
         self.formatter_config = {"target_phase": 1} # Default phase
+        self._last_processed = None # (path, config, original lines, result) for incremental re-format
+        self._format_job = None # Running background format (see ui_action_process_selected)
+        self._format_jobs_started = 0
+        self._format_queue = queue.Queue() # (kind, job id, payload) from the worker thread
+        self._format_poll = None # Pending root.after id while polling
+        self._tree_queue = queue.Queue() # (kind, generation, parent id, payload) from tree listing threads
+        self._tree_generation = 0 # Bumped when the root changes: older listings are dropped
+        self._tree_loading = {} # parent id -> its "..." placeholder (None for the root) while listing
+        self._tree_poll = None
+        self.large_file_lines = large_file_lines # Files above this many lines use VirtualTextPane
+        self._virtual_panes = {} # text widget -> VirtualTextPane while in large-file mode
 
         # --- Setup UI ---
         self._setup_ui()
@@ -137,11 +272,6 @@ class WinyunqDocStylerApp:
         self.styled_text_area = scrolledtext.ScrolledText(self.styled_text_frame, wrap=tk.NONE, state=tk.DISABLED)
         self.styled_text_area.pack(fill=tk.BOTH, expand=True, padx=5, pady=(0,5))
 
-
-# main_ui.py (Focus on _display_formatter_result_with_status in v1.1)
-
-# ... (Imports and other parts of the class remain) ...
-
     def _configure_tags(self):
         """Configures tags for the styled text area."""
         print("Configuring tags...") # Debug print
@@ -160,75 +290,6 @@ class WinyunqDocStylerApp:
         self.styled_text_area.config(state=tk.DISABLED)
 
 
-    def _display_formatter_result_with_status(self, result):
-        """Displays the structured result, applying tags based on line status."""
-        self.styled_text_area.config(state=tk.NORMAL)
-        self.styled_text_area.delete('1.0', tk.END)
-        print("--- Displaying Formatter Result ---") # Debug print
-
-        # Clear existing style tags FIRST
-        # print("Removing existing tags:", self.styled_text_area.tag_names()) # Debug
-        for tag_name in self.text_tags: # Use keys from our definition
-            if tag_name is not None:
-                 try:
-                     self.styled_text_area.tag_remove(tag_name, "1.0", tk.END)
-                 except tk.TclError: pass # Ignore if tag doesn't exist yet
-        # Explicitly remove boundary tag as well, as it might be applied based on content later
-        try:
-            self.styled_text_area.tag_remove(STATUS_BOUNDARY, "1.0", tk.END)
-        except tk.TclError: pass
-
-
-        if not result or not result.get("success", False):
-            error_msg = result.get("error_message", "Formatter returned unsuccessful or invalid result.")
-            print(f"Formatter failed: {error_msg}") # Debug print
-            self.styled_text_area.insert('1.0', f"Formatting Failed:\n\n{error_msg}")
-            self.styled_text_area.tag_add(STATUS_ERROR, "1.0", tk.END) # Apply error tag
-        else:
-            lines_data = result.get("lines", [])
-            print(f"Received {len(lines_data)} lines from formatter.") # Debug print
-            if not lines_data:
-                 self.styled_text_area.insert('1.0', "(Formatter returned no lines)")
-            else:
-                 # --- Process lines and apply tags ---
-                 current_line_start_index = "1.0" # Tkinter index for start of current line
-                 for line_info in lines_data:
-                     text = line_info.get("text", "")
-                     status = line_info.get("status") # Status string from formatter
-                     # orig_line = line_info.get("orig_line", -1) # Get original line number if needed
-
-                     line_end_index = self.styled_text_area.index(f"{current_line_start_index} + {len(text)} chars")
-                     
-                     # Insert text for the current line FIRST
-                     self.styled_text_area.insert(current_line_start_index, text + "\n")
-                     
-                     # Define the range for applying the tag (excluding the newline)
-                     tag_start_index = current_line_start_index
-                     tag_end_index = self.styled_text_area.index(f"{tag_start_index} + {len(text)} chars") # End before newline
-
-                     # Debug print for each line
-                     # print(f"  Line {int(current_line_start_index.split('.')[0])}: Status='{status}', Range='{tag_start_index}' to '{tag_end_index}', Text='{text[:20]}...'")
-
-                     # Apply tag based on status
-                     if status and status in self.text_tags:
-                         # print(f"    Applying tag: {status}") # Debug
-                         self.styled_text_area.tag_add(status, tag_start_index, tag_end_index)
-                     elif status and status not in self.text_tags:
-                          print(f"    Warning: Unknown status '{status}' received from formatter.")
-
-                     # Apply boundary tag specifically based on content or status
-                     if status == STATUS_BOUNDARY or text.strip() in ("/**", "**/"):
-                          # print(f"    Applying boundary tag.") # Debug
-                          self.styled_text_area.tag_add(STATUS_BOUNDARY, tag_start_index, tag_end_index)
-                          # If boundary status was UNMODIFIED but we want bold, ensure bold tag is applied
-                          # This depends if STATUS_BOUNDARY itself implies bold in self.text_tags
-
-                     # Move to the start of the next line
-                     current_line_start_index = self.styled_text_area.index(f"{tag_end_index} + 1 char") # Move past the newline
-
-        self.styled_text_area.config(state=tk.DISABLED)
-        print("--- Finished Displaying Result ---") # Debug print
-
     # --- UI Update Functions ---
     def _load_initial_directory(self):
         # ... (calls ui_update_file_tree) ...
@@ -238,6 +299,7 @@ class WinyunqDocStylerApp:
 
     def _clear_displays(self):
         # ... (calls _display_text_in_widget) ...
+        self._cancel_format_job() # Its result would belong to the file being cleared away
         self._display_text_in_widget(self.original_text_area, "")
         self._display_text_in_widget(self.styled_text_area, "")
         self.process_button.config(state=tk.DISABLED)
@@ -245,6 +307,7 @@ class WinyunqDocStylerApp:
 
     def _display_text_in_widget(self, widget, text, state=tk.DISABLED):
         # ... (same as v0.9) ...
+        self._detach_virtual(widget)
         widget.config(state=tk.NORMAL)
         widget.delete('1.0', tk.END)
         if text: widget.insert('1.0', text)
@@ -268,6 +331,7 @@ class WinyunqDocStylerApp:
 
     def _display_formatter_result_with_status(self, result):
         """Displays the structured result, applying tags based on line status."""
+        self._detach_virtual(self.styled_text_area)
         self.styled_text_area.config(state=tk.NORMAL)
         self.styled_text_area.delete('1.0', tk.END)
 
@@ -294,23 +358,53 @@ class WinyunqDocStylerApp:
                            self.styled_text_area.tag_add(status_tag, "1.0", tk.END)
                       # Apply boundary tags if rendered output
                       if status_tag == STATUS_RENDERED: self.apply_basic_boundary_tags(self.styled_text_area)
+                 elif len(lines_data) > self.large_file_lines or self.original_text_area in self._virtual_panes:
+                    self._show_styled_window(lines_data)
                  else: # Assume it's lines_with_status
-                    line_num = 1
-                    for line_info in lines_data:
-                        text = line_info.get("text", "")
-                        status = line_info.get("status") # Status string from formatter
-                        start = f"{line_num}.0"
-                        self.styled_text_area.insert(tk.END, text + "\n")
-                        end = f"{line_num}.{len(text)}"
-                        if status and status in self.text_tags: # Check if status is known
-                            self.styled_text_area.tag_add(status, start, end)
-                        # Apply boundary tag based on status OR content
-                        if status == STATUS_BOUNDARY or text.strip() in ("/**", "**/"):
-                             self.styled_text_area.tag_add(STATUS_BOUNDARY, start, end)
-                        line_num += 1
+                    # One insert and one tag_add per status: a few Tcl calls instead of several per line
+                    full_text, tag_ranges = build_tagged_text(iter_line_rows(lines_data), self.text_tags) # LineBuffer rows or line dicts
+                    self.styled_text_area.insert('1.0', full_text)
+                    for tag_name, indexes in tag_ranges.items():
+                        self.styled_text_area.tag_add(tag_name, *indexes)
 
         self.styled_text_area.config(state=tk.DISABLED)
 
+    # --- Large-File Mode (VirtualTextPane) ---
+    def _detach_virtual(self, widget):
+        pane = self._virtual_panes.pop(widget, None)
+        if pane: pane.detach()
+
+    def _show_virtual(self, widget, line_count, render, on_scroll=None):
+        """Shows line_count lines through a VirtualTextPane on widget. Returns the pane."""
+        self._detach_virtual(widget)
+        widget.config(state=tk.NORMAL); widget.delete('1.0', tk.END); widget.config(state=tk.DISABLED)
+        pane = self._virtual_panes[widget] = VirtualTextPane(widget, line_count, render, on_scroll)
+        pane.show(0)
+        return pane
+
+    def _show_original_window(self, original_lines):
+        render = lambda start, stop: ("".join(line + "\n" for line in original_lines[start:stop]), {})
+        self._show_virtual(self.original_text_area, len(original_lines), render, on_scroll=self._sync_styled_to_original)
+
+    def _show_styled_window(self, lines_data):
+        def render(start, stop): # LineBuffer rows or line dicts
+            rows = lines_data.iter_rows(start, stop) if hasattr(lines_data, "iter_rows") else iter_line_rows(lines_data[start:stop])
+            return build_tagged_text(rows, self.text_tags)
+        pane = self._show_virtual(self.styled_text_area, len(lines_data), render, on_scroll=self._sync_original_to_styled)
+        pane.orig_lines = lines_data.orig_lines if hasattr(lines_data, "orig_lines") else [row[2] for row in iter_line_rows(lines_data)]
+        original = self._virtual_panes.get(self.original_text_area)
+        if original: pane.show(bisect.bisect_left(pane.orig_lines, original.top))
+
+    def _sync_original_to_styled(self, top):
+        # Styled pane scrolled: show its first line's orig_line at the top of the original pane
+        original, styled = self._virtual_panes.get(self.original_text_area), self._virtual_panes.get(self.styled_text_area)
+        if original and styled and styled.orig_lines: original.show(styled.orig_lines[min(top, len(styled.orig_lines) - 1)])
+
+    def _sync_styled_to_original(self, top):
+        # Original pane scrolled: show the first output line of that orig_line at the top of the styled pane
+        original, styled = self._virtual_panes.get(self.original_text_area), self._virtual_panes.get(self.styled_text_area)
+        if original and styled and styled.orig_lines: styled.show(bisect.bisect_left(styled.orig_lines, top))
+
     # --- UI Action Handlers ---
 
     def ui_action_browse(self):
@@ -321,18 +415,50 @@ class WinyunqDocStylerApp:
             self._clear_displays(); self.ui_update_file_tree(abs_dir)
 
     def ui_update_file_tree(self, directory_path):
-        # ... (same as v0.9 - calls get_tree_nodes_for_ui) ...
+        # Listed in a background thread (see _load_tree_level)
         for i in self.tree.get_children(): self.tree.delete(i)
+        self._tree_generation += 1
+        self._tree_loading = {}
+        self._load_tree_level("", directory_path)
+
+    def _load_tree_level(self, parent_id, folder_path, placeholder=None):
+        """Lists folder_path in a worker thread; its pages are inserted under parent_id as they come."""
+        self._tree_loading[parent_id] = placeholder
+        threading.Thread(target=self._run_tree_listing, args=(self._tree_generation, parent_id, folder_path), daemon=True).start()
+        if self._tree_poll is None: self._tree_poll = self.root.after(TREE_POLL_MS, self._poll_tree_queue)
+
+    def _run_tree_listing(self, generation, parent_id, folder_path):
+        """Worker thread (no Tk calls): posts the level's node pages, then "done"."""
         try:
-            nodes_data = file_system_utils.get_tree_nodes_for_ui(directory_path, max_depth=1)
-            self._insert_tree_nodes_from_data("", nodes_data)
-        except Exception as e: self._handle_error(f"Populate tree failed", e)
+            for page in file_system_utils.iter_tree_node_pages(folder_path):
+                self._tree_queue.put(("page", generation, parent_id, page))
+        except Exception: self._tree_queue.put(("failed", generation, parent_id, f"{folder_path}\n{traceback.format_exc()}"))
+        self._tree_queue.put(("done", generation, parent_id, None))
+
+    def _poll_tree_queue(self):
+        self._tree_poll = None
+        while True:
+            try: kind, generation, parent_id, payload = self._tree_queue.get_nowait()
+            except queue.Empty: break
+            if generation != self._tree_generation or parent_id not in self._tree_loading: continue
+            if parent_id and not self.tree.exists(parent_id): # Removed meanwhile
+                del self._tree_loading[parent_id]; continue
+            placeholder = self._tree_loading[parent_id]
+            if placeholder is not None and self.tree.exists(placeholder): self.tree.delete(placeholder) # First page or empty folder
+            self._tree_loading[parent_id] = None
+            if kind == "page":
+                try: self._insert_tree_nodes_from_data(parent_id, payload)
+                except Exception as e: self._handle_error(f"Populate tree failed", e)
+            elif kind == "failed": self._handle_error(f"Populate tree failed: {payload}")
+            else: del self._tree_loading[parent_id]
+        if self._tree_loading: self._tree_poll = self.root.after(TREE_POLL_MS, self._poll_tree_queue)
 
     def _insert_tree_nodes_from_data(self, parent_id, nodes_data):
         # ... (same as v0.9) ...
          for node_info in nodes_data:
             node_id = self.tree.insert(parent_id, "end", iid=node_info.get('id'), text=node_info.get('text'), values=(node_info.get('type'), node_info.get('path')), open=False)
-            if node_info.get('type') == 'folder' and node_info.get('has_children'): self.tree.insert(node_id, "end", text="...") 
+            # has_children None: not probed, the "..." placeholder goes away if expanding finds nothing
+            if node_info.get('type') == 'folder' and node_info.get('has_children') is not False: self.tree.insert(node_id, "end", text="...") 
 
     def ui_event_item_selected(self, event=None):
         # ... (same as v0.9 - calls read_file_content) ...
@@ -345,23 +471,20 @@ class WinyunqDocStylerApp:
             self.selected_file_path = item_path
             try:
                 content, error = file_system_utils.read_file_content(item_path)
-                self._display_text_in_widget(self.original_text_area, content if not error else f"Error:\n{error}")
+                original_lines = content.splitlines() if content and not error else []
+                if len(original_lines) > self.large_file_lines: self._show_original_window(original_lines)
+                else: self._display_text_in_widget(self.original_text_area, content if not error else f"Error:\n{error}")
                 self.process_button.config(state=tk.NORMAL if not error else tk.DISABLED)
             except Exception as e: self._handle_error(f"Read file failed: {item_path}", e); self.process_button.config(state=tk.DISABLED)
         else: self.selected_file_path = None; self.process_button.config(state=tk.DISABLED); self._display_text_in_widget(self.original_text_area, f"{item_type.capitalize()} selected.")
 
     def ui_event_node_expand(self, event=None):
-        # ... (same as v0.9 - calls get_tree_nodes_for_ui) ...
         node_id = self.tree.focus(); item = self.tree.item(node_id); item_values = item.get("values")
         if not item_values or len(item_values) < 2 or item_values[0] != "folder": return
+        if node_id in self._tree_loading: return # Already listing
         children = self.tree.get_children(node_id)
         if children and self.tree.item(children[0], "text") == "...":
-            folder_path = item_values[1]
-            try:
-                children_data = file_system_utils.get_tree_nodes_for_ui(folder_path, node_id=node_id)
-                for child in children: self.tree.delete(child)
-                self._insert_tree_nodes_from_data(node_id, children_data)
-            except Exception as e: self._handle_error(f"Expand folder failed: {folder_path}", e)
+            self._load_tree_level(node_id, item_values[1], placeholder=children[0])
 
     def ui_update_config(self, event=None):
         # ... (same as v0.9) ...
@@ -371,24 +494,86 @@ class WinyunqDocStylerApp:
 
 
     def ui_action_process_selected(self):
-        """Action for the 'Process/Show' button."""
+        """Action for the 'Process/Show' button: formats in a worker thread, the window stays responsive."""
         if not self.selected_file_path: return messagebox.showwarning("No File", "Select file.")
         try:
             original_content, error = file_system_utils.read_file_content(self.selected_file_path)
             if error: return self._handle_error(f"Cannot format: {error}")
-            original_content = original_content or ""
-            config = self.formatter_config
-            print(f"UI: Calling process_code with config: {config}")
+        except Exception as e: return self._handle_error("Formatting Error", e)
+        original_content = original_content or ""
+        self._cancel_format_job()
+        self._format_jobs_started += 1
+        original_lines = original_content.splitlines()
+        job = {"id": self._format_jobs_started, "path": self.selected_file_path, "config": dict(self.formatter_config),
+               "lines": original_lines, "total": max(len(original_lines), 1), "cancel": threading.Event()}
+        job["progress_window"] = self._create_progress_window(job["total"], cancel_command=self._cancel_format_job)
+        self._format_job = job
+        self.process_button.config(state=tk.DISABLED)
+        threading.Thread(target=self._run_format_job, args=(job, original_content, self._last_processed), daemon=True).start()
+        if self._format_poll is None: self._format_poll = self.root.after(FORMAT_POLL_MS, self._poll_format_queue)
+
+    def _run_format_job(self, job, original_content, last):
+        """Worker thread (no Tk calls): runs the formatter and posts progress / the result to _format_queue."""
+        config, original_lines = job["config"], job["lines"]
+        step = max(job["total"] // PROGRESS_STEPS, 1)
+        reported = [0]
+        def progress(lines_done): # Called by the formatter after each block
+            if job["cancel"].is_set(): raise winyunq_formatter.FormatCancelled()
+            if lines_done - reported[0] >= step:
+                reported[0] = lines_done
+                self._format_queue.put(("progress", job["id"], lines_done))
+        try:
             # --- Interface Call ---
-            result = winyunq_formatter.process_code(original_content, config=config) # Expects dict
+            if last and last[0] == job["path"] and last[1] == config and hasattr(winyunq_formatter, "process_code_incremental"):
+                # Same file and config as last time: re-run only the blocks touched by the edit
+                changed_ranges = winyunq_formatter.diff_changed_ranges(last[2], original_lines)
+                print(f"UI: Calling process_code_incremental ({len(changed_ranges)} changed range(s)) with config: {config}")
+                result = winyunq_formatter.process_code_incremental(last[3], original_content, changed_ranges, config=config, progress=progress)
+            else:
+                print(f"UI: Calling process_code with config: {config}")
+                result = winyunq_formatter.process_code(original_content, config=config, progress=progress) # Expects dict
+        except winyunq_formatter.FormatCancelled: return # Nobody is waiting for it any more
+        except Exception: self._format_queue.put(("failed", job["id"], traceback.format_exc())); return
+        self._format_queue.put(("done", job["id"], result))
+
+    def _poll_format_queue(self):
+        """Tk thread: applies the worker's messages (those of cancelled jobs are dropped) until the job ends."""
+        self._format_poll = None
+        job = self._format_job
+        while True:
+            try: kind, job_id, payload = self._format_queue.get_nowait()
+            except queue.Empty: break
+            if job is None or job_id != job["id"]: continue
+            if kind == "progress":
+                self._update_progress(job["progress_window"], payload, job["total"], f"line {payload}")
+                continue
+            self._finish_format_job()
+            if kind == "failed": return self._handle_error(f"Formatting Error\n\n{payload}")
+            self._last_processed = (job["path"], job["config"], job["lines"], payload) if payload.get("success") else None
             # --- Display Result ---
-            self._display_formatter_result_with_status(result) # Use the dedicated display function
-        except Exception as e: self._handle_error("Formatting Error", e)
+            self._display_formatter_result_with_status(payload) # Use the dedicated display function
+            if job["config"].get("target_phase") == 2: # The formatter itself stays headless
+                messagebox.showwarning("Phase 2 Preview", "Phase 2 (Tag Sorting) preview not fully implemented yet. Showing Phase 1 result.")
+            return
+        if job is not None: self._format_poll = self.root.after(FORMAT_POLL_MS, self._poll_format_queue)
+
+    def _finish_format_job(self):
+        job, self._format_job = self._format_job, None
+        if job is None: return
+        if job["progress_window"].winfo_exists(): job["progress_window"].destroy()
+        self.process_button.config(state=tk.NORMAL if self.selected_file_path else tk.DISABLED)
+
+    def _cancel_format_job(self):
+        """Stops the running format (the worker exits at its next block) and closes its progress window."""
+        if self._format_job is None: return
+        self._format_job["cancel"].set()
+        self._finish_format_job()
 
 
     def ui_action_reload(self):
         # ... (same as v0.9) ...
         global winyunq_formatter, STATUS_MAP 
+        self._cancel_format_job() # The running job uses the old module
         try:
             print("Attempting reload...")
             # Need to handle potential errors during reload/import
@@ -396,6 +581,7 @@ class WinyunqDocStylerApp:
                  winyunq_formatter = importlib.reload(winyunq_formatter)
             else:
                  import winyunq_formatter
+            self._last_processed = None # Results of the old pipeline must not be reused
             # Reload constants
             STATUS_MAP = {getattr(winyunq_formatter, k, k.lower()): k.lower() for k in dir(winyunq_formatter) if k.startswith("STATUS_")}
             self._configure_tags() # Reconfigure tags with potentially new status names/styles
@@ -404,12 +590,15 @@ class WinyunqDocStylerApp:
         except Exception as e: self._handle_error("Reload Failed", e)
 
     # --- Progress Bar Helpers & Boundary Tags --- (Keep these UI helpers)
-    def _create_progress_window(self, total):
-        # ... (implementation) ...
-        win = tk.Toplevel(self.root); win.title("Working..."); win.geometry("400x100"); win.resizable(False, False); win.transient(self.root); win.grab_set()
+    def _create_progress_window(self, total, cancel_command=None):
+        # Not modal: selecting another file in the tree must stay possible (it cancels the job)
+        win = tk.Toplevel(self.root); win.title("Working..."); win.geometry("400x130" if cancel_command else "400x100"); win.resizable(False, False); win.transient(self.root)
         ttk.Label(win, text="Processing...", padding=5).pack()
         pb = ttk.Progressbar(win, orient="horizontal", length=350, mode="determinate", maximum=total); pb.pack(pady=5)
         lbl = ttk.Label(win, text="Starting...", padding=5, width=50, anchor='w', justify='left'); lbl.pack()
+        if cancel_command:
+            ttk.Button(win, text="Cancel", command=cancel_command).pack(pady=(0, 5))
+            win.protocol("WM_DELETE_WINDOW", cancel_command)
         win.pb = pb; win.status_label = lbl
         return win
         
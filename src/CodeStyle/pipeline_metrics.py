@@ -0,0 +1,111 @@
+# pipeline_metrics.py
+import heapq
+from time import perf_counter
+
+# --- Metric Layout ---
+STAGE_NAMES = ("stage1", "stage2", "stage3", "stage4")
+COUNTER_NAMES = ("blocks", "code_lines", "block_lines_in", "lines_out",
+                 "memo_hits", "memo_misses", "result_cache_hits",
+                 "stage2_fallbacks", "stage3_fallbacks", "stage4_fallbacks")
+TOP_BLOCKS_PER_FILE = 10 # Slowest blocks kept per run (stages 2-4 time)
+DEFAULT_TOP_N = 10
+
+timer = perf_counter # Clock used by every instrumented stage
+
+
+def new_metrics():
+    """
+    Empty metrics dict, the layout of summary['metrics']:
+        'seconds': {stage1..stage4, 'total'} wall time,
+        one int per COUNTER_NAMES entry,
+        'slowest_blocks': [[seconds, block_line (1-based)], ...] (at most TOP_BLOCKS_PER_FILE).
+    """
+    metrics = {"seconds": dict.fromkeys(STAGE_NAMES + ("total",), 0.0)}
+    metrics.update(dict.fromkeys(COUNTER_NAMES, 0))
+    metrics["slowest_blocks"] = []
+    return metrics
+
+
+def cache_hit_metrics(seconds, lines_out):
+    """Metrics of a run answered by result_cache.ResultCache (no stage ran)."""
+    metrics = new_metrics()
+    metrics["result_cache_hits"] = 1
+    metrics["lines_out"] = lines_out
+    metrics["seconds"]["total"] = seconds
+    return metrics
+
+
+def record_block(metrics, seconds, block_line):
+    """Keeps the TOP_BLOCKS_PER_FILE slowest blocks (min-heap on seconds)."""
+    slowest = metrics["slowest_blocks"]
+    if len(slowest) < TOP_BLOCKS_PER_FILE: heapq.heappush(slowest, [seconds, block_line])
+    elif seconds > slowest[0][0]: heapq.heapreplace(slowest, [seconds, block_line])
+
+
+def _add_numbers(total, metrics):
+    for stage, seconds in metrics.get("seconds", {}).items():
+        total["seconds"][stage] = total["seconds"].get(stage, 0.0) + seconds
+    for name in COUNTER_NAMES: total[name] += metrics.get(name, 0)
+
+
+def merge_metrics(total, metrics, line_shift=0):
+    """Adds metrics into total (both new_metrics() dicts). line_shift moves merged block lines."""
+    _add_numbers(total, metrics)
+    for seconds, block_line in metrics.get("slowest_blocks", ()): record_block(total, seconds, block_line + line_shift)
+    return total
+
+
+class MetricsAggregator:
+    """
+    Merges summary['metrics'] of a batch run (e.g. project_formatter.format_project
+    results) and keeps the top-N slowest files and blocks for a report.
+    """
+
+    def __init__(self, top_n=DEFAULT_TOP_N):
+        self.top_n = top_n
+        self.totals = new_metrics()
+        del self.totals["slowest_blocks"] # Per-file block lists are tracked with their path below
+        self.file_count = 0
+        self._slowest_files = [] # min-heap (seconds, path)
+        self._slowest_blocks = [] # min-heap (seconds, path, block_line)
+
+    def _keep(self, heap, item):
+        if len(heap) < self.top_n: heapq.heappush(heap, item)
+        elif item > heap[0]: heapq.heapreplace(heap, item)
+
+    def add(self, path, summary):
+        """Adds one file's summary (files without metrics are ignored)."""
+        metrics = (summary or {}).get("metrics")
+        if not metrics: return
+        self.file_count += 1
+        _add_numbers(self.totals, metrics)
+        self._keep(self._slowest_files, (metrics["seconds"].get("total", 0.0), path))
+        for seconds, block_line in metrics.get("slowest_blocks", ()):
+            self._keep(self._slowest_blocks, (seconds, path, block_line))
+
+    def slowest_files(self):
+        """[(seconds, path)], slowest first."""
+        return sorted(self._slowest_files, reverse=True)
+
+    def slowest_blocks(self):
+        """[(seconds, path, block_line)], slowest first."""
+        return sorted(self._slowest_blocks, reverse=True)
+
+    def format_report(self):
+        """Text report: stage time split, counters, slowest files and blocks."""
+        seconds = self.totals["seconds"]
+        total_seconds = seconds.get("total", 0.0)
+        report_lines = [f"Files: {self.file_count}   Total: {total_seconds:.3f}s", "", "Stage        Seconds   Share"]
+        for stage in STAGE_NAMES:
+            share = (seconds[stage] / total_seconds * 100) if total_seconds else 0.0
+            report_lines.append(f"{stage:<10} {seconds[stage]:>9.3f} {share:>6.1f}%")
+        report_lines.append("")
+        report_lines.extend(f"{name:<18} {self.totals[name]}" for name in COUNTER_NAMES)
+        report_lines += ["", f"Top {self.top_n} slowest files:"]
+        report_lines.extend(f"  {file_seconds:>9.4f}s  {path}" for file_seconds, path in self.slowest_files())
+        report_lines += ["", f"Top {self.top_n} slowest blocks (stages 2-4):"]
+        report_lines.extend(f"  {block_seconds:>9.4f}s  {path}:{block_line}" for block_seconds, path, block_line in self.slowest_blocks())
+        return "\n".join(report_lines)
+
+    def print_report(self):
+        print(self.format_report())
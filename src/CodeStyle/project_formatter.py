@@ -0,0 +1,147 @@
+# project_formatter.py
+import os
+import difflib
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import file_system_utils
+import winyunq_formatter
+import result_cache
+import pipeline_metrics
+
+# format_file actions on the formatted text
+ACTION_CHECK = "check" # Only report whether the file would change
+ACTION_DIFF = "diff"   # + unified diff
+ACTION_WRITE = "write" # + rewrite the file (atomically) if it changed
+
+_worker_block_memo = None # One per worker process, shared by every file it formats
+
+
+def _file_size(path):
+    try: return os.path.getsize(path)
+    except OSError: return 0 # Unreadable files still get a (cheap) slot and report their error
+
+
+@contextlib.contextmanager
+def _quiet_output(quiet):
+    # The stages print per-block progress and warnings; batch callers may not want them
+    if not quiet:
+        yield
+        return
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        yield
+
+
+def _apply_action(file_path, raw_bytes, content, lines, action):
+    """Compares the formatted lines with content and checks/diffs/writes. Returns the result keys to add."""
+    formatted = winyunq_formatter.lines_to_text(lines, content)
+    if formatted == content: return {"changed": False}
+    action_result = {"changed": True}
+    if action == ACTION_DIFF:
+        action_result["diff"] = "".join(difflib.unified_diff(content.splitlines(True), formatted.splitlines(True), file_path, file_path))
+    elif action == ACTION_WRITE:
+        error = file_system_utils.write_file_atomic(file_path, formatted, newline=file_system_utils.detect_newline(raw_bytes))
+        action_result["written"] = error is None
+        if error: action_result["write_error"] = error
+    return action_result
+
+
+def format_file(file_path, config=None, cache=None, block_memo=None, collect_metrics=False, action=None, quiet=False):
+    """
+    Formats one file on disk with winyunq_formatter.process_code.
+    With a result_cache.ResultCache, the raw file bytes are hashed first and a hit
+    returns the stored summary without decoding the file or running any stage.
+    block_memo (result_cache.BlockMemo) and collect_metrics are passed on to process_code
+    (summary['metrics'] then also covers reading and decoding the file).
+    action (ACTION_CHECK/DIFF/WRITE) compares the formatted text with the file and adds
+    'changed' (bool), 'diff' (str, ACTION_DIFF), 'written' / 'write_error' (ACTION_WRITE),
+    or 'failed' (True) when process_code failed.
+    quiet=True discards what the pipeline prints.
+    Returns dict {'path': str, 'summary': dict, 'error': str|None, ...action keys}.
+    """
+    with _quiet_output(quiet):
+        return _format_file(file_path, config, cache, block_memo, collect_metrics, action)
+
+
+def _format_file(file_path, config, cache, block_memo, collect_metrics, action):
+    run_start = pipeline_metrics.timer() if collect_metrics else 0.0
+    try:
+        with open(file_path, 'rb') as f: raw_bytes = f.read()
+    except OSError as e:
+        return {"path": file_path, "summary": {}, "error": f"Read Error: {e}"}
+
+    cache_key = cached_result = None
+    if cache is not None:
+        cache_key = cache.make_key(raw_bytes, winyunq_formatter.resolve_config(config))
+        cached_result = cache.get(cache_key, summary_only=action is None)
+        if cached_result is not None and action is None:
+            if collect_metrics:
+                cached_result["summary"]["metrics"] = pipeline_metrics.cache_hit_metrics(pipeline_metrics.timer() - run_start, 0)
+            return {"path": file_path, "summary": cached_result["summary"], "error": cached_result["error_message"]}
+
+    content, error = file_system_utils.decode_file_bytes(raw_bytes)
+    if error: return {"path": file_path, "summary": {}, "error": error}
+    if cached_result is not None: # Hit with an action: the lines are needed
+        result = cached_result
+        if collect_metrics: result["summary"]["metrics"] = pipeline_metrics.cache_hit_metrics(0.0, len(result["lines"]))
+    else:
+        try:
+            result = winyunq_formatter.process_code(content, config, block_memo=block_memo, collect_metrics=collect_metrics)
+        except Exception as e: # process_code handles its own errors; this guards the worker
+            return {"path": file_path, "summary": {}, "error": f"{type(e).__name__}: {e}"}
+        if cache_key is not None and result.get("success"):
+            cache.put(cache_key, result)
+    file_result = {"path": file_path, "summary": result.get("summary", {}), "error": result.get("error_message")}
+    if action is not None:
+        if result.get("success"): file_result.update(_apply_action(file_path, raw_bytes, content, result["lines"], action))
+        else: file_result["failed"] = True # Critical pipeline error: never compare or write its lines
+    metrics = file_result["summary"].get("metrics")
+    if metrics is not None: metrics["seconds"]["total"] = pipeline_metrics.timer() - run_start
+    return file_result
+
+
+def _format_in_worker(file_path, config, cache, file_options):
+    """Worker entry point: formats one file (file_options: format_file keywords) with the process's block memo."""
+    global _worker_block_memo
+    if _worker_block_memo is None: _worker_block_memo = result_cache.BlockMemo()
+    return format_file(file_path, config, cache, _worker_block_memo, **file_options)
+
+
+def format_project(root, config=None, workers=None, extensions=None, file_paths=None, cache=None, collect_metrics=False, action=None, quiet=False):
+    """
+    Formats every relevant file under root across a process pool.
+
+    Args:
+        root: Project directory, scanned with file_system_utils.find_relevant_files.
+        config: Formatter config passed to process_code for every file.
+        workers: Process count (None = os.cpu_count()). 1 runs in-process, no pool.
+        extensions: Optional extension list for find_relevant_files.
+        file_paths: Optional precomputed file list (skips the directory scan).
+        cache: Optional result_cache.ResultCache shared by all workers (see format_file).
+               Identical blocks are always memoized across the files a worker handles.
+        collect_metrics: Adds summary['metrics'] per file; feed the results to
+                         pipeline_metrics.MetricsAggregator for a batch report.
+        action, quiet: See format_file (check / diff / write each file).
+
+    Yields: dict {'path': str, 'summary': dict, 'error': str|None, ...} per file (see format_file), in
+            completion order, as soon as its worker finishes it (one pool task per file, largest first).
+    """
+    if file_paths is None:
+        file_paths = file_system_utils.find_relevant_files(root, extensions=extensions)
+    if not file_paths: return
+    workers = workers or os.cpu_count() or 1
+    file_options = {"collect_metrics": collect_metrics, "action": action, "quiet": quiet}
+
+    if workers == 1:
+        block_memo = result_cache.BlockMemo() # Shared across the files of this run
+        for path in file_paths: yield format_file(path, config, cache, block_memo, **file_options)
+        return
+
+    ordered = sorted(file_paths, key=_file_size, reverse=True) # Largest first: no big file left for the end
+    with ProcessPoolExecutor(max_workers=min(workers, len(ordered))) as executor:
+        futures = {executor.submit(_format_in_worker, path, config, cache, file_options): path for path in ordered}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e: # Worker crashed (e.g. killed)
+                yield {"path": futures[future], "summary": {}, "error": f"Worker failed: {type(e).__name__}: {e}"}
@@ -0,0 +1,205 @@
+# result_cache.py
+import os
+import json
+import hashlib
+import importlib.util
+import shutil
+import tempfile
+from collections import OrderedDict
+
+from line_buffer import LineBuffer, iter_line_rows
+
+# --- Cache Settings ---
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "winyunq_formatter")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+EVICT_TO_RATIO = 0.9 # Evict down to 90% of the budget so puts do not evict one entry at a time
+DEFAULT_BLOCK_MEMO_ENTRIES = 4096
+ENTRY_SUFFIX = ".entry"
+VERSION_FILE = "PIPELINE_VERSION"
+
+# Modules whose source takes part in the cache key: editing any of them invalidates the cache
+PIPELINE_MODULES = ("block_extractor", "tag_segmenter_sorter", "block_layout_normalizer", "winyunq_renderer", "winyunq_formatter", "line_buffer")
+
+_pipeline_fingerprint = None
+
+
+def pipeline_fingerprint():
+    """Hash of the pipeline modules' source files (computed once per process)."""
+    global _pipeline_fingerprint
+    if _pipeline_fingerprint is None:
+        digest = hashlib.sha256()
+        for module_name in PIPELINE_MODULES:
+            digest.update(module_name.encode("utf-8") + b"\0")
+            spec = importlib.util.find_spec(module_name)
+            origin = spec.origin if spec else None
+            if origin and os.path.isfile(origin):
+                with open(origin, "rb") as f: digest.update(f.read())
+            else:
+                digest.update(b"<missing>") # Dummy pipeline: still a distinct, stable key
+        _pipeline_fingerprint = digest.hexdigest()
+    return _pipeline_fingerprint
+
+
+class ResultCache:
+    """
+    Content-addressed on-disk cache of process_code results.
+    Key = sha256(pipeline module sources, active config, file bytes). Entries are
+    one file each: a small JSON meta line (success/error/summary/blocks) then the lines as
+    JSON [text, status, orig_line] rows, so summary-only lookups never parse the lines.
+    LRU by file mtime, size bounded.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = os.path.abspath(cache_dir or DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes
+        self.fingerprint = pipeline_fingerprint()
+        self._total_bytes = None # Lazily measured on the first put
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._drop_if_pipeline_changed()
+
+    # --- Keys ---
+    def make_key(self, content_bytes, active_config):
+        """Key for file content (bytes) formatted with the resolved config dict."""
+        digest = hashlib.sha256(self.fingerprint.encode("ascii"))
+        digest.update(json.dumps(active_config, sort_keys=True, default=repr).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(content_bytes)
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ENTRY_SUFFIX)
+
+    # --- Lookup / Store ---
+    def get(self, key, summary_only=False):
+        """
+        Returns the stored result dict, or None on a miss.
+        'lines' is a LineBuffer; summary_only=True skips loading it (returned as None).
+        """
+        path = self._entry_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                result = json.loads(f.readline())
+                result["lines"] = None if summary_only else LineBuffer.from_rows(json.loads(f.read()))
+        except (OSError, ValueError):
+            return None # Missing, evicted meanwhile or half-written by a crashed process
+        try: os.utime(path) # Mark as recently used
+        except OSError: pass
+        return result
+
+    def put(self, key, result):
+        """Stores a process_code result dict (only successful results are worth caching)."""
+        # Metrics describe the run that produced the result, not the content
+        summary = {k: v for k, v in result.get("summary", {}).items() if k != "metrics"}
+        meta = {"success": result.get("success", True), "error_message": result.get("error_message"), "summary": summary, "blocks": result.get("blocks", [])}
+        payload = json.dumps(meta, ensure_ascii=False) + "\n" + json.dumps(list(iter_line_rows(result.get("lines") or [])), ensure_ascii=False)
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f: f.write(payload)
+            os.replace(tmp_path, path) # Readers never see a partial entry
+        except OSError:
+            try: os.remove(tmp_path)
+            except OSError: pass
+            return
+        self._account(os.path.getsize(path))
+
+    # --- Size Bound (LRU) ---
+    @staticmethod
+    def _is_shard_name(name):
+        return len(name) == 2 and all(c in "0123456789abcdef" for c in name)
+
+    def _iter_entries(self):
+        for shard in os.scandir(self.cache_dir):
+            if not (shard.is_dir() and self._is_shard_name(shard.name)): continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(ENTRY_SUFFIX):
+                    try: stat = entry.stat()
+                    except OSError: continue
+                    yield entry.path, stat.st_size, stat.st_mtime
+
+    def _account(self, added_bytes):
+        if self._total_bytes is None:
+            self._total_bytes = sum(size for _, size, _ in self._iter_entries())
+        else:
+            self._total_bytes += added_bytes
+        if self._total_bytes > self.max_bytes: self.evict()
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits EVICT_TO_RATIO of max_bytes."""
+        entries = sorted(self._iter_entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * EVICT_TO_RATIO
+        for path, size, _ in entries:
+            if total <= target: break
+            try: os.remove(path)
+            except OSError: continue
+            total -= size
+        self._total_bytes = total
+
+    def clear(self):
+        """Removes every entry (keeps the cache directory)."""
+        for shard in os.scandir(self.cache_dir):
+            if shard.is_dir() and self._is_shard_name(shard.name): shutil.rmtree(shard.path, ignore_errors=True)
+        self._total_bytes = 0
+
+    def _drop_if_pipeline_changed(self):
+        # Old entries can never hit again once the fingerprint changes: reclaim the space now
+        version_path = os.path.join(self.cache_dir, VERSION_FILE)
+        try:
+            with open(version_path, "r", encoding="ascii") as f: stored = f.read().strip()
+        except OSError:
+            stored = None
+        if stored == self.fingerprint: return
+        if stored is not None: self.clear()
+        with open(version_path, "w", encoding="ascii") as f: f.write(self.fingerprint)
+
+
+class BlockMemo:
+    """
+    In-memory memo of per-block pipeline output (stages 2-4), keyed on the
+    stage-1 normalized block text plus config. Output lines are stored with
+    orig_line relative to the block start, so a hit can be reused at any position
+    and in any file. Bounded LRU; hits/misses count over the memo's lifetime.
+    """
+
+    def __init__(self, max_entries=DEFAULT_BLOCK_MEMO_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def make_config_key(active_config):
+        """Hashable form of a resolved config (compute once per file, not per block)."""
+        return tuple(sorted((k, repr(v)) for k, v in active_config.items()))
+
+    @staticmethod
+    def make_key(processed_lines, config_key):
+        """Key for a stage-1 block: its (text, status) lines + config. Statuses matter: a failed stage 2 outputs stage 1 as is."""
+        return (tuple(processed_lines), config_key)
+
+    def get(self, key, block_start_orig):
+        """
+        Returns (lines, stage_errors) rebased to block_start_orig, or None on a miss.
+        lines is a fresh LineBuffer; stage_errors replays the messages the
+        original run reported (with the new block position).
+        """
+        stored = self._entries.get(key)
+        if stored is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        stored_lines, stored_errors = stored
+        lines = LineBuffer.from_rows((text, status, block_start_orig + offset) for text, status, offset in stored_lines)
+        return lines, [f"Block@{block_start_orig+1}: {message}" for message in stored_errors]
+
+    def put(self, key, block_lines, block_start_orig, stage_errors=()):
+        """Stores a block's final output lines (LineBuffer or list of dicts) and the stage errors it reported."""
+        error_prefix = f"Block@{block_start_orig+1}: "
+        stored_lines = tuple((text, status, orig_line - block_start_orig) for text, status, orig_line in iter_line_rows(block_lines))
+        stored_errors = tuple(message[len(error_prefix):] if message.startswith(error_prefix) else message for message in stage_errors)
+        self._entries[key] = (stored_lines, stored_errors)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries: self._entries.popitem(last=False)
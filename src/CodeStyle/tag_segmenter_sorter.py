@@ -1,5 +1,6 @@
 # tag_parser_stage2.py (Focus on Tag Blocking and Sorting)
 import re
+from line_buffer import iter_line_rows
 
 # Define or import status constants if needed for richer output, but focus is structure now
 STATUS_INFO = "info" 
@@ -21,8 +22,8 @@ def segment_and_sort_tags(block_lines_info_stage1):
                       and sorts the top-level blocks according to Winyunq order.
 
     Args:
-        block_lines_info_stage1: list of dicts from stage 1 (prefix/boundary norm)
-                                 [{'text': str, 'status': str, 'orig_line': int}, ...]
+        block_lines_info_stage1: line_buffer.LineBuffer from stage 1 (prefix/boundary norm),
+                                 or list of dicts [{'text': str, 'status': str, 'orig_line': int}, ...]
 
     Returns:
         A list of dictionaries, where each dictionary represents a logical block:
@@ -37,8 +38,8 @@ def segment_and_sort_tags(block_lines_info_stage1):
     first_tag_encountered = False
 
     # Iterate through normalized lines (skip /** and **/)
-    for line_info in block_lines_info_stage1[1:-1]:
-        line_text = line_info["text"]
+    stage1_texts = [text for text, _, _ in iter_line_rows(block_lines_info_stage1)]
+    for line_text in stage1_texts[1:-1]:
         
         # Extract markdown content area (text after " * ")
         markdown_content = ""
@@ -0,0 +1,44 @@
+# tests/test_file_system_utils.py
+# walk_files / find_relevant_files pruning. Run: python -m pytest tests (from src/CodeStyle).
+import os
+import sys
+
+# Pipeline modules are flat imports (file_system_utils, ...) living one directory up
+_CODESTYLE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _CODESTYLE_DIR not in sys.path: sys.path.insert(0, _CODESTYLE_DIR)
+
+import file_system_utils
+
+
+def _touch(root, *relative_paths):
+    for relative_path in relative_paths:
+        path = os.path.join(root, *relative_path.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "w").close()
+
+
+def _found(root, **kwargs):
+    return [os.path.relpath(path, root).replace(os.sep, "/") for path in file_system_utils.find_relevant_files(str(root), **kwargs)]
+
+
+def test_colcon_outputs_pruned_only_at_the_root(tmp_path):
+    _touch(tmp_path, "src/pkg/include/pkg/log/logger.hpp", "src/pkg/src/build/builder.cpp", "src/pkg/src/a.cpp",
+           "build/pkg/generated.cpp", "install/pkg/include/pkg.hpp", "log/latest/x.h")
+    assert _found(tmp_path) == ["src/pkg/include/pkg/log/logger.hpp", "src/pkg/src/a.cpp", "src/pkg/src/build/builder.cpp"]
+
+
+def test_tool_dirs_pruned_at_any_depth(tmp_path):
+    _touch(tmp_path, "src/pkg/.git/hooks/x.h", "src/pkg/node_modules/dep/y.c", "src/pkg/z.h")
+    assert _found(tmp_path) == ["src/pkg/z.h"]
+
+
+def test_gitignore_rules_apply_below_their_directory(tmp_path):
+    _touch(tmp_path, "src/pkg/gen/g.h", "src/pkg/tmp_1.h", "src/pkg/tmp_keep.h", "src/other/gen/o.h")
+    (tmp_path / "src" / "pkg" / ".gitignore").write_text("gen/\ntmp_*.h\n!tmp_keep.h\n")
+    assert _found(tmp_path) == ["src/other/gen/o.h", "src/pkg/tmp_keep.h"]
+
+
+def test_extensions_with_or_without_dot_and_multi_dot(tmp_path):
+    _touch(tmp_path, "a.hpp", "b.pb.h", "c.txt")
+    assert _found(tmp_path, extensions=["hpp"]) == ["a.hpp"]
+    assert _found(tmp_path, extensions=[".pb.h"]) == ["b.pb.h"]
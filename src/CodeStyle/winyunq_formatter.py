@@ -1,6 +1,10 @@
 # winyunq_formatter.py (v1.6 - Fixed SyntaxError)
 import traceback
 import re # Ensure re is imported if used internally
+import bisect
+from line_buffer import LineBuffer, iter_line_rows
+import pipeline_metrics
+from pipeline_metrics import timer
 
 # Import pipeline modules
 try:
@@ -24,7 +28,13 @@ except ImportError as e:
     def dummy_layout_norm(*args, **kwargs): print("WARN: Using dummy layout normalizer"); return [{"text":"/**", "status":"boundary"}, {"text":" * Layout Norm Line", "status":"modified"}, {"text":"**/", "status":"boundary"}]
     def dummy_render_s4(*args, **kwargs): print("WARN: Using dummy renderer s4"); return [{"text":"/**", "status":"boundary"}, {"text":" * Rendered", "status":"rendered"}, {"text":"**/", "status":"boundary"}]
     def dummy_debug_s3(*args, **kwargs): return [{"text":"-- Debug S3 --", "status":"debug"}]
-    block_extractor.extract_and_normalize_block = dummy_extract
+    block_extractor.extract_and_normalize_boundaries = dummy_extract
+    block_extractor.SEGMENT_CODE = "code"; block_extractor.SEGMENT_BLOCK = "block"
+    block_extractor.iter_segments = lambda source: (("block", block_data) for block_data in dummy_extract())
+    block_extractor.is_block_opener = lambda line_text: False
+    block_extractor.SEGMENT_CODE_RUN = "code_run"
+    block_extractor.build_line_offsets = lambda code_string: ([], [])
+    block_extractor.iter_segment_runs = lambda code_string, line_starts, line_ends: block_extractor.iter_segments(code_string)
     tag_parser_s2.segment_and_sort_tags = dummy_segment_sort
     stage3_layout.normalize_block_layout = dummy_layout_norm # Assign dummy to correct module name
     stage3_layout.generate_debug_output_lines = dummy_debug_s3 # Assign dummy debug
@@ -35,17 +45,16 @@ except ImportError as e:
 # --- Default Config ---
 DEFAULT_CONFIG = { "spacesAfterTagKeyword": 1 }
 
-# --- Main Interface Function ---
-def process_code(code_string, config=None):
-    """
-    STABLE INTERFACE: Orchestrates the Winyunq formatting pipeline by executing
-    all necessary stages up to the point required for the target output phase.
-    Returns dict {'success':bool, 'error':str|None, 'lines':list[dict]}
-    'lines' dicts: {'text': str, 'status': str|None, 'orig_line': int}
-    """
+
+class FormatCancelled(Exception):
+    """Raised by a progress callback to abandon a run: process_code / process_code_incremental let it propagate."""
+
+# --- Config Handling ---
+def resolve_config(config):
+    """Merges config over DEFAULT_CONFIG and validates 'target_phase' (int, defaults to 4)."""
     active_config = DEFAULT_CONFIG.copy()
     if config: active_config.update(config)
-    
+
     # --- Corrected Phase Handling ---
     target_phase = active_config.get("target_phase", 4) # Default to render if phase not specified
     try:
@@ -55,123 +64,514 @@ def process_code(code_string, config=None):
         target_phase = 4 # Default to 4 on error
     active_config["target_phase"] = target_phase # Ensure config has the validated int phase
     # --- End Corrected Phase Handling ---
+    return active_config
+
+
+# --- Per-Block Pipeline (Stages 2-4) ---
+def _timed_call(metrics, stage, func, *args):
+    """func(*args), adding its wall time to metrics['seconds'][stage] when metrics are collected."""
+    if metrics is None: return func(*args)
+    stage_start = timer()
+    try:
+        return func(*args)
+    finally:
+        metrics["seconds"][stage] += timer() - stage_start
+
+
+def _run_block_pipeline(block_data, active_config, stage_errors, metrics=None):
+    """
+    Runs one stage-1 block through the later stages up to the configured phase.
+    Failures are appended to stage_errors and fall back to the previous stage's lines.
+    metrics: Optional pipeline_metrics dict, gets stage times and fallback counts.
+    Returns: LineBuffer output lines for this block (list[dict] if a dict-based stage produced them).
+    """
+    target_phase = active_config["target_phase"] # Per block: a failing block only downgrades itself
+    block_start_orig = block_data["start_line_orig"]
+    stage1_processed_tuples = block_data["processed_lines"]
+    stage1_lines_info = LineBuffer.from_rows((line, status, block_start_orig + i)
+                                             for i, (line, status) in enumerate(stage1_processed_tuples))
+
+    # --- Pipeline Execution based on Phase ---
+    result_stage1 = stage1_lines_info
+    result_stage2_blocks = None # Logical blocks from S2
+    result_stage3_lines = None  # Normalized lines from S3
+    result_stage3_debug_lines = None # Debug lines from S3
+    result_stage4_lines = None  # Rendered lines from S4
+
+    current_stage_lines_input = result_stage1 # Input for the next stage
+
+    if target_phase >= 2:
+        try:
+            segmented_sorted_blocks = _timed_call(metrics, "stage2", tag_parser_s2.segment_and_sort_tags, current_stage_lines_input) # CALL STAGE 2
+            result_stage2_blocks = segmented_sorted_blocks # Save logical blocks output
+            # NOTE: Stage 2 no longer directly provides lines for output, focus on structure
+        except Exception as e_s2:
+            print(f"WARN: Stage 2 (Segment/Sort) failed: {e_s2}"); traceback.print_exc()
+            stage_errors.append(f"Block@{block_start_orig+1}: Stage 2 failed: {e_s2}\n")
+            if metrics is not None: metrics["stage2_fallbacks"] += 1
+            # If S2 fails, we cannot proceed to S3/S4 based on structure
+            target_phase = 1 # Force output to Phase 1 result
+
+
+    if target_phase >= 3 and result_stage2_blocks is not None: # Need blocks from S2
+        try:
+            if target_phase == 99: # Debug Tree Output
+                 # Debug generator should take the LOGICAL blocks from S2
+                 result_stage3_debug_lines = _timed_call(metrics, "stage3", stage3_layout.generate_debug_output_lines, result_stage2_blocks, block_start_orig)
+            else: # Phases 3 and 4 need layout normalization
+                # --- Pipeline Stage 3 Call (Layout Normalization) ---
+                # Input is logical blocks from S2, Output is normalized lines list
+                result_stage3_lines = _timed_call(metrics, "stage3", stage3_layout.normalize_block_layout, result_stage2_blocks, active_config, block_start_orig) # CALL STAGE 3
+                current_stage_lines_input = result_stage3_lines # Update input for next stage
+                
+                if target_phase >= 4 and result_stage3_lines is not None: # Need lines from S3
+                    # --- Pipeline Stage 4 Call (Render) ---
+                    # Renderer might take the lines from Stage 3 and refine them (e.g. T3)
+                    # Or Stage 3 might be the final layout step. Let's assume S4 refines S3 output.
+                    # This requires renderer interface to accept lines_info.
+                    # Let's adjust the dummy/interface assumption: render takes lines_info from S3.
+                    stage4_start = timer() if metrics is not None else 0.0
+                    try:
+                         result_stage4_lines = winyunq_renderer.render_refine(result_stage3_lines, active_config, block_start_orig) # CALL STAGE 4 refine
+                    except AttributeError: # If renderer only works from structure, call it differently
+                         try: 
+                              # This assumes parser S3 exists and returned structure
+                              parsed_structure_s3 = tag_parser_s3.parse_structure_from_blocks(result_stage2_blocks) # Need to call parser if renderer needs structure
+                              result_stage4_lines = winyunq_renderer.render_structure(parsed_structure_s3, active_config, block_start_orig)
+                         except Exception as e_render_alt:
+                              print(f"WARN: Stage 4 (Render Structure) failed: {e_render_alt}")
+                              if metrics is not None: metrics["stage4_fallbacks"] += 1
+                              # Fallback handled later
+                    if metrics is not None: metrics["seconds"]["stage4"] += timer() - stage4_start
+
+        except Exception as e_s3_or_s4:
+             print(f"WARN: Stage 3 or 4 failed: {e_s3_or_s4}"); traceback.print_exc()
+             stage_errors.append(f"Block@{block_start_orig+1}: Stage 3/4 failed: {e_s3_or_s4}\n")
+             if metrics is not None: metrics["stage3_fallbacks" if result_stage3_lines is None else "stage4_fallbacks"] += 1
+             # Fallback handled later
+
+
+    # --- Select final output for this block based on target_phase and available results ---
+    final_block_output = result_stage1 # Default
+    if target_phase == 1:   final_block_output = result_stage1
+    elif target_phase == 2:
+        # Phase 2 doesn't produce lines directly anymore, show Stage 1
+        # Or reconstruct lines from result_stage2_blocks (more complex display logic)
+        # Let's keep showing Stage 1 result for Phase 2 selection for simplicity.
+        # (The UI tells the user; the library must not open dialogs: it also runs headless)
+        final_block_output = result_stage1
+    elif target_phase == 99:final_block_output = result_stage3_debug_lines if result_stage3_debug_lines is not None else result_stage1
+    elif target_phase == 3: final_block_output = result_stage3_lines if result_stage3_lines is not None else result_stage1
+    elif target_phase >= 4: final_block_output = result_stage4_lines if result_stage4_lines is not None else \
+                                                  (result_stage3_lines if result_stage3_lines is not None else result_stage1) # Cascade fallback
+    return final_block_output
+
+
+# --- Shared Driver ---
+def _process_block(block_data, active_config, summary, stage_errors, block_memo, config_key, metrics=None):
+    """Stages 2-4 for one block, through block_memo when given. Returns a LineBuffer and counts it in summary/metrics."""
+    if metrics is not None:
+        block_start = timer()
+        metrics["blocks"] += 1
+        metrics["block_lines_in"] += len(block_data["processed_lines"])
+    if block_memo is not None:
+        memo_key = block_memo.make_key(block_data["processed_lines"], config_key)
+        memo_hit = block_memo.get(memo_key, block_data["start_line_orig"])
+        if memo_hit is not None:
+            summary["block_cache_hits"] += 1
+            if metrics is not None: metrics["memo_hits"] += 1
+            block_output, replayed_errors = memo_hit
+            stage_errors.extend(replayed_errors) # A failed stage still reports for every block
+        else:
+            summary["block_cache_misses"] += 1
+            if metrics is not None: metrics["memo_misses"] += 1
+            errors_before = len(stage_errors)
+            block_output = _run_block_pipeline(block_data, active_config, stage_errors, metrics)
+            block_memo.put(memo_key, block_output, block_data["start_line_orig"], stage_errors[errors_before:])
+    else:
+        block_output = _run_block_pipeline(block_data, active_config, stage_errors, metrics)
+    if not isinstance(block_output, LineBuffer): block_output = LineBuffer.from_dicts(block_output) # Dict-based stage
+    summary["lines_modified"] += block_output.count_status(STATUS_MODIFIED)
+    summary["errors_found"] += block_output.count_status(STATUS_ERROR)
+    if metrics is not None: pipeline_metrics.record_block(metrics, timer() - block_start, block_data["start_line_orig"] + 1)
+    return block_output
+
+
+def _first_opener_line(code_string, line_starts, line_ends, first_line, stop_line):
+    """First line in [first_line, stop_line) that could open a block, or None (only lines holding '/**' are checked)."""
+    pos, stop_char = line_starts[first_line], line_ends[stop_line - 1]
+    while True:
+        pos = code_string.find("/**", pos, stop_char)
+        if pos < 0: return None
+        line_idx = bisect.bisect_right(line_starts, pos) - 1
+        if block_extractor.is_block_opener(code_string[line_starts[line_idx]:line_ends[line_idx]]): return line_idx
+        pos = line_ends[line_idx]
+
+
+def _timed_segments(segments, metrics):
+    """Passes segments through, adding the time spent producing them (stage 1) to metrics."""
+    seconds = metrics["seconds"]
+    segments = iter(segments)
+    while True:
+        stage_start = timer()
+        segment = next(segments, None)
+        seconds["stage1"] += timer() - stage_start
+        if segment is None: return
+        yield segment
+
+
+def _iter_pipeline(source, config, summary, block_memo=None, block_spans=None, line_offsets=None, metrics=None, progress=None):
+    """
+    Driver shared by iter_process_code and process_code: runs stages 2-4 per block
+    and keeps summary / block_spans / metrics (pipeline_metrics dict or None) up to date.
+    progress(lines_done) is called after each block with the number of original lines behind it.
+    line_offsets (block_extractor.build_line_offsets of a str source) switches code
+    lines to runs: yields (SEGMENT_CODE_RUN, first_line, stop_line); otherwise
+    (SEGMENT_CODE, orig_line, text). Blocks come as (SEGMENT_BLOCK, LineBuffer, block_data).
+    """
+    active_config = resolve_config(config)
+    summary.update({"blocks_found": 0, "lines_modified": 0, "errors_found": 0, "first_unclosed_line": None})
+    stage_errors = summary.setdefault("stage_errors", [])
+    # Phase 1 output is stage 1 itself: nothing to memoize
+    if active_config["target_phase"] < 2: block_memo = None
+    config_key = None
+    if block_memo is not None:
+        summary.update({"block_cache_hits": 0, "block_cache_misses": 0})
+        config_key = block_memo.make_config_key(active_config)
+
+    if line_offsets is not None:
+        segments = block_extractor.iter_segment_runs(source, *line_offsets)
+    else:
+        segments = block_extractor.iter_segments(source)
+    if metrics is not None: segments = _timed_segments(segments, metrics)
+    out_index = 0
+    for segment in segments:
+        kind = segment[0]
+        # Code outside blocks passes through unchanged. An opener there never found its closer
+        if kind == block_extractor.SEGMENT_CODE_RUN:
+            if summary["first_unclosed_line"] is None:
+                summary["first_unclosed_line"] = _first_opener_line(source, line_offsets[0], line_offsets[1], segment[1], segment[2])
+            out_index += segment[2] - segment[1]
+            if metrics is not None: metrics["code_lines"] += segment[2] - segment[1]
+            yield segment
+            continue
+        if kind == block_extractor.SEGMENT_CODE:
+            if summary["first_unclosed_line"] is None and "/**" in segment[2] and block_extractor.is_block_opener(segment[2]):
+                summary["first_unclosed_line"] = segment[1]
+            out_index += 1
+            if metrics is not None: metrics["code_lines"] += 1
+            yield segment
+            continue
+        summary["blocks_found"] += 1
+        block_data = segment[1]
+        block_output = _process_block(block_data, active_config, summary, stage_errors, block_memo, config_key, metrics)
+        if block_spans is not None:
+            block_spans.append([block_data["start_line_orig"], block_data["end_line_orig"], out_index, out_index + len(block_output)])
+        out_index += len(block_output)
+        if progress is not None: progress(block_data["end_line_orig"] + 1)
+        yield (block_extractor.SEGMENT_BLOCK, block_output, block_data)
+
+
+# --- Streaming Interface ---
+def iter_process_code(source, config=None, summary=None, block_memo=None, block_spans=None, collect_metrics=False):
+    """
+    Streaming variant of process_code: yields output line records as they are produced.
+
+    Args:
+        source: str, or an iterable of text lines (e.g. an open text file). Iterables
+                are never loaded whole - memory stays bounded by the largest block.
+        config: Same as process_code.
+        summary: Optional dict, updated in place with 'blocks_found', 'lines_modified',
+                 'errors_found' and 'stage_errors' (list[str]) while iterating.
+        block_memo: Optional result_cache.BlockMemo. Blocks whose normalized text was
+                    already seen reuse the stored stage 2-4 output (phase >= 2 only);
+                    'block_cache_hits'/'block_cache_misses' are added to summary.
+        block_spans: Optional list, receives [start_line_orig, end_line_orig, out_start, out_stop]
+                     per block (out_* index the yielded lines). Used by process_code_incremental.
+        collect_metrics: Adds summary['metrics'] (see pipeline_metrics.new_metrics); 'total'
+                         then includes the time the caller spends between lines.
+
+    Yields: dict {'text': str, 'status': str|None, 'orig_line': int} per output line.
+    Exceptions from the scanner propagate to the caller (process_code catches them).
+    """
+    if summary is None: summary = {}
+    metrics = None
+    if collect_metrics:
+        run_start = timer()
+        metrics = summary["metrics"] = pipeline_metrics.new_metrics()
+    for segment in _iter_pipeline(source, config, summary, block_memo, block_spans, metrics=metrics):
+        if segment[0] == block_extractor.SEGMENT_CODE:
+            if metrics is not None: metrics["lines_out"] += 1
+            yield {"text": segment[2], "status": None, "orig_line": segment[1]}
+        else:
+            if metrics is not None: metrics["lines_out"] += len(segment[1])
+            yield from segment[1] # LineBuffer iterates as dicts
+    if metrics is not None: metrics["seconds"]["total"] = timer() - run_start
+
 
+def _build_line_buffer(code_string, config, summary, block_memo=None, block_spans=None, collect_metrics=False, progress=None):
+    """
+    Runs the pipeline over a str into a LineBuffer; code (and unchanged block) lines stay offsets into code_string.
+    collect_metrics adds summary['metrics'] (without 'total', which the caller measures). progress: see _iter_pipeline.
+    """
+    metrics = None
+    if collect_metrics:
+        metrics = summary["metrics"] = pipeline_metrics.new_metrics()
+        line_offsets = _timed_call(metrics, "stage1", block_extractor.build_line_offsets, code_string)
+    else:
+        line_offsets = block_extractor.build_line_offsets(code_string)
+    lines = LineBuffer(code_string)
+    for segment in _iter_pipeline(code_string, config, summary, block_memo, block_spans, line_offsets, metrics, progress):
+        if segment[0] == block_extractor.SEGMENT_CODE_RUN:
+            lines.append_source_lines(line_offsets[0], line_offsets[1], segment[1], segment[2])
+        elif segment[0] == block_extractor.SEGMENT_BLOCK:
+            # Unchanged block lines cost no string (only within the block: incremental runs reuse it alone)
+            block_data = segment[2]
+            lines.extend_sharing_source(segment[1], line_offsets[0], line_offsets[1], block_data["start_line_orig"], block_data["end_line_orig"] + 1)
+        else: # Pipeline without a run-based scanner
+            lines.append(segment[2], None, segment[1])
+    if metrics is not None: metrics["lines_out"] = len(lines)
+    return lines
 
-    output_structure = {"success": True, "error_message": None, "lines": [], "summary": {}}
-    final_output_lines_info = []
-    last_processed_orig_line_end = -1
-    original_lines = code_string.splitlines()
-    processed_orig_lines = set()
+
+# --- Main Interface Function ---
+def process_code(code_string, config=None, cache=None, block_memo=None, collect_metrics=False, progress=None):
+    """
+    STABLE INTERFACE: Orchestrates the Winyunq formatting pipeline by executing
+    all necessary stages up to the point required for the target output phase.
+    Returns dict {'success':bool, 'error':str|None, 'lines':LineBuffer, 'summary':dict, 'blocks':list}
+    'lines' iterates as dicts {'text': str, 'status': str|None, 'orig_line': int}
+    (see line_buffer.LineBuffer for the columnar accessors).
+    'blocks': [start_line_orig, end_line_orig, out_start, out_stop] per block (see process_code_incremental)
+    Optional cache (result_cache.ResultCache): a hit returns the stored result
+    without running any stage; successful results are stored.
+    Optional block_memo (result_cache.BlockMemo): see iter_process_code.
+    collect_metrics=True adds summary['metrics']: per-stage wall time and counters
+    (see pipeline_metrics.new_metrics; merge batches with pipeline_metrics.MetricsAggregator).
+    Optional progress(lines_done): called after each block (never on a cache hit); raising
+    FormatCancelled from it stops the run and propagates to the caller.
+    """
+    run_start = timer() if collect_metrics else 0.0
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.make_key(code_string.encode("utf-8", "surrogatepass"), resolve_config(config))
+        cached_result = cache.get(cache_key)
+        if cached_result is not None:
+            cached_result["lines"].source = code_string # Same bytes: lets process_code_incremental reuse it
+            if collect_metrics:
+                cached_result["summary"]["metrics"] = pipeline_metrics.cache_hit_metrics(timer() - run_start, len(cached_result["lines"]))
+            return cached_result
+
+    output_structure = {"success": True, "error_message": None, "lines": LineBuffer(code_string), "summary": {}, "blocks": []}
 
     try:
-        # --- Pipeline Stage 1: Extract Blocks & Normalize Boundaries/Prefixes ---
-        extracted_blocks_data = block_extractor.extract_and_normalize_block(code_string)
-        output_structure["summary"]["blocks_found"] = len(extracted_blocks_data)
-
-        for block_data in extracted_blocks_data:
-            block_start_orig = block_data["start_line_orig"]
-            block_end_orig = block_data["end_line_orig"]
-            stage1_processed_tuples = block_data["processed_lines"]
-            stage1_lines_info = [{"text": line, "status": status, "orig_line": block_start_orig + i}
-                                 for i, (line, status) in enumerate(stage1_processed_tuples)]
-
-            # Add code BEFORE block
-            # ... (same logic) ...
-            start_code_line = last_processed_orig_line_end + 1; end_code_line = block_start_orig
-            for i in range(start_code_line, end_code_line):
-                 if i < len(original_lines) and i not in processed_orig_lines:
-                     final_output_lines_info.append({"text": original_lines[i], "status": None, "orig_line": i})
-                     processed_orig_lines.add(i)
-
-            # --- Pipeline Execution based on Phase ---
-            result_stage1 = stage1_lines_info
-            result_stage2_blocks = None # Logical blocks from S2
-            result_stage3_lines = None  # Normalized lines from S3
-            result_stage3_debug_lines = None # Debug lines from S3
-            result_stage4_lines = None  # Rendered lines from S4
-
-            current_stage_lines_input = result_stage1 # Input for the next stage
-
-            if target_phase >= 2:
-                try:
-                    segmented_sorted_blocks = tag_parser_s2.segment_and_sort_tags(current_stage_lines_input) # CALL STAGE 2
-                    result_stage2_blocks = segmented_sorted_blocks # Save logical blocks output
-                    # NOTE: Stage 2 no longer directly provides lines for output, focus on structure
-                except Exception as e_s2:
-                    print(f"WARN: Stage 2 (Segment/Sort) failed: {e_s2}"); traceback.print_exc()
-                    output_structure["error_message"] = (output_structure.get("error_message") or "") + f"Block@{block_start_orig+1}: Stage 2 failed: {e_s2}\n"
-                    # If S2 fails, we cannot proceed to S3/S4 based on structure
-                    target_phase = 1 # Force output to Phase 1 result
-
-
-            if target_phase >= 3 and result_stage2_blocks is not None: # Need blocks from S2
-                try:
-                    if target_phase == 99: # Debug Tree Output
-                         # Debug generator should take the LOGICAL blocks from S2
-                         result_stage3_debug_lines = stage3_layout.generate_debug_output_lines(result_stage2_blocks, block_start_orig)
-                    else: # Phases 3 and 4 need layout normalization
-                        # --- Pipeline Stage 3 Call (Layout Normalization) ---
-                        # Input is logical blocks from S2, Output is normalized lines list
-                        result_stage3_lines = stage3_layout.normalize_block_layout(result_stage2_blocks, active_config, block_start_orig) # CALL STAGE 3
-                        current_stage_lines_input = result_stage3_lines # Update input for next stage
-                        
-                        if target_phase >= 4 and result_stage3_lines is not None: # Need lines from S3
-                            # --- Pipeline Stage 4 Call (Render) ---
-                            # Renderer might take the lines from Stage 3 and refine them (e.g. T3)
-                            # Or Stage 3 might be the final layout step. Let's assume S4 refines S3 output.
-                            # This requires renderer interface to accept lines_info.
-                            # Let's adjust the dummy/interface assumption: render takes lines_info from S3.
-                            try:
-                                 result_stage4_lines = winyunq_renderer.render_refine(result_stage3_lines, active_config, block_start_orig) # CALL STAGE 4 refine
-                            except AttributeError: # If renderer only works from structure, call it differently
-                                 try: 
-                                      # This assumes parser S3 exists and returned structure
-                                      parsed_structure_s3 = tag_parser_s3.parse_structure_from_blocks(result_stage2_blocks) # Need to call parser if renderer needs structure
-                                      result_stage4_lines = winyunq_renderer.render_structure(parsed_structure_s3, active_config, block_start_orig)
-                                 except Exception as e_render_alt:
-                                      print(f"WARN: Stage 4 (Render Structure) failed: {e_render_alt}")
-                                      # Fallback handled later
-
-                except Exception as e_s3_or_s4:
-                     print(f"WARN: Stage 3 or 4 failed: {e_s3_or_s4}"); traceback.print_exc()
-                     output_structure["error_message"] = (output_structure.get("error_message") or "") + f"Block@{block_start_orig+1}: Stage 3/4 failed: {e_s3_or_s4}\n"
-                     # Fallback handled later
-
-
-            # --- Select final output for this block based on target_phase and available results ---
-            final_block_output = result_stage1 # Default
-            if target_phase == 1:   final_block_output = result_stage1
-            elif target_phase == 2: 
-                # Phase 2 doesn't produce lines directly anymore, show Stage 1
-                # Or reconstruct lines from result_stage2_blocks (more complex display logic)
-                # Let's keep showing Stage 1 result for Phase 2 selection for simplicity.
-                 messagebox.showwarning("Phase 2 Preview", "Phase 2 (Tag Sorting) preview not fully implemented yet. Showing Phase 1 result.") # Inform user
-                 final_block_output = result_stage1
-            elif target_phase == 99:final_block_output = result_stage3_debug_lines if result_stage3_debug_lines is not None else result_stage1
-            elif target_phase == 3: final_block_output = result_stage3_lines if result_stage3_lines is not None else result_stage1
-            elif target_phase >= 4: final_block_output = result_stage4_lines if result_stage4_lines is not None else \
-                                                          (result_stage3_lines if result_stage3_lines is not None else result_stage1) # Cascade fallback
-
-            # Add the selected output for this block
-            final_output_lines_info.extend(final_block_output)
-            # Mark original lines processed
-            for i in range(block_start_orig, block_end_orig + 1):
-                 if i < len(original_lines): processed_orig_lines.add(i)
-            last_processed_orig_line_end = block_end_orig
-
-        # Add code AFTER last block
-        start_code_line = last_processed_orig_line_end + 1
-        for i in range(start_code_line, len(original_lines)):
-             if i not in processed_orig_lines:
-                  final_output_lines_info.append({"text": original_lines[i], "status": None, "orig_line": i})
-
-        output_structure["lines"] = final_output_lines_info
-        output_structure["summary"]["lines_modified"] = sum(1 for line in final_output_lines_info if line.get("status") == STATUS_MODIFIED)
-        output_structure["summary"]["errors_found"] = sum(1 for line in final_output_lines_info if line.get("status") == STATUS_ERROR)
+        # Stages 1-4 run lazily per block, see _iter_pipeline
+        output_structure["lines"] = _build_line_buffer(code_string, config, output_structure["summary"], block_memo, output_structure["blocks"], collect_metrics, progress)
+        stage_errors = output_structure["summary"].get("stage_errors")
+        if stage_errors: output_structure["error_message"] = "".join(stage_errors)
 
+    except FormatCancelled: raise
     except Exception as e:
         # ... (Global error handling) ...
         output_structure["success"] = False; output_structure["error_message"] = f"Critical Error: {type(e).__name__}: {e}\n{traceback.format_exc()}"
-        output_structure["lines"] = [{"text": line, "status": STATUS_ERROR if i==0 else None, "orig_line": i} for i, line in enumerate(code_string.splitlines())]
+        output_structure["lines"] = LineBuffer.from_rows((line, STATUS_ERROR if i==0 else None, i) for i, line in enumerate(code_string.splitlines()))
+
+    if collect_metrics and "metrics" in output_structure["summary"]:
+        output_structure["summary"]["metrics"]["seconds"]["total"] = timer() - run_start
+    if cache_key is not None and output_structure["success"]:
+        cache.put(cache_key, output_structure)
+    return output_structure
+
+
+def lines_to_text(lines, original=None):
+    """
+    Joins output lines (LineBuffer or list of dicts) into file text with '\n' breaks.
+    Ends with a line break unless original (the formatted text) did not.
+    """
+    text = "\n".join(text for text, _, _ in iter_line_rows(lines))
+    if text and (original is None or original.endswith("\n")): text += "\n"
+    return text
+
+
+# --- Incremental Interface ---
+_BLOCK_ERROR_PREFIX = re.compile(r"^Block@(\d+): ")
+
+
+def diff_changed_ranges(old_lines, new_lines):
+    """
+    Smallest changed range between two line lists (common prefix/suffix trimmed).
+    Returns [] if equal, else [(old_start, old_stop, new_start, new_stop)] - the
+    changed_ranges format of process_code_incremental.
+    """
+    old_count, new_count = len(old_lines), len(new_lines)
+    prefix = 0
+    common = min(old_count, new_count)
+    while prefix < common and old_lines[prefix] == new_lines[prefix]: prefix += 1
+    if prefix == old_count == new_count: return []
+    suffix = 0
+    while suffix < common - prefix and old_lines[old_count-1-suffix] == new_lines[new_count-1-suffix]: suffix += 1
+    return [(prefix, old_count - suffix, prefix, new_count - suffix)]
+
 
-    return output_structure
\ No newline at end of file
+def _output_index(blocks, orig_line):
+    """Output index of an original line that is a block start or outside every block."""
+    block_index = bisect.bisect_left(blocks, orig_line, key=lambda span: span[1]) - 1 # Last block ending before orig_line
+    if block_index < 0: return orig_line
+    start, end, out_start, out_stop = blocks[block_index]
+    return out_stop + (orig_line - end - 1)
+
+
+def _expand_to_blocks(blocks, changed_ranges):
+    """
+    Grows each changed range to cover every previous block it touches, then merges
+    ranges that overlap or touch. Returns sorted [old_start, old_stop, new_start, new_stop].
+    """
+    regions = []
+    for old_start, old_stop, new_start, new_stop in sorted(changed_ranges):
+        # Blocks with start < old_stop and end >= old_start overlap (an insertion at a block start does not)
+        first = bisect.bisect_left(blocks, old_start, key=lambda span: span[1])
+        for start, end, _, _ in blocks[first:]:
+            if start >= old_stop: break
+            if start < old_start: new_start -= old_start - start; old_start = start
+            if end + 1 > old_stop: new_stop += end + 1 - old_stop; old_stop = end + 1
+        if regions and old_start <= regions[-1][1]:
+            region = regions[-1]
+            region[1] = max(region[1], old_stop)
+            region[3] = region[1] + (new_stop - old_stop) # Line shift after this range includes every earlier edit
+        else:
+            regions.append([old_start, old_stop, new_start, new_stop])
+    return regions
+
+
+def _line_offset(line_starts, text, line_idx):
+    return line_starts[line_idx] if line_idx < len(line_starts) else len(text)
+
+
+def process_code_incremental(previous_result, code_string, changed_ranges, config=None, block_memo=None, collect_metrics=False, progress=None):
+    """
+    Re-formats only what an edit can affect, reusing a previous process_code result.
+
+    Args:
+        previous_result: Result of process_code (or of this function) for the text before the edit,
+                         with the same config.
+        code_string: Full text after the edit.
+        changed_ranges: list of (old_start, old_stop, new_start, new_stop) 0-based, stop-exclusive
+                        original-line ranges: old lines [old_start, old_stop) became new lines
+                        [new_start, new_stop). diff_changed_ranges computes one from two line lists.
+        config, block_memo, collect_metrics, progress: Same as process_code (metrics and progress
+                        cover the re-scanned regions; progress reports new line numbers).
+
+    Only blocks overlapping a changed range are re-run; output after them is reused with
+    orig_line shifted. Falls back to a full process_code when the edit may change block
+    boundaries outside the re-scanned region (an unclosed '/**' before or inside it), when
+    the text outside the ranges differs, or when previous_result cannot be reused
+    (failed run, no block spans).
+    Returns: dict, same structure as process_code.
+    """
+    if not previous_result or not previous_result.get("success"):
+        return process_code(code_string, config, block_memo=block_memo, collect_metrics=collect_metrics, progress=progress)
+    blocks, old_lines = previous_result.get("blocks"), previous_result.get("lines")
+    if blocks is None or not isinstance(old_lines, LineBuffer):
+        return process_code(code_string, config, block_memo=block_memo, collect_metrics=collect_metrics, progress=progress)
+    if not changed_ranges: return previous_result
+    run_start = timer() if collect_metrics else 0.0
+
+    previous_summary = previous_result.get("summary", {})
+    first_unclosed = previous_summary.get("first_unclosed_line")
+    regions = _expand_to_blocks(blocks, changed_ranges)
+    # An earlier '/**' without closer could now close inside the edited region
+    if first_unclosed is not None and first_unclosed < regions[-1][1]:
+        return process_code(code_string, config, block_memo=block_memo, collect_metrics=collect_metrics, progress=progress)
+
+    output_structure = {"success": True, "error_message": None, "lines": LineBuffer(code_string), "summary": {}, "blocks": []}
+    try:
+        old_source = old_lines.source
+        old_starts = block_extractor.build_line_offsets(old_source)[0]
+        new_starts = block_extractor.build_line_offsets(code_string)[0]
+        new_lines, new_blocks = output_structure["lines"], []
+        stage_errors = []
+        error_cursor = 0
+        previous_errors = previous_summary.get("stage_errors", [])
+        summary = output_structure["summary"]
+        if block_memo is not None: summary.update({"block_cache_hits": 0, "block_cache_misses": 0})
+        metrics = pipeline_metrics.new_metrics() if collect_metrics else None
+        block_cursor = 0
+        out_cursor = 0
+        old_line_cursor = new_line_cursor = 0 # First line of the reused part being copied
+        line_shift = 0 # new orig_line - old orig_line for that part
+
+        def copy_reused(out_stop, block_stop, orig_stop):
+            # Reuses old output [out_cursor, out_stop) and its blocks / errors, shifted by line_shift
+            nonlocal out_cursor, block_cursor, error_cursor
+            old_char = _line_offset(old_starts, old_source, old_line_cursor)
+            new_char = _line_offset(new_starts, code_string, new_line_cursor)
+            old_char_stop = _line_offset(old_starts, old_source, min(orig_stop, len(old_starts)))
+            # Code lines point into the source: the reused text must be identical in the new one
+            if old_source[old_char:old_char_stop] != code_string[new_char:new_char + old_char_stop - old_char]: return False
+            out_shift = len(new_lines) - out_cursor
+            new_lines.extend_from(old_lines, out_cursor, out_stop, line_shift, new_char - old_char)
+            for start, end, out_start, block_out_stop in blocks[block_cursor:block_stop]:
+                new_blocks.append([start + line_shift, end + line_shift, out_start + out_shift, block_out_stop + out_shift])
+            while error_cursor < len(previous_errors):
+                message = previous_errors[error_cursor]
+                match = _BLOCK_ERROR_PREFIX.match(message)
+                if match and int(match.group(1)) - 1 >= orig_stop: break
+                if match and line_shift:
+                    message = f"Block@{int(match.group(1)) + line_shift}: {message[match.end():]}"
+                stage_errors.append(message); error_cursor += 1
+            out_cursor, block_cursor = out_stop, block_stop
+            return True
+
+        for old_start, old_stop, new_start, new_stop in regions:
+            block_start_index = bisect.bisect_left(blocks, old_start, key=lambda span: span[0])
+            if not copy_reused(_output_index(blocks, old_start), block_start_index, old_start):
+                return process_code(code_string, config, block_memo=block_memo, collect_metrics=collect_metrics, progress=progress)
+            # Skip the replaced part of the previous result
+            block_stop_index = bisect.bisect_left(blocks, old_stop, key=lambda span: span[0])
+            out_cursor, block_cursor = _output_index(blocks, old_stop), block_stop_index
+            while error_cursor < len(previous_errors):
+                match = _BLOCK_ERROR_PREFIX.match(previous_errors[error_cursor])
+                if match and int(match.group(1)) - 1 >= old_stop: break
+                error_cursor += 1
+
+            # Re-scan the region on its own; its boundaries are block-aligned in the previous result
+            region_summary = {}
+            region_spans = []
+            region_char_start = _line_offset(new_starts, code_string, new_start)
+            region_text = code_string[region_char_start:_line_offset(new_starts, code_string, new_stop)]
+            region_progress = None if progress is None else (lambda lines_done, offset=new_start: progress(offset + lines_done))
+            region_lines = _build_line_buffer(region_text, config, region_summary, block_memo, region_spans, collect_metrics, region_progress)
+            if region_summary["first_unclosed_line"] is not None: # Block runs past the region
+                return process_code(code_string, config, block_memo=block_memo, collect_metrics=collect_metrics, progress=progress)
+            region_out_start = len(new_lines)
+            new_lines.extend_from(region_lines, 0, len(region_lines), new_start, region_char_start)
+            for start, end, out_start, out_stop in region_spans:
+                new_blocks.append([start + new_start, end + new_start, out_start + region_out_start, out_stop + region_out_start])
+            for message in region_summary["stage_errors"]:
+                match = _BLOCK_ERROR_PREFIX.match(message)
+                stage_errors.append(f"Block@{int(match.group(1)) + new_start}: {message[match.end():]}" if match else message)
+            if block_memo is not None:
+                summary["block_cache_hits"] += region_summary.get("block_cache_hits", 0)
+                summary["block_cache_misses"] += region_summary.get("block_cache_misses", 0)
+            if metrics is not None: pipeline_metrics.merge_metrics(metrics, region_summary["metrics"], new_start)
+            line_shift = new_stop - old_stop
+            old_line_cursor, new_line_cursor = old_stop, new_stop
+        if not copy_reused(len(old_lines), len(blocks), len(old_starts)):
+            return process_code(code_string, config, block_memo=block_memo, collect_metrics=collect_metrics, progress=progress)
+
+        summary["blocks_found"] = len(new_blocks)
+        summary["lines_modified"] = new_lines.count_status(STATUS_MODIFIED)
+        summary["errors_found"] = new_lines.count_status(STATUS_ERROR)
+        summary["first_unclosed_line"] = None if first_unclosed is None else first_unclosed + line_shift
+        summary["stage_errors"] = stage_errors
+        output_structure["blocks"] = new_blocks
+        if stage_errors: output_structure["error_message"] = "".join(stage_errors)
+        if metrics is not None:
+            metrics["lines_out"] = len(new_lines)
+            metrics["seconds"]["total"] = timer() - run_start
+            summary["metrics"] = metrics
+    except FormatCancelled: raise
+    except Exception as e:
+        print(f"WARN: Incremental re-format failed, processing the whole text: {e}")
+        return process_code(code_string, config, block_memo=block_memo, collect_metrics=collect_metrics, progress=progress)
+    return output_structure
@@ -1,4 +1,5 @@
 # winyunq_renderer.py (Placeholder for Stage 4)
+from line_buffer import LineBuffer
 
 # Define constants needed by the formatter's process_code when calling this stage
 STATUS_RENDERED = "rendered"
@@ -12,23 +13,23 @@ def render_structure(structure, config, block_start_orig_line=0):
     Pipeline Stage 4: Renders the structure into formatted lines with status.
     (Placeholder implementation)
     Args: structure (list[TagNode]), config (dict), block_start_orig_line (int)
-    Returns: list of dicts [{'text':..., 'status':..., 'orig_line':...}]
+    Returns: line_buffer.LineBuffer (iterates as dicts [{'text':..., 'status':..., 'orig_line':...}])
     """
     print("WARN: Using placeholder winyunq_renderer.render_structure")
-    output_lines_info = []
+    output_lines_info = LineBuffer()
     
     # Basic placeholder: Just output tags and first line of description maybe
-    output_lines_info.append({"text": "/**", "status": STATUS_BOUNDARY, "orig_line": block_start_orig_line })
+    output_lines_info.append("/**", STATUS_BOUNDARY, block_start_orig_line)
     
     line_count = 1
     for node in structure: # Assuming structure is a flat list for simplicity here
         if node.is_text_block:
-             output_lines_info.append({"text": f" * {node.description_lines[0] if node.description_lines else '(empty text block)'}", "status": STATUS_RENDERED, "orig_line": block_start_orig_line + line_count})
+             output_lines_info.append(f" * {node.description_lines[0] if node.description_lines else '(empty text block)'}", STATUS_RENDERED, block_start_orig_line + line_count)
              line_count += 1
         else:
-             output_lines_info.append({"text": f" * {' ' * node.level}{node.tag_name} {node.arguments} {node.description_lines[0] if node.description_lines else ''}".rstrip(), "status": STATUS_RENDERED, "orig_line": block_start_orig_line + line_count})
+             output_lines_info.append(f" * {' ' * node.level}{node.tag_name} {node.arguments} {node.description_lines[0] if node.description_lines else ''}".rstrip(), STATUS_RENDERED, block_start_orig_line + line_count)
              line_count +=1
              
-    output_lines_info.append({"text": "**/", "status": STATUS_BOUNDARY, "orig_line": block_start_orig_line + line_count })
+    output_lines_info.append("**/", STATUS_BOUNDARY, block_start_orig_line + line_count)
 
     return output_lines_info
\ No newline at end of file